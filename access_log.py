@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import collections
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+DEFAULT_CAPACITY = 65536
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+# Wake the writer early once this many records are waiting
+_BATCH_SIZE = 4096
+# Longest unmatched path written to the log
+_MAX_PATH = 200
+
+
+class AccessLogError(ValueError):
+    pass
+
+
+def parse_sample_rates(specs):
+    """{route: rate} from 'ROUTE=RATE' strings, e.g. '/api/health=0.01'"""
+    rates = {}
+    for spec in specs or ():
+        route, sep, rate = spec.rpartition('=')
+        try:
+            rate = float(rate)
+        except ValueError:
+            rate = -1.0
+        if not sep or not route.startswith('/') or not 0.0 <= rate <= 1.0:
+            raise AccessLogError(f'Invalid sample rate {spec!r}: expected ROUTE=RATE with RATE in [0, 1]')
+        rates[route] = rate
+    return rates
+
+
+class AccessLog:
+    """Structured request log written as JSON lines by a background thread.
+
+    record() appends a tuple to a bounded in-memory queue and returns; the
+    writer thread wakes every `flush_interval` seconds (or sooner when a
+    batch has piled up), formats everything queued and writes it with one
+    call. When the queue is full new records are counted in `dropped`
+    rather than slowing the request down. Routes listed in `sample_rates`
+    keep that fraction of their successful requests, and each kept record
+    carries the rate so totals can be scaled back up; errors are always
+    kept. The file is rotated to path.1 ... path.N at `max_bytes`.
+
+    path '-' writes to stderr without rotation. With per_process=True the
+    process id is added to the file name, for prefork workers.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS, sample_rates=None,
+                 per_process=False):
+        # Resolved now: the servers change directory before the first write
+        self.path = path if path == '-' else os.path.abspath(path)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rates = dict(sample_rates or {})
+        self.per_process = per_process
+
+        self._queue = collections.deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._file_path = None
+        self._size = 0
+
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.rotations = 0
+
+    def record(self, method, route, status, seconds, user_id=None, path=None):
+        """Queue one request; never blocks"""
+        if route in self.sample_rates and (status or 0) < 400:
+            rate = self.sample_rates[route]
+            if random.random() >= rate:
+                self.sampled_out += 1
+                return
+        else:
+            rate = None
+        queue = self._queue
+        # Concurrent appends can overshoot the capacity by a few records, which is harmless
+        if len(queue) >= self.capacity:
+            self.dropped += 1
+            return
+        queue.append((time.time(), method, route, path, status, seconds, user_id, rate))
+        if len(queue) >= _BATCH_SIZE and not self._wake.is_set():
+            self._wake.set()
+
+    def pending(self):
+        return len(self._queue)
+
+    # Writer thread
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """Stop the writer and write whatever is still queued"""
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+        with self._write_lock:
+            if self._file is not None and self._file is not sys.stderr:
+                self._file.close()
+            self._file = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                # A full disk must not kill the writer; records keep being counted as dropped
+                print(f"access log write failed: {e}", file=sys.stderr)
+
+    def flush(self):
+        """Format and write every queued record; returns how many were written"""
+        queue = self._queue
+        count = len(queue)
+        if not count:
+            return 0
+        lines = []
+        popleft = queue.popleft
+        for _ in range(count):
+            lines.append(_format(popleft()))
+        data = ''.join(lines)
+        with self._write_lock:
+            target = self._open()
+            if target is sys.stderr:
+                target.write(data)
+                target.flush()
+            else:
+                data = data.encode('utf-8')
+                if self._size and self._size + len(data) > self.max_bytes:
+                    target = self._rotate()
+                target.write(data)
+                target.flush()
+                self._size += len(data)
+        self.written += count
+        return count
+
+    # Files
+
+    def _current_path(self):
+        if not self.per_process:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f'{root}-{os.getpid()}{ext}'
+
+    def _open(self):
+        if self.path == '-':
+            return sys.stderr
+        path = self._current_path()
+        if self._file is None or self._file_path != path:
+            # A forked worker gets its own file instead of the parent's handle
+            self._file = open(path, 'ab')
+            self._file_path = path
+            self._size = self._file.tell()
+        return self._file
+
+    def _rotate(self):
+        self._file.close()
+        path = self._file_path
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                source = f'{path}.{i}'
+                if os.path.exists(source):
+                    os.replace(source, f'{path}.{i + 1}')
+            os.replace(path, f'{path}.1')
+        self._file = open(path, 'wb')
+        self._size = 0
+        self.rotations += 1
+        return self._file
+
+
+def _format(item):
+    ts, method, route, path, status, seconds, user_id, rate = item
+    entry = {
+        'ts': round(ts, 3),
+        'method': method,
+        'route': route,
+        'status': status,
+        'ms': round(seconds * 1000, 3),
+    }
+    if route is None and path is not None:
+        entry['path'] = path[:_MAX_PATH]
+    if user_id is not None:
+        entry['userId'] = user_id
+    if rate is not None:
+        entry['sampleRate'] = rate
+    return json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
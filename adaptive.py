@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import random
+import threading
+
+# Answers remembered per user and subject
+WINDOW = 16
+# Answers at a level before it can change
+MIN_ANSWERS = 6
+# Move up at 80% correct or better, down at 50% or worse (as integer ratios)
+PROMOTE = (4, 5)
+DEMOTE = (1, 2)
+
+# Math levels from easiest to hardest: (difficulty, operation mix)
+MATH_LEVELS = (
+    (1, ('+',)),
+    (1, ('+', '-')),
+    (2, ('+', '-')),
+    (2, ('+', '-', '*')),
+)
+# Language levels are difficulties; the bank falls back to any difficulty it lacks
+LANGUAGE_LEVELS = (1, 2, 3)
+DEFAULT_STRIPES = 64
+
+# One subject's state packed into an int: answer bits, answer count, level
+_HISTORY_MASK = (1 << WINDOW) - 1
+_COUNT_SHIFT = WINDOW
+_LEVEL_SHIFT = WINDOW + 5
+_FIELD_BITS = WINDOW + 8
+_FIELD_MASK = (1 << _FIELD_BITS) - 1
+# subject -> (bit offset in the user's state, number of levels)
+_SUBJECTS = {
+    'math': (0, len(MATH_LEVELS)),
+    'language': (_FIELD_BITS, len(LANGUAGE_LEVELS)),
+}
+
+
+def _unpack(state, offset):
+    field = (state >> offset) & _FIELD_MASK
+    return field & _HISTORY_MASK, (field >> _COUNT_SHIFT) & 0x1f, field >> _LEVEL_SHIFT
+
+
+class AdaptiveDifficulty:
+    """Per-user level for each subject, driven by their recent answers.
+
+    A user's state is one int: for math and for language, the last WINDOW
+    answers as bits, how many of them count, and the current level. Each
+    answer shifts one bit in and may move the level (then the window
+    starts over), so record() and choose() are constant time and a user
+    costs one small int in a dict, whatever the user count.
+
+    record() updates a user's state under one of `stripes` locks picked
+    by user id, like ReviewQueue, so answers graded at the same moment
+    each shift their bit in. choose() and progress() read the int without
+    locking. State is per process and is not persisted.
+    """
+
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._states = {}
+
+    def _lock(self, user_id):
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    def record(self, user_id, question_type, is_correct):
+        """Shift one graded answer into the user's window for that subject"""
+        subject = _SUBJECTS.get(question_type)
+        if subject is None:
+            return
+        offset, levels = subject
+        with self._lock(user_id):
+            state = self._states.get(user_id, 0)
+            history, count, level = _unpack(state, offset)
+            history = ((history << 1) | bool(is_correct)) & _HISTORY_MASK
+            count = min(count + 1, WINDOW)
+            if count >= MIN_ANSWERS:
+                correct = bin(history).count('1')
+                if correct * PROMOTE[1] >= count * PROMOTE[0] and level < levels - 1:
+                    level, history, count = level + 1, 0, 0
+                elif correct * DEMOTE[1] <= count * DEMOTE[0] and level > 0:
+                    level, history, count = level - 1, 0, 0
+            field = history | (count << _COUNT_SHIFT) | (level << _LEVEL_SHIFT)
+            self._states[user_id] = (state & ~(_FIELD_MASK << offset)) | (field << offset)
+
+    def progress(self, user_id, question_type):
+        """(level, correct answers, answers) in the user's current window"""
+        history, count, level = _unpack(self._states.get(user_id, 0), _SUBJECTS[question_type][0])
+        return level, bin(history).count('1'), count
+
+    def choose(self, user_id, question_type='auto'):
+        """(question_type, difficulty, operations) for the user's next question.
+
+        With 'auto' the subject is picked at random, weighted towards the
+        one with more recent mistakes. operations is None for language.
+        """
+        state = self._states.get(user_id, 0)
+        if question_type == 'auto':
+            weights = []
+            for offset, _ in _SUBJECTS.values():
+                history, count, _ = _unpack(state, offset)
+                weights.append(1 + count - bin(history).count('1'))
+            question_type = 'math' if random.random() * sum(weights) < weights[0] else 'language'
+        level = _unpack(state, _SUBJECTS[question_type][0])[2]
+        if question_type == 'math':
+            difficulty, operations = MATH_LEVELS[level]
+            return question_type, difficulty, operations
+        return question_type, LANGUAGE_LEVELS[level], None
+
+    def __len__(self):
+        return len(self._states)
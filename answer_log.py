@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from question_tokens import TOKEN_SIZE, token_bytes, token_from_bytes
+
+DEFAULT_HISTORY_LIMIT = 20
+MAX_HISTORY_LIMIT = 100
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+# Server-issued question ids, e.g. math_1721000000_1234
+_ISSUED_ID = re.compile(r'([a-z]+)_([1-9][0-9]{0,9})_([1-9][0-9]{0,6})')
+_MAX_PREFIXES = 128
+
+
+class HistoryError(ValueError):
+    """Bad limit/before parameters for a history query"""
+
+
+def parse_history_query(query):
+    """Return (limit, before) from parse_qs output; before is None for the newest page"""
+    try:
+        limit = int(query.get('limit', [DEFAULT_HISTORY_LIMIT])[0])
+        before = query.get('before', [None])[0]
+        before = int(before) if before not in (None, '') else None
+    except ValueError:
+        raise HistoryError('limit and before must be integers')
+    if not 1 <= limit <= MAX_HISTORY_LIMIT:
+        raise HistoryError(f'limit must be between 1 and {MAX_HISTORY_LIMIT}')
+    if before is not None and before < 0:
+        raise HistoryError('before must not be negative')
+    return limit, before
+
+
+class AnswerLog:
+    """Append-only answer history stored column by column in typed arrays.
+
+    Every answer is one row of four columns (user index, question id,
+    correct flag, timestamp in seconds) plus its row number in the user's
+    own ascending array, 21 bytes in all instead of a dict. User ids are
+    interned to dense indexes. Question ids are unique per issue, so they
+    are packed into the 8-byte column instead: a server-issued id like
+    math_1721000000_1234 as prefix, time and suffix, and a signed id as
+    the index of its raw bytes in a fixed-width side buffer (39 more
+    bytes). Anything else is kept as a string, which graded ids never are.
+
+    A page of history is a bisect plus a slice of the user's rows however
+    many rows the log holds. Row numbers double as pagination cursors.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = array('I')
+        self._questions = array('q')
+        self._correct = array('B')
+        self._times = array('I')
+
+        self._user_index = {}
+        self._user_rows = []
+        self._user_correct = array('I')
+        # Question id storage, see _pack_question
+        self._prefixes = []
+        self._prefix_codes = {}
+        self._tokens = bytearray()
+        self._other_ids = []
+
+    def __len__(self):
+        return len(self._users)
+
+    def _pack_question(self, question_id):
+        """Column value for a question id: >= 0 packed, odd < 0 a token slot, even < 0 a string"""
+        match = _ISSUED_ID.fullmatch(question_id) if isinstance(question_id, str) else None
+        if match:
+            prefix, issued, suffix = match.group(1), int(match.group(2)), int(match.group(3))
+            code = self._prefix_codes.get(prefix)
+            if code is None and len(self._prefixes) < _MAX_PREFIXES:
+                code = self._prefix_codes[prefix] = len(self._prefixes)
+                self._prefixes.append(prefix)
+            if code is not None and issued < 1 << 32 and suffix < 1 << 24:
+                return (code << 56) | (issued << 24) | suffix
+        raw = token_bytes(question_id)
+        # Only ids that encode back to the same text, so history shows what was answered
+        if raw is not None and token_from_bytes(raw) == question_id:
+            slot = len(self._tokens) // TOKEN_SIZE
+            self._tokens += raw
+            return -2 * slot - 1
+        self._other_ids.append(question_id)
+        return -2 * len(self._other_ids)
+
+    def _unpack_question(self, value):
+        if value >= 0:
+            return f"{self._prefixes[value >> 56]}_{(value >> 24) & 0xffffffff}_{value & 0xffffff}"
+        if value & 1:
+            start = (-value - 1) // 2 * TOKEN_SIZE
+            return token_from_bytes(self._tokens[start:start + TOKEN_SIZE])
+        return self._other_ids[-value // 2 - 1]
+
+    def append(self, user_id, question_id, is_correct, answered_at=None):
+        """Record one answer; returns its row number (the cursor)"""
+        timestamp = int(answered_at if answered_at is not None else time.time())
+        with self._lock:
+            user = self._user_index.get(user_id)
+            if user is None:
+                user = self._user_index[user_id] = len(self._user_rows)
+                self._user_rows.append(array('I'))
+                self._user_correct.append(0)
+            row = len(self._users)
+            self._users.append(user)
+            self._questions.append(self._pack_question(question_id))
+            self._correct.append(1 if is_correct else 0)
+            self._times.append(timestamp)
+            self._user_rows[user].append(row)
+            if is_correct:
+                self._user_correct[user] += 1
+        return row
+
+    def extend(self, records):
+        """Append answer records as built by grading.answer_record"""
+        now = time.time()
+        for record in records:
+            self.append(record['userId'], record['questionId'], record['isCorrect'], now)
+
+    def history(self, user_id, limit=DEFAULT_HISTORY_LIMIT, before=None):
+        """Newest-first page of a user's answers older than row `before`.
+
+        Returns {'answers': [...], 'nextCursor': row or None, 'answered': n,
+        'correct': n, 'accuracy': ratio}; a user with no answers gets an
+        empty page.
+        """
+        with self._lock:
+            user = self._user_index.get(user_id)
+            rows = self._user_rows[user] if user is not None else array('I')
+            end = len(rows) if before is None else bisect_left(rows, before)
+            start = max(0, end - limit)
+            page = rows[start:end]
+            answers = [
+                {
+                    'cursor': row,
+                    'questionId': self._unpack_question(self._questions[row]),
+                    'isCorrect': bool(self._correct[row]),
+                    'answeredAt': time.strftime(TIMESTAMP_FORMAT, time.localtime(self._times[row])),
+                }
+                for row in reversed(page)
+            ]
+            answered = len(rows)
+            correct = self._user_correct[user] if user is not None else 0
+        return {
+            'answers': answers,
+            'nextCursor': page[0] if start > 0 else None,
+            'answered': answered,
+            'correct': correct,
+            'accuracy': round(correct / answered, 4) if answered else None,
+        }
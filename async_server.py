@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+import asyncio
+import http.client
+import io
+import os
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from responses import JSON_TYPE, build_response, error_body
+from score_stream import HEARTBEAT
+
+DEFAULT_BACKLOG = 1024
+# Request line plus headers; larger heads get 431
+MAX_HEAD_SIZE = 64 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+
+_CLOSE = b'Connection: close\r\n'
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def parse_head(head):
+    """Return (method, target, version, headers) from the bytes up to the blank line"""
+    line_end = head.find(b'\r\n')
+    try:
+        method, target, version = head[:line_end].decode('latin-1').split(' ')
+    except ValueError:
+        raise BadRequest(400, 'Bad request line')
+    if version not in ('HTTP/1.0', 'HTTP/1.1'):
+        raise BadRequest(505, 'HTTP version not supported')
+    try:
+        headers = http.client.parse_headers(io.BytesIO(head[line_end + 2:]))
+    except http.client.HTTPException:
+        raise BadRequest(400, 'Bad headers')
+    return method, target, version, headers
+
+
+def wants_keep_alive(version, headers):
+    connection = (headers.get('Connection') or '').lower()
+    if version == 'HTTP/1.1':
+        return 'close' not in connection
+    return 'keep-alive' in connection
+
+
+class _ResponseConnection:
+    """Stands in for the client socket inside a handler: sendfile lands in the response buffer"""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def sendfile(self, file, offset=0, count=None):
+        file.seek(offset)
+        self._wfile.write(file.read(count) if count is not None else file.read())
+
+
+class AsyncServer:
+    """Serves a BaseHTTPRequestHandler subclass from an asyncio event loop.
+
+    The loop reads and frames requests (a request line, headers and a
+    Content-Length body; no chunked uploads) and keeps idle connections
+    open without a thread each. Each request is then run through the
+    handler's own do_GET/do_POST against in-memory buffers, so every route
+    is shared with the threaded servers. Handlers run on the loop thread,
+    or on `handler_threads` worker threads when they may block (SQLite,
+    --wal-sync always). A handler that opens an event stream leaves its
+    subscription in `event_stream`, and the loop keeps writing to it.
+    """
+
+    # Handlers hand event streams to the loop instead of blocking on them
+    takes_event_streams = True
+
+    def __init__(self, server_address, handler_class, handler_threads=0,
+                 idle_timeout=None, max_requests=None, backlog=DEFAULT_BACKLOG):
+        self.RequestHandlerClass = handler_class
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.handler_threads = handler_threads
+        self.backlog = backlog
+        self.connections = 0
+        # Bind now so a busy port fails at startup like the socketserver modes
+        self.socket = socket.create_server(server_address, backlog=backlog)
+        # The bound address, like socketserver: port 0 becomes the port actually taken
+        self.server_address = self.socket.getsockname()[:2]
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server_close()
+
+    def server_close(self):
+        self.socket.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def serve_forever(self):
+        _raise_file_limit()
+        if self.handler_threads:
+            self._executor = ThreadPoolExecutor(self.handler_threads, thread_name_prefix='quiz-async-handler')
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._connection, sock=self.socket, limit=MAX_HEAD_SIZE,
+                                            backlog=self.backlog)
+        async with server:
+            await server.serve_forever()
+
+    def _reply(self, writer, status, message):
+        writer.write(build_response(status, error_body(message), server='', protocol='HTTP/1.1',
+                                    extra_headers=_CLOSE))
+
+    async def _connection(self, reader, writer):
+        self.connections += 1
+        peer = writer.get_extra_info('peername') or ('', 0)
+        handled = 0
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.idle_timeout)
+                except asyncio.LimitOverrunError:
+                    self._reply(writer, 431, 'Request header fields too large')
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                try:
+                    method, target, version, headers = parse_head(head)
+                    if headers.get('Transfer-Encoding'):
+                        raise BadRequest(501, 'Chunked request bodies are not supported')
+                    length = int(headers.get('Content-Length') or 0)
+                    if not 0 <= length <= MAX_BODY_SIZE:
+                        raise BadRequest(413, 'Request body too large')
+                except ValueError:
+                    self._reply(writer, 400, 'Bad Content-Length')
+                    break
+                except BadRequest as e:
+                    self._reply(writer, e.status, e.message)
+                    break
+                try:
+                    body = await asyncio.wait_for(reader.readexactly(length), self.idle_timeout) \
+                        if length else b''
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                handled += 1
+                keep_alive = wants_keep_alive(version, headers) and \
+                    (self.max_requests is None or handled < self.max_requests)
+                request = (method, target, version, headers, body, peer, keep_alive)
+                if self._executor is not None:
+                    loop = asyncio.get_running_loop()
+                    response, keep_alive, stream = await loop.run_in_executor(self._executor, self.handle,
+                                                                              *request)
+                else:
+                    response, keep_alive, stream = self.handle(*request)
+                writer.write(response)
+                if stream is not None:
+                    await self._stream(stream, writer)
+                    break
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _stream(self, subscription, writer):
+        """Write a score_stream.Subscription's events until it closes or the client goes"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        subscription.set_waker(lambda: loop.call_soon_threadsafe(ready.set))
+        heartbeat = self.RequestHandlerClass.stream_heartbeat
+        try:
+            while True:
+                # A client that stops reading leaves drain() waiting; give up after two heartbeats
+                await asyncio.wait_for(writer.drain(), heartbeat * 2)
+                try:
+                    await asyncio.wait_for(ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    pass
+                ready.clear()
+                events = subscription.take()
+                if events is None:
+                    break
+                writer.write(b''.join(events) if events else HEARTBEAT)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            subscription.close()
+
+    def handle(self, method, target, version, headers, body, peer, keep_alive):
+        """Run one request through the handler class.
+
+        Returns (response bytes, keep_alive, event stream subscription or None).
+        """
+        handler = object.__new__(self.RequestHandlerClass)
+        handler.server = self
+        handler.client_address = peer
+        handler.directory = os.getcwd()
+        handler.rfile = io.BytesIO(body)
+        handler.wfile = io.BytesIO()
+        handler.connection = _ResponseConnection(handler.wfile)
+        handler.command, handler.path, handler.request_version = method, target, version
+        handler.requestline = f'{method} {target} {version}'
+        handler.headers = headers
+        handler.close_connection = not keep_alive
+        try:
+            do = getattr(handler, 'do_' + method, None)
+            if do is None:
+                handler.send_error(501, f'Unsupported method ({method!r})')
+            else:
+                do()
+        except Exception as e:
+            print(f"async handler error: {method} {target}: {e!r}", file=sys.stderr)
+            return build_response(500, error_body('Internal server error'), JSON_TYPE,
+                                  handler.version_string(), 'HTTP/1.1', _CLOSE), False, None
+        return handler.wfile.getvalue(), not handler.close_connection, getattr(handler, 'event_stream', None)
+
+
+def _raise_file_limit():
+    # Each idle connection is one file descriptor; the usual soft limit of 1024 is too low
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Request-path cost of access logging: print() to a pipe versus AccessLog.record().
+
+    python benchmarks/bench_access_log.py [--requests 100000] [--threads 8]
+
+Each thread logs --requests / --threads lines. print() goes to a pipe
+drained by a slow reader (like a terminal or log collector), so writers
+queue behind it; record() only appends to the in-memory queue. A burst
+this fast outruns the writer thread, so some records show up as dropped:
+that is the queue bounding memory instead of stalling requests.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from access_log import AccessLog  # noqa: E402
+
+
+def timed(threads, count, log_one):
+    per_thread = count // threads
+    latencies = []
+
+    def work():
+        mine = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            log_one(i)
+            mine.append(time.perf_counter() - start)
+        latencies.extend(mine)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.999)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    read_fd, write_fd = os.pipe()
+    out = os.fdopen(write_fd, 'w', buffering=1, encoding='utf-8')
+
+    def slow_reader():
+        while os.read(read_fd, 4096):
+            time.sleep(0.0001)
+
+    threading.Thread(target=slow_reader, daemon=True).start()
+    results = {'print': timed(args.threads, args.requests, lambda i: print(
+        f"✅ 回答提出: {i} (正解) - スコア: +10", file=out))}
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = AccessLog(os.path.join(directory, 'access.jsonl')).start()
+        results['AccessLog.record'] = timed(args.threads, args.requests, lambda i: log.record(
+            'POST', '/api/answers', 200, 0.0004, 'user_1700000000_1234'))
+        log.close()
+        results['AccessLog.record'] += (log.written, log.dropped)
+
+    for name, (elapsed, p50, p999, *counts) in results.items():
+        extra = f", written {counts[0]:,}, dropped {counts[1]:,}" if counts else ''
+        print(f"{name:17s} {args.requests / elapsed:10,.0f} lines/s  p50 {p50 * 1e6:6.1f} us  "
+              f"p99.9 {p999 * 1e6:8.1f} us{extra}")
+
+
+if __name__ == '__main__':
+    main()
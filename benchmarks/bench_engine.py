@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for question generation, grading, ranking and adaptive selection.
+
+    python benchmarks/bench_engine.py [--filter grade] [--repeat 5]
+    python benchmarks/bench_engine.py --save              # record new baselines
+    python benchmarks/bench_engine.py --compare           # exit 1 on a regression
+
+Each case is timed timeit-style, best of 20 x --repeat runs of about
+0.01 s each, and reported in ns per call. --save writes the results to
+benchmarks/baselines/engine.json (or the given path), keeping recorded
+cases that --filter skipped; --compare reads it back and fails when a
+case got slower by more than --threshold (default 0.25, i.e. 25%).
+
+Runs of each case alternate with runs of a fixed pure-Python calibration
+loop that does not touch the code under test, and the baseline keeps the
+calibration time next to each result, along with the CPU model and count.
+--compare scales the recorded figures by how much faster or slower the
+calibration ran here (the median over all cases), so a baseline from
+another machine, or a run during a burst of load from other processes,
+still shows real regressions instead of the difference in speed. A case
+over the threshold is measured again, up to 3 more times, and is only
+reported if it stays over. Scaling cannot even out a different Python
+version, which is reported.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from adaptive import AdaptiveDifficulty  # noqa: E402
+from grading import GradingError, grade_batch  # noqa: E402
+from question_bank import QuestionBank  # noqa: E402
+from question_pool import MathQuestionPool  # noqa: E402
+from question_tokens import QuestionTokens  # noqa: E402
+from quiz_engine import (LANGUAGE_QUESTIONS, check_answer, generate_language_question,  # noqa: E402
+                         generate_math_question, generate_question, update_rank)
+
+RECHECKS = 3
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'engine.json')
+
+
+def build_cases():
+    """[(name, zero-argument callable)] for every benchmarked function"""
+    random.seed(1)
+    bank = QuestionBank.load()
+    pool = MathQuestionPool()
+    tokens = QuestionTokens('bench-secret')
+
+    math_question = generate_math_question(2)
+    language_question = generate_language_question(1)
+    token = tokens.issue(math_question)
+    questions = {f'q{i}': generate_math_question(1 + i % 2) for i in range(10)}
+    batch = [(question_id, question['answer'] if i % 3 else '0')
+             for i, (question_id, question) in enumerate(questions.items())]
+
+    def grade(question_id, user_answer):
+        question = questions.get(question_id)
+        if question is None:
+            raise GradingError(404, 'Question not found')
+        return question['type'], check_answer(question, user_answer)
+
+    # Populated like a large school, so the per-user dict lookups are not all cache hits
+    adaptive = AdaptiveDifficulty()
+    user_ids = [f'user_{1700000000 + i}_{1000 + i % 9000}' for i in range(100000)]
+    for i, user_id in enumerate(user_ids):
+        adaptive.record(user_id, 'math' if i % 2 else 'language', i % 3 != 0)
+    sample_ids = random.sample(user_ids, 1000)
+    next_id = itertools.cycle(sample_ids).__next__
+
+    users = [{'totalScore': score} for score in range(0, 200, 10)]
+    user_cycle = users * 50
+
+    def rank_all():
+        for user in user_cycle:
+            update_rank(user)
+
+    cases = []
+    for difficulty in (1, 2):
+        cases.append((f'generate/math/difficulty={difficulty}', lambda d=difficulty: generate_math_question(d)))
+        cases.append((f'generate/math-pool/difficulty={difficulty}',
+                      lambda d=difficulty: generate_math_question(d, pool)))
+    cases.append(('generate/language/fallback', lambda: generate_language_question(1)))
+    if bank.has('language'):
+        cases.append(('generate/language/bank', lambda: generate_language_question(1, bank)))
+    for subtype in bank.subtypes('math')[:1]:
+        cases.append((f'generate/math-subtype/{subtype}', lambda s=subtype: generate_question('math', 1, s, bank=bank)))
+    cases += [
+        ('grade/math/correct', lambda: check_answer(math_question, f" {math_question['answer']} ")),
+        ('grade/math/wrong', lambda: check_answer(math_question, '-1')),
+        ('grade/language/correct', lambda: check_answer(language_question, language_question['answer'])),
+        ('grade/language/wrong', lambda: check_answer(language_question, LANGUAGE_QUESTIONS[0]['options'][1])),
+        ('grade/token/math', lambda: tokens.check(token, math_question['answer'])),
+        ('grade/batch/10', lambda: grade_batch(grade, batch)),
+        # One call ranks 1000 users, so the per-call figure is per 1000
+        ('rank/update_rank x1000', rank_all),
+        ('adaptive/record', lambda: adaptive.record(next_id(), 'math', True)),
+        ('adaptive/choose', lambda: adaptive.choose(next_id())),
+    ]
+    return cases
+
+
+def _calibration_loop():
+    # Dict, string and call-heavy like the cases, but independent of the code under test
+    table = {}
+    total = 0
+    for i in range(200):
+        key = f'k{i % 50}'
+        table[key] = table.get(key, 0) + i
+        total += len(str(i))
+    return total
+
+
+def hardware():
+    """{'cpu': model name, 'cpus': count} for the baseline file"""
+    cpu = platform.processor()
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return {'cpu': cpu or platform.machine(), 'cpus': os.cpu_count()}
+
+
+def _loop_count(timer, seconds):
+    number, elapsed = timer.autorange()
+    return max(1, int(number * seconds / elapsed))
+
+
+def measure(func, repeat):
+    """(ns per call of func, ns per calibration loop), best of many short alternating runs"""
+    timers = [timeit.Timer(func), timeit.Timer(_calibration_loop)]
+    # 20 runs of 0.01 s per --repeat: short enough for some to land between
+    # bursts of load from other processes, which the minimum then picks out
+    numbers = [_loop_count(timer, 0.01) for timer in timers]
+    best = [float('inf')] * len(timers)
+    for _ in range(repeat * 20):
+        # Back to back, so both see whatever else the machine is doing at the time
+        for i, timer in enumerate(timers):
+            best[i] = min(best[i], timer.timeit(numbers[i]) / numbers[i])
+    return tuple(seconds * 1e9 for seconds in best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', default='', help='only cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, default=None, metavar='PATH',
+                        help='write the results as the new baseline')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, default=None, metavar='PATH',
+                        help='compare against a saved baseline and exit 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown as a fraction of the baseline (default: 0.25)')
+    args = parser.parse_args()
+
+    machine = hardware()
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('python') != platform.python_version():
+            print(f"note: baseline recorded on Python {baseline.get('python')}; "
+                  f"this is {platform.python_version()}")
+        if baseline.get('cpu') != machine['cpu'] or baseline.get('cpus') != machine['cpus']:
+            print(f"note: baseline recorded on {baseline.get('cpu', baseline.get('machine'))} "
+                  f"({baseline.get('cpus', '?')} CPUs); this is {machine['cpu']} ({machine['cpus']} CPUs)")
+        if not baseline.get('calibration'):
+            print('note: baseline has no calibration times; figures are compared unscaled')
+
+    results = {}
+    calibration = {}
+    cases = [(name, func) for name, func in build_cases() if args.filter in name]
+    for name, func in cases:
+        ns, calibration_ns = measure(func, args.repeat)
+        results[name] = round(ns, 1)
+        calibration[name] = round(calibration_ns, 1)
+
+    # How much slower this run is than the baseline's, from the calibration
+    # timed alongside every case; the median shrugs off a burst of load
+    ratios = sorted(calibration[name] / baseline['calibration'][name] for name in results
+                    if baseline and name in baseline.get('calibration', {}))
+    scale = ratios[len(ratios) // 2] if ratios else 1.0
+    old = {name: baseline['results'][name] * scale for name in results
+           if baseline and baseline['results'].get(name)}
+    # A case only counts as slower if it stays slower when measured again later
+    for _ in range(RECHECKS):
+        for name, func in cases:
+            if name in old and results[name] / old[name] - 1 > args.threshold:
+                results[name] = min(results[name], round(measure(func, args.repeat)[0], 1))
+
+    regressions = []
+    for name, ns in results.items():
+        line = f"{name:40s} {ns:12,.1f} ns"
+        if name in old:
+            change = ns / old[name] - 1
+            line += f"  {change:+7.1%} vs {old[name]:,.1f}"
+            if change > args.threshold:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print(line)
+    if ratios:
+        print(f"baseline figures scaled by {scale:.2f} for this machine's speed")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        if os.path.exists(args.save):
+            with open(args.save, encoding='utf-8') as f:
+                saved = json.load(f)
+            # Skipped cases keep their own calibration time, so they stay comparable
+            results = dict(saved['results'], **results)
+            calibration = dict(saved.get('calibration', {}), **calibration)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'cpu': machine['cpu'], 'cpus': machine['cpus'], 'unit': 'ns per call',
+                       'results': results, 'calibration': calibration}, f, indent=2)
+            f.write('\n')
+        print(f"baseline written to {args.save}")
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Request latency and server memory while thousands of idle connections stay open.
+
+    python benchmarks/bench_idle_connections.py [--idle 10000] [--requests 500] [--mode async]
+
+Starts main.py, opens --idle connections that never send a request
+(a classroom of tablets left on the quiz page), then times requests
+from one more client. In thread/pool mode run with --keep-alive the
+idle connections each hold a thread; in async mode they hold a socket.
+"""
+
+import argparse
+import http.client
+import os
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def wait_for(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def resident_mib(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--idle', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--port', type=int, default=3098)
+    parser.add_argument('--mode', default='async', help='server --mode')
+    args = parser.parse_args()
+
+    # The client side needs a descriptor per idle connection too
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    command = [sys.executable, 'main.py', '--port', str(args.port), '--mode', args.mode,
+               '--idle-timeout', '600']
+    if args.mode != 'async':
+        command.append('--keep-alive')
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    idle = []
+    try:
+        wait_for(args.port)
+        before = resident_mib(server.pid)
+        for _ in range(min(args.idle, hard - 64)):
+            idle.append(socket.create_connection(('127.0.0.1', args.port)))
+        time.sleep(0.5)
+
+        conn = http.client.HTTPConnection('127.0.0.1', args.port)
+        latencies = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            conn.request('GET', '/api/questions/generate?type=math')
+            conn.getresponse().read()
+            latencies.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        print(f"{args.mode}: {len(idle)} idle connections, server RSS {before:.1f} -> "
+              f"{resident_mib(server.pid):.1f} MiB, request p50 {percentile(latencies, 50):.2f} ms  "
+              f"p99 {percentile(latencies, 99):.2f} ms")
+    finally:
+        for sock in idle:
+            sock.close()
+        server.send_signal(signal.SIGINT)
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
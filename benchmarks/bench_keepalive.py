@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Request latency with and without connection reuse for a student answering 50 questions.
+
+    python benchmarks/bench_keepalive.py [--sessions 20] [--questions 50] [--port 3099]
+
+Starts main.py with --keep-alive, then runs each session twice: once
+opening a new TCP connection per request (what HTTP/1.0 forces) and
+once over a single kept-alive connection.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Client:
+    def __init__(self, port, reuse):
+        self.port = port
+        self.reuse = reuse
+        self.conn = None
+        self.latencies = []
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        start = time.perf_counter()
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port)
+        self.conn.request(method, path, body, headers)
+        response = self.conn.getresponse()
+        data = response.read()
+        if not self.reuse or response.will_close:
+            self.conn.close()
+            self.conn = None
+        self.latencies.append(time.perf_counter() - start)
+        return json.loads(data)
+
+    def session(self, questions):
+        user = self.request('POST', '/api/users', {'name': 'bench'})
+        for _ in range(questions):
+            question = self.request('GET', '/api/questions/generate?type=math')
+            self.request('POST', '/api/answers', {'userId': user['id'], 'questionId': question['id'],
+                                                  'answer': question['answer']})
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def wait_for(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/health')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--port', type=int, default=3099)
+    parser.add_argument('--mode', default='thread', help='server --mode')
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, 'main.py', '--port', str(args.port), '--mode', args.mode, '--keep-alive'],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(args.port)
+        for label, reuse in (('new connection per request', False), ('kept-alive connection', True)):
+            client = Client(args.port, reuse)
+            start = time.perf_counter()
+            for _ in range(args.sessions):
+                client.session(args.questions)
+            elapsed = time.perf_counter() - start
+            ms = [latency * 1000 for latency in client.latencies]
+            print(f"{label:28s} p50 {percentile(ms, 50):6.2f} ms  p95 {percentile(ms, 95):6.2f} ms  "
+                  f"p99 {percentile(ms, 99):6.2f} ms  session {elapsed / args.sessions * 1000:7.1f} ms")
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
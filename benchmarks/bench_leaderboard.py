@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Leaderboard update, top-N and position latency for a large user base.
+
+    python benchmarks/bench_leaderboard.py [--users 1000000] [--queries 10000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Leaderboard  # noqa: E402
+
+
+def user(i, total, math):
+    return {'id': f"user_bench_{i}", 'name': f"student{i}",
+            'totalScore': total, 'mathScore': math, 'languageScore': total - math}
+
+
+def per_call_us(fn, count):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    board = Leaderboard()
+    scores = [random.randrange(0, 2000) * 10 for _ in range(args.users)]
+    start = time.perf_counter()
+    for i, total in enumerate(scores):
+        board.update(user(i, total, total // 2))
+    print(f"load {args.users:,} users: {time.perf_counter() - start:.1f}s")
+
+    def answer(i):
+        n = random.randrange(args.users)
+        scores[n] += 10
+        board.update(user(n, scores[n], scores[n] // 2))
+
+    print(f"score update:     {per_call_us(answer, args.queries):8.1f} us")
+    print(f"top {args.limit:<3d} (total):  {per_call_us(lambda i: board.top('total', args.limit), args.queries):8.1f} us")
+    print(f"top {args.limit:<3d} (math):   {per_call_us(lambda i: board.top('math', args.limit), args.queries):8.1f} us")
+    print(f"user position:    "
+          f"{per_call_us(lambda i: board.position(f'user_bench_{i % args.users}'), args.queries):8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Per-request cost of recording route metrics, and the cost of a scrape.
+
+    python benchmarks/bench_metrics.py [--observations 200000] [--threads 8]
+
+Compares Metrics.observe (per-thread shards, no lock) with the same
+histogram update done under one shared lock.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import _BUCKETS, _SUM, Metrics, bucket_index  # noqa: E402
+
+ROUTES = ['/api/health', '/api/questions/generate', '/api/answers', '/api/users/{user_id}/answers']
+
+
+class LockedHistograms:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, method, route, status, seconds):
+        micros = int(seconds * 1e6)
+        with self.lock:
+            counts = self.histograms.get((method, route))
+            if counts is None:
+                counts = self.histograms[(method, route)] = array('Q', bytes(8 * (_BUCKETS + 1)))
+            counts[bucket_index(micros)] += 1
+            counts[_SUM] += micros
+
+
+def run(observe, threads, observations):
+    samples = [(random.choice(ROUTES), random.expovariate(2000)) for _ in range(1000)]
+    per_thread = observations // threads
+
+    def work():
+        for i in range(per_thread):
+            route, seconds = samples[i % 1000]
+            observe('GET', route, 200, seconds)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--observations', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    for threads in (1, args.threads):
+        metrics = Metrics()
+        sharded = run(metrics.observe, threads, args.observations)
+        locked = run(LockedHistograms().observe, threads, args.observations)
+        print(f"{threads} thread(s): observe {sharded:6.0f} ns/request (one shared lock: {locked:6.0f} ns)")
+
+    start = time.perf_counter()
+    body = metrics.render()
+    print(f"render: {(time.perf_counter() - start) * 1000:.2f} ms for {len(body):,} bytes")
+
+
+if __name__ == '__main__':
+    main()
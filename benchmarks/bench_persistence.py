@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Score journal write throughput and startup replay time.
+
+    python benchmarks/bench_persistence.py [--users 100000] [--events 10000000]
+
+Writes the users and answer events through ScoreJournal, then times
+recovery from the raw log, from a snapshot alone, and from a snapshot
+plus a 10% tail.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import ScoreJournal  # noqa: E402
+
+
+def new_user(i):
+    return {
+        'id': f"user_bench_{i}",
+        'name': f"student{i}",
+        'totalScore': 0,
+        'mathScore': 0,
+        'languageScore': 0,
+        'rank': '初心者',
+        'currentRank': 'bronze',
+    }
+
+
+def write_events(journal, user_ids, count):
+    increments = ({'math': 10}, {'language': 10}, {'math': 0})
+    for _ in range(count):
+        journal.scores_added(random.choice(user_ids), random.choice(increments))
+
+
+def timed_recover(directory):
+    journal = ScoreJournal(directory)
+    start = time.perf_counter()
+    users = journal.recover()
+    elapsed = time.perf_counter() - start
+    # Also waits for the snapshot recover() starts after replaying a log tail
+    journal.close()
+    return elapsed, users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--events', type=int, default=10000000)
+    parser.add_argument('--dir', default=None, help='data directory (default: a temp dir)')
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix='quiz-journal-')
+    try:
+        # Keep everything in one segment so the first recovery replays the raw log
+        journal = ScoreJournal(directory, segment_events=10 ** 12, snapshot_interval=10 ** 9)
+        journal.recover()
+        user_ids = [new_user(i)['id'] for i in range(args.users)]
+
+        start = time.perf_counter()
+        for i in range(args.users):
+            journal.user_created(new_user(i))
+        tail = args.events // 10
+        write_events(journal, user_ids, args.events - tail)
+        journal.flush()
+        elapsed = time.perf_counter() - start
+        total = args.users + args.events - tail
+        print(f"append: {total:,} events in {elapsed:.2f}s ({total / elapsed:,.0f} events/s, "
+              f"{journal.commits} group commits)")
+        journal.close()
+
+        elapsed, users = timed_recover(directory)
+        print(f"recover from log only: {elapsed:.2f}s ({len(users):,} users)")
+
+        # That recovery folded the replayed log into a snapshot
+        elapsed, users = timed_recover(directory)
+        print(f"recover from snapshot: {elapsed:.2f}s")
+
+        journal = ScoreJournal(directory, segment_events=10 ** 12, snapshot_interval=10 ** 9)
+        journal.recover()
+        write_events(journal, user_ids, tail)
+        journal.close()
+        elapsed, users = timed_recover(directory)
+        print(f"recover from snapshot + {tail:,} event tail: {elapsed:.2f}s")
+        print(f"sum of scores: {sum(u['totalScore'] for u in users):,}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Math questions per second: on-demand generation vs. the pre-generated pool.
+
+    python benchmarks/bench_question_pool.py [--count N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import question_pool  # noqa: E402
+from question_pool import MathQuestionPool  # noqa: E402
+from quiz_engine import generate_math_question  # noqa: E402
+
+
+def rate(generate, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        generate()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200000)
+    args = parser.parse_args()
+
+    pool = MathQuestionPool()
+
+    print(f"numpy: {'yes' if question_pool.np is not None else 'no (stdlib fallback)'}")
+    for difficulty in (1, 2):
+        before = rate(lambda: generate_math_question(difficulty), args.count)
+        after = rate(lambda: pool.pop(difficulty), args.count)
+        # Pool large enough that no refill runs: the cost left on the request path
+        warm = MathQuestionPool(block_size=args.count, low_water=0)
+        pop_only = rate(lambda: warm.pop(difficulty), args.count)
+        print(f"difficulty {difficulty}: on-demand {before:,.0f} q/s, "
+              f"pool with refills {after:,.0f} q/s ({after / before:.2f}x), "
+              f"pop only {pop_only:,.0f} q/s ({pop_only / before:.2f}x)")
+
+    start = time.perf_counter()
+    MathQuestionPool()
+    print(f"initial fill: {(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"refills: {pool.refills}, inline misses: {pool.misses}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Requests per second per API endpoint, measured inside the handler (no sockets).
+
+    python benchmarks/bench_responses.py [--count N]
+
+Each request is parsed and answered by WebAppHandler against in-memory
+buffers, so the numbers isolate routing, JSON encoding and response
+writing from network cost.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import WebAppHandler  # noqa: E402
+import responses  # noqa: E402
+
+
+class _Server:
+    server_name = 'bench'
+    server_port = 0
+
+
+class BenchHandler(WebAppHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def request(method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else b''
+    head = f'{method} {path} HTTP/1.0\r\nContent-Length: {len(data)}\r\n' \
+           'Content-Type: application/json\r\n\r\n'
+    return head.encode() + data
+
+
+def handle(raw):
+    handler = object.__new__(BenchHandler)
+    handler.rfile = io.BytesIO(raw)
+    handler.wfile = io.BytesIO()
+    handler.client_address = ('127.0.0.1', 0)
+    handler.server = _Server()
+    handler.close_connection = True
+    handler.handle_one_request()
+    return handler.wfile.getvalue()
+
+
+def rate(raws, count):
+    start = time.perf_counter()
+    for i in range(count):
+        handle(raws[i % len(raws)])
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000)
+    args = parser.parse_args()
+
+    # Print-free handler paths only: silence the per-request print() lines
+    sys.stdout, stdout = io.StringIO(), sys.stdout
+    try:
+        user = json.loads(handle(request('POST', '/api/users', {'name': 'bench'})).split(b'\r\n\r\n', 1)[1])
+        questions = [json.loads(handle(request('GET', '/api/questions/generate?type=math'))
+                                .split(b'\r\n\r\n', 1)[1]) for _ in range(1000)]
+        answers = [request('POST', '/api/answers', {'userId': user['id'], 'questionId': q['id'],
+                                                    'answer': q['answer']}) for q in questions]
+        endpoints = [
+            ('GET /api/health', [request('GET', '/api/health')]),
+            ('GET /api/questions/generate?type=math', [request('GET', '/api/questions/generate?type=math')]),
+            ('GET /api/questions/generate?type=language',
+             [request('GET', '/api/questions/generate?type=language')]),
+            ('GET /api/questions/generate?count=10', [request('GET', '/api/questions/generate?count=10')]),
+            ('POST /api/answers', answers),
+            ('POST /api/answers (invalid JSON)', [b'POST /api/answers HTTP/1.0\r\nContent-Length: 1\r\n\r\n{']),
+            ('GET /api/leaderboard', [request('GET', '/api/leaderboard')]),
+        ]
+        results = [(name, rate(raws, args.count)) for name, raws in endpoints]
+    finally:
+        sys.stdout = stdout
+
+    print(f"json encoder: {'orjson' if responses.orjson is not None else 'stdlib json'}")
+    for name, per_second in results:
+        print(f"{name:45s} {per_second:10,.0f} req/s")
+
+
+if __name__ == '__main__':
+    main()
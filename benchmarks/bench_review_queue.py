@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Memory and per-call cost of the review schedule at school-district scale.
+
+    python benchmarks/bench_review_queue.py [--students 100000] [--missed 20] [--count 10]
+
+Schedules --missed wrong answers for each of --students users, then times
+answer updates and fetches of --count due items for random users, and
+reports the traced memory per user.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_engine import QuestionKeys, generate_math_question  # noqa: E402
+from review_queue import ReviewQueue  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--missed', type=int, default=20, help='scheduled questions per student')
+    parser.add_argument('--count', type=int, default=10, help='items per review fetch')
+    parser.add_argument('--calls', type=int, default=100000)
+    args = parser.parse_args()
+
+    keys = QuestionKeys()
+    question_keys = [keys.key(generate_math_question(1 + i % 2)) for i in range(2000)]
+    user_ids = [f'user_{1700000000 + i}_{1000 + i % 9000}' for i in range(args.students)]
+
+    tracemalloc.start()
+    queue = ReviewQueue()
+    now = 1000
+    for user_id in user_ids:
+        for key in random.sample(question_keys, args.missed):
+            queue.answered(user_id, key, False, now=now)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{args.students:,} students x {args.missed} items: {used / 2**20:.1f} MiB "
+          f"({used / args.students:.0f} bytes per student, {used / args.students / args.missed:.0f} per item)")
+
+    picks = [random.choice(user_ids) for _ in range(args.calls)]
+    start = time.perf_counter()
+    for i, user_id in enumerate(picks):
+        queue.answered(user_id, question_keys[i % len(question_keys)], i % 3 == 0, now=now + 1)
+    answered = (time.perf_counter() - start) / args.calls * 1e6
+
+    due_at = now + 3600
+    start = time.perf_counter()
+    fetched = sum(len(queue.due(user_id, args.count, now=due_at)) for user_id in picks)
+    due = (time.perf_counter() - start) / args.calls * 1e6
+    print(f"answered(): {answered:.2f} us per call; due(count={args.count}): {due:.2f} us per call "
+          f"({fetched / args.calls:.1f} items per fetch)")
+
+    key_start = time.perf_counter()
+    question = generate_math_question(2)
+    for _ in range(args.calls):
+        keys.question(keys.key(question))
+    print(f"key + rebuild of a math question: {(time.perf_counter() - key_start) / args.calls * 1e6:.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Route lookup cost as the number of registered endpoints grows.
+
+    python benchmarks/bench_router.py [--lookups 200000]
+
+Registers the quiz API plus --extra dummy endpoints and times
+Router.find for a literal path, a parameterized path and a miss (the
+static file fallthrough), next to the if/elif chain it replaced, which
+tried every earlier branch first.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router import Router  # noqa: E402
+
+API_ROUTES = [
+    ('GET', '/api/health'),
+    ('GET', '/api/questions/generate'),
+    ('GET', '/api/leaderboard'),
+    ('GET', '/api/stream/scores'),
+    ('GET', '/api/users/{user_id}/position'),
+    ('GET', '/api/users/{user_id}/answers'),
+    ('GET', '/'),
+    ('GET', '/index.html'),
+    ('POST', '/api/users'),
+    ('POST', '/api/questions/generate'),
+    ('POST', '/api/answers'),
+    ('POST', '/api/answers/batch'),
+]
+
+PATHS = {
+    'literal': '/api/answers',
+    'parameter': '/api/users/user_1700000000_1234/answers',
+    'miss': '/assets/index-3f2a9c1b.js',
+}
+
+
+def handler(self, **params):
+    pass
+
+
+def chain(path, extra_paths):
+    # The shape of the old do_GET: every branch tested in turn
+    for i, extra in enumerate(extra_paths):
+        if path == extra:
+            return i
+    if path == '/api/health':
+        return 0
+    if path.startswith('/api/questions/generate'):
+        return 1
+    if path == '/api/leaderboard':
+        return 2
+    parts = path.split('/')
+    if len(parts) == 5 and parts[:3] == ['', 'api', 'users'] and parts[4] in ('position', 'answers'):
+        return 3
+    if path in ('/', '/index.html'):
+        return 4
+    return None
+
+
+def per_call_ns(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+
+    for extra in (0, 50, 200):
+        router = Router()
+        for method, pattern in API_ROUTES:
+            router.add(method, pattern, handler)
+        for i in range(extra):
+            router.add('GET', f'/api/extra/{i}', handler)
+            router.add('GET', f'/api/extra/{i}/items/{{item_id}}', handler)
+        extra_paths = [f'/api/extra/{i}' for i in range(extra)]
+        results = []
+        for label, path in PATHS.items():
+            routed = per_call_ns(lambda: router.find(path), args.lookups)
+            chained = per_call_ns(lambda: chain(path, extra_paths), args.lookups)
+            results.append(f"{label} {routed:5.0f} ns (chain {chained:6.0f} ns)")
+        print(f"{len(API_ROUTES) + 2 * extra:4d} routes: " + '  '.join(results))
+
+
+if __name__ == '__main__':
+    main()
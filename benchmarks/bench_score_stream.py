@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Cost of fanning score updates out to stream subscribers, and how much coalescing saves.
+
+    python benchmarks/bench_score_stream.py [--classes 30] [--students 30] [--teachers 2] [--updates 100000]
+
+Each update is published to its class's subscribers while a reader
+thread drains every subscription at --read-interval, like a teacher's
+browser that handles events in bursts.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from score_stream import ScoreBroker  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--classes', type=int, default=30)
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--teachers', type=int, default=2, help='subscribers per class')
+    parser.add_argument('--updates', type=int, default=100000)
+    parser.add_argument('--read-interval', type=float, default=0.05)
+    args = parser.parse_args()
+
+    broker = ScoreBroker()
+    subscriptions = [broker.subscribe(f'class{c}') for c in range(args.classes) for _ in range(args.teachers)]
+    users = [{'id': f'user_{c}_{s}', 'name': f'student{s}', 'classId': f'class{c}', 'totalScore': 0,
+              'mathScore': 0, 'languageScore': 0, 'rank': '初心者', 'currentRank': 'bronze'}
+             for c in range(args.classes) for s in range(args.students)]
+
+    delivered = 0
+    done = threading.Event()
+
+    def read():
+        nonlocal delivered
+        while not done.is_set():
+            time.sleep(args.read_interval)
+            for subscription in subscriptions:
+                delivered += len(subscription.take() or ())
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    start = time.perf_counter()
+    for i in range(args.updates):
+        user = random.choice(users)
+        user['totalScore'] += 10
+        user['mathScore'] += 10
+        broker.publish(user, i)
+    elapsed = time.perf_counter() - start
+    done.set()
+    reader.join()
+    for subscription in subscriptions:
+        delivered += len(subscription.take() or ())
+
+    offered = broker.published * args.teachers
+    print(f"publish: {elapsed / args.updates * 1e6:.2f} us per update "
+          f"({args.teachers} subscribers each, {args.updates / elapsed:,.0f} updates/s)")
+    print(f"events offered {offered:,}, delivered {delivered:,}, coalesced {broker.coalesced:,}, "
+          f"subscribers dropped {broker.dropped}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Answers per second: in-memory QuizStore vs. SqliteStore.
+
+    python benchmarks/bench_sqlite_store.py [--users 1000] [--answers 100000] [--threads 1,8]
+
+Each answer is what /api/answers does to the store: one score update
+plus one answer record.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import answer_record  # noqa: E402
+from quiz_store import QuizStore  # noqa: E402
+from sqlite_store import SqliteStore  # noqa: E402
+
+
+def new_user(i):
+    return {
+        'id': f"user_bench_{i}",
+        'name': f"student{i}",
+        'totalScore': 0,
+        'mathScore': 0,
+        'languageScore': 0,
+        'rank': '初心者',
+        'currentRank': 'bronze',
+        'rewards': [],
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+    }
+
+
+def answer(store, user_id, n):
+    is_correct = n % 3 != 0
+    increment = 10 if is_correct else 0
+    question_type = 'math' if n % 2 else 'language'
+    store.add_score(user_id, question_type, increment)
+    store.add_answers([answer_record(f"math_0_{n}", user_id, '42', is_correct, increment)])
+
+
+def run(store, user_ids, count, threads):
+    def work(offset):
+        for n in range(offset, count, threads):
+            answer(store, user_ids[n % len(user_ids)], n)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if hasattr(store, 'flush_answers'):
+        # Count the batched inserts as part of the work
+        store.flush_answers()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--answers', type=int, default=100000)
+    parser.add_argument('--threads', default='1,8', help='comma-separated thread counts')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='quiz-sqlite-')
+    try:
+        for threads in (int(t) for t in args.threads.split(',')):
+            memory = QuizStore()
+            sqlite = SqliteStore(os.path.join(directory, f'bench-{threads}.db'))
+            users = [new_user(i) for i in range(args.users)]
+            for user in users:
+                memory.add_user(dict(user))
+            sqlite.load_users(users)
+            user_ids = [user['id'] for user in users]
+
+            in_memory = run(memory, user_ids, args.answers, threads)
+            on_disk = run(sqlite, user_ids, args.answers, threads)
+            stored = sqlite.answer_count()
+            sqlite.close()
+            print(f"{threads:3d} threads: memory {in_memory:10,.0f}/s   sqlite {on_disk:10,.0f}/s   "
+                  f"({stored:,} answer rows)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
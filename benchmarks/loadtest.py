@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""Load test: simulated classroom sessions against a locally started quiz server.
+
+    python benchmarks/loadtest.py [--students 60] [--duration 30] [--think-time 1.0]
+                                  [--server main.py] [--server-args '--mode pool']
+                                  [--output loadtest.json] [--compare baseline.json]
+
+Starts the server (or uses --url), then runs one thread per student. Each
+student registers in a class, then answers --questions questions one at
+a time (fetch, think, submit), sometimes as a quiz set with one batch
+submission, and checks the leaderboard and their history between
+rounds, until --duration is over. Per-route throughput and
+p50/p95/p99 latency are printed and written as JSON to --output.
+
+With --compare, the run is checked against an earlier --output file and
+the exit status is 1 if any route's p95 latency or the overall throughput
+is worse by more than --threshold (a fraction, default 0.2); routes with
+fewer than --min-requests samples are skipped. Compare runs made with the
+same options on the same machine.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Share of answers that are correct, and of rounds done as a quiz set
+CORRECT_RATE = 0.7
+QUIZ_SET_RATE = 0.2
+QUIZ_SET_SIZE = 10
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def wait_for(host, port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request('GET', '/api/health')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+class Recorder:
+    """Latencies per route, shared by all student threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, route, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed):
+        routes = {}
+        total = errors = 0
+        for route, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            count = len(ordered)
+            failed = self.errors.get(route, 0)
+            total += count
+            errors += failed
+            routes[route] = {
+                'requests': count,
+                'errors': failed,
+                'throughput': round(count / elapsed, 2),
+                'mean_ms': round(sum(ordered) / count * 1000, 3),
+                'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+                'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+                'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+                'max_ms': round(ordered[-1] * 1000, 3),
+            }
+        return {
+            'requests': total,
+            'errors': errors,
+            'throughput': round(total / elapsed, 2),
+            'routes': routes,
+        }
+
+
+class Student:
+    def __init__(self, number, args, recorder, stop):
+        self.number = number
+        self.args = args
+        self.recorder = recorder
+        self.stop = stop
+        self.conn = None
+        self.rng = random.Random(args.seed * 100003 + number)
+
+    def request(self, method, path, route, payload=None):
+        """Send one request, timing it under `route`; returns the decoded JSON or None"""
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        start = time.perf_counter()
+        data = None
+        ok = False
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.args.host, self.args.port, timeout=30)
+            self.conn.request(method, path, body, headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+            ok = response.status < 400
+            if not self.args.keep_alive or response.will_close:
+                self.close()
+            if ok:
+                data = json.loads(raw)
+        except (OSError, http.client.HTTPException, ValueError):
+            self.close()
+        self.recorder.add(f'{method} {route}', time.perf_counter() - start, ok)
+        return data
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def think(self):
+        # Jittered so the students do not fall into lockstep
+        delay = self.args.think_time * self.rng.uniform(0.5, 1.5)
+        return self.stop.wait(delay) if delay > 0 else self.stop.is_set()
+
+    def answer_for(self, question):
+        if self.rng.random() < CORRECT_RATE:
+            return question['answer']
+        if question.get('options'):
+            return self.rng.choice(question['options'])
+        return str(self.rng.randint(0, 100))
+
+    def run(self):
+        class_id = f'class{self.number % self.args.classes}'
+        user = self.request('POST', '/api/users', '/api/users',
+                            {'name': f'student{self.number}', 'classId': class_id})
+        if user is None:
+            return
+        user_path = '/api/users/' + urllib.parse.quote(user['id'])
+        try:
+            while not self.stop.is_set():
+                if self.rng.random() < QUIZ_SET_RATE:
+                    self.quiz_set(user)
+                else:
+                    self.round(user)
+                if self.stop.is_set():
+                    break
+                self.request('GET', '/api/leaderboard?scope=total&limit=10', '/api/leaderboard')
+                self.request('GET', user_path + '/position', '/api/users/{user_id}/position')
+                self.request('GET', user_path + '/answers?limit=20', '/api/users/{user_id}/answers')
+                self.think()
+        finally:
+            self.close()
+
+    def round(self, user):
+        for _ in range(self.args.questions):
+            kind = self.rng.choice(('math', 'language'))
+            question = self.request('GET', f'/api/questions/generate?type={kind}&difficulty='
+                                    f'{self.rng.randint(1, 2)}', '/api/questions/generate')
+            if question is None or self.think():
+                return
+            self.request('POST', '/api/answers', '/api/answers',
+                         {'userId': user['id'], 'questionId': question['id'],
+                          'answer': self.answer_for(question)})
+
+    def quiz_set(self, user):
+        questions = self.request('GET', f'/api/questions/generate?type=math&count={QUIZ_SET_SIZE}',
+                                 '/api/questions/generate?count')
+        if not questions:
+            return
+        # The whole set is worked through before one submission
+        if self.stop.wait(self.args.think_time * len(questions) / 2):
+            return
+        answers = [{'questionId': q['id'], 'answer': self.answer_for(q)} for q in questions]
+        self.request('POST', '/api/answers/batch', '/api/answers/batch',
+                     {'userId': user['id'], 'answers': answers})
+
+
+def start_server(args):
+    command = [sys.executable, args.server, '--port', str(args.port)] + shlex.split(args.server_args)
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(args.host, args.port)
+    except RuntimeError:
+        server.kill()
+        raise
+    return server
+
+
+def run_load(args):
+    recorder = Recorder()
+    stop = threading.Event()
+    students = [Student(i, args, recorder, stop) for i in range(args.students)]
+    threads = []
+    start = time.perf_counter()
+    for student in students:
+        thread = threading.Thread(target=student.run, daemon=True)
+        thread.start()
+        threads.append(thread)
+        # Spread the logins over the ramp-up instead of one thundering herd
+        if args.ramp_up > 0:
+            time.sleep(args.ramp_up / args.students)
+    stop.wait(max(0.0, args.duration - (time.perf_counter() - start)))
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.perf_counter() - start)
+
+
+def compare(result, baseline, threshold, min_requests):
+    """Lines describing every regression beyond threshold (empty when none)"""
+    regressions = []
+    old, new = baseline['result']['throughput'], result['throughput']
+    if old and new < old * (1 - threshold):
+        regressions.append(f"throughput {old:,.1f} -> {new:,.1f} req/s")
+    for route, stats in result['routes'].items():
+        before = baseline['result']['routes'].get(route)
+        if not before or min(stats['requests'], before['requests']) < min_requests:
+            # Too few samples for a stable p95
+            continue
+        if stats['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{route} p95 {before['p95_ms']:.2f} -> {stats['p95_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=60, help='concurrent simulated students')
+    parser.add_argument('--classes', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load')
+    parser.add_argument('--ramp-up', type=float, default=2.0, help='seconds over which students join')
+    parser.add_argument('--think-time', type=float, default=1.0,
+                        help='mean seconds a student spends on a question')
+    parser.add_argument('--questions', type=int, default=10, help='questions per round')
+    parser.add_argument('--keep-alive', action='store_true', help='reuse each student\'s connection')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--server', default='main.py', help='server script to start')
+    parser.add_argument('--server-args', default='', help='extra server switches, e.g. "--mode pool"')
+    parser.add_argument('--url', default=None, help='test an already running server instead')
+    parser.add_argument('--port', type=int, default=3097)
+    parser.add_argument('--output', default='loadtest.json', help='where to write the JSON results')
+    parser.add_argument('--compare', default=None, metavar='BASELINE', help='earlier --output to check against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed fractional regression for --compare (default: 0.2)')
+    parser.add_argument('--min-requests', type=int, default=200,
+                        help='routes with fewer requests in either run are not compared (default: 200)')
+    args = parser.parse_args()
+    if args.students < 1 or args.classes < 1 or args.questions < 1 or args.duration <= 0:
+        parser.error('--students, --classes, --questions and --duration must be positive')
+
+    args.host = '127.0.0.1'
+    server = None
+    if args.url:
+        parsed = urllib.parse.urlsplit(args.url)
+        args.host, args.port = parsed.hostname, parsed.port or 80
+    else:
+        server = start_server(args)
+    try:
+        result = run_load(args)
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+    report = {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'options': {name: value for name, value in vars(args).items()
+                    if name not in ('output', 'compare', 'threshold', 'min_requests')},
+        'result': result,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+    print(f"{result['requests']:,} requests, {result['errors']:,} errors, "
+          f"{result['throughput']:,.1f} req/s ({args.students} students, {args.duration:g}s)")
+    for route, stats in result['routes'].items():
+        print(f"  {route:40s} {stats['requests']:7,d}  p50 {stats['p50_ms']:7.2f}  p95 {stats['p95_ms']:7.2f}  "
+              f"p99 {stats['p99_ms']:7.2f} ms  errors {stats['errors']}")
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold, args.min_requests)
+        if regressions:
+            print(f"regressions beyond {args.threshold:.0%} against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
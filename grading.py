@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import random
+import time
+
+from question_batch import BatchError
+
+SCORE_PER_CORRECT = 10
+MAX_ANSWER_BATCH = 100
+
+
+class GradingError(Exception):
+    """An answer could not be graded; carries the HTTP status to report"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def parse_answer_batch(data):
+    """Return (user_id, [(question_id, answer), ...]) from a batch submission.
+
+    Expects {"userId": "...", "answers": [{"questionId": "...", "answer": "..."}, ...]}.
+    """
+    if not isinstance(data, dict):
+        raise BatchError('Request body must be a JSON object')
+    user_id = data.get('userId')
+    answers = data.get('answers')
+    if not user_id or not isinstance(answers, list) or not answers:
+        raise BatchError('userId and a non-empty answers list are required')
+    # Ids are used as dict keys further on; a list or object would not hash
+    if not isinstance(user_id, str):
+        raise BatchError('userId must be a string')
+    if len(answers) > MAX_ANSWER_BATCH:
+        raise BatchError(f'At most {MAX_ANSWER_BATCH} answers per batch')
+    items = []
+    for item in answers:
+        if not isinstance(item, dict) or not item.get('questionId') or not item.get('answer'):
+            raise BatchError('Every answer needs questionId and answer')
+        if not isinstance(item['questionId'], str):
+            raise BatchError('questionId must be a string')
+        items.append((item['questionId'], item['answer']))
+    return user_id, items
+
+
+def grade_batch(grade, items):
+    """Grade every (question_id, answer) with `grade`.
+
+    `grade(question_id, answer)` returns (question_type, is_correct) or
+    raises GradingError. Returns the per-item results and the score
+    increments per question type, ready for a single store update.
+    Repeated question ids only count once.
+    """
+    results = []
+    increments = {}
+    seen = set()
+    for question_id, user_answer in items:
+        result = {'questionId': question_id, 'answer': user_answer}
+        if question_id in seen:
+            result.update({'error': 'Duplicate answer', 'status': 409})
+            results.append(result)
+            continue
+        seen.add(question_id)
+        try:
+            question_type, is_correct = grade(question_id, user_answer)
+        except GradingError as e:
+            result.update({'error': e.message, 'status': e.status})
+            results.append(result)
+            continue
+        score_increment = SCORE_PER_CORRECT if is_correct else 0
+        increments[question_type] = increments.get(question_type, 0) + score_increment
+        result.update({'isCorrect': is_correct, 'scoreIncrement': score_increment})
+        results.append(result)
+    return results, increments
+
+
+def answer_record(question_id, user_id, user_answer, is_correct, score_increment):
+    """The record of one graded answer, as returned by /api/answers"""
+    return {
+        'id': f"answer_{int(time.time())}_{random.randint(1000, 9999)}",
+        'questionId': question_id,
+        'userId': user_id,
+        'answer': user_answer,
+        'isCorrect': is_correct,
+        'scoreIncrement': score_increment,
+        'answeredAt': time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    }
+
+
+def answer_records(user_id, results):
+    """Records for every successfully graded item of a batch"""
+    return [
+        answer_record(r['questionId'], user_id, r['answer'], r['isCorrect'], r['scoreIncrement'])
+        for r in results if 'error' not in r
+    ]
+
+
+def summarize(results, increments):
+    """Totals for a graded batch"""
+    graded = [r for r in results if 'error' not in r]
+    return {
+        'answered': len(graded),
+        'correct': sum(1 for r in graded if r['isCorrect']),
+        'failed': len(results) - len(graded),
+        'scoreIncrement': sum(increments.values()),
+    }
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+import threading
+from array import array
+
+DEFAULT_LEADERBOARD_LIMIT = 10
+MAX_LEADERBOARD_LIMIT = 100
+
+# Leaderboard scope -> user field it ranks by
+SCOPES = {
+    'total': 'totalScore',
+    'math': 'mathScore',
+    'language': 'languageScore',
+}
+
+_INITIAL_CAPACITY = 1024
+
+
+class LeaderboardError(ValueError):
+    """Bad scope/limit parameters for a leaderboard query"""
+
+
+def parse_leaderboard_query(query):
+    """Return (scope, limit) from parse_qs output"""
+    scope = query.get('scope', ['total'])[0]
+    if scope not in SCOPES:
+        raise LeaderboardError(f"scope must be one of {', '.join(SCOPES)}")
+    try:
+        limit = int(query.get('limit', [DEFAULT_LEADERBOARD_LIMIT])[0])
+    except ValueError:
+        raise LeaderboardError('limit must be an integer')
+    if not 1 <= limit <= MAX_LEADERBOARD_LIMIT:
+        raise LeaderboardError(f'limit must be between 1 and {MAX_LEADERBOARD_LIMIT}')
+    return scope, limit
+
+
+class ScoreIndex:
+    """Users ordered by one non-negative integer score.
+
+    A Fenwick (binary indexed) tree counts users per score value, so the
+    number of users above a score and the next occupied score below one
+    are O(log S) for the highest score S. Users sharing a score sit in an
+    insertion-ordered bucket, which lists whoever reached it first first.
+    """
+
+    def __init__(self):
+        self._tree = array('q', bytes(8 * (_INITIAL_CAPACITY + 1)))
+        self._buckets = {}
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _grow(self, score):
+        capacity = len(self._tree) - 1
+        while capacity <= score:
+            capacity *= 2
+        tree = array('q', bytes(8 * (capacity + 1)))
+        # Linear-time build from the bucket sizes
+        for value, bucket in self._buckets.items():
+            tree[value + 1] += len(bucket)
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _add(self, score, delta):
+        tree = self._tree
+        i = score + 1
+        size = len(tree)
+        while i < size:
+            tree[i] += delta
+            i += i & -i
+
+    def _count_upto(self, score):
+        """Users with a score <= score"""
+        tree = self._tree
+        i = min(score + 1, len(tree) - 1)
+        count = 0
+        while i > 0:
+            count += tree[i]
+            i -= i & -i
+        return count
+
+    def _score_at(self, k):
+        """Lowest score s with at least k users scoring <= s (1 <= k <= len)"""
+        tree = self._tree
+        capacity = len(tree) - 1
+        position = 0
+        step = 1 << (capacity.bit_length() - 1)
+        while step:
+            nxt = position + step
+            if nxt <= capacity and tree[nxt] < k:
+                position = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return position
+
+    def set(self, user_id, score):
+        score = max(0, score)
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            bucket = self._buckets[old]
+            del bucket[user_id]
+            if not bucket:
+                del self._buckets[old]
+            self._add(old, -1)
+        if score >= len(self._tree) - 1:
+            self._grow(score)
+        self._buckets.setdefault(score, {})[user_id] = None
+        self._scores[user_id] = score
+        self._add(score, 1)
+
+    def position(self, user_id):
+        """(1-based position, score) with ties sharing a position, or None"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return len(self._scores) - self._count_upto(score) + 1, score
+
+    def top(self, limit):
+        """[(position, user_id, score), ...] for the highest `limit` users"""
+        leaders = []
+        remaining = len(self._scores)
+        while remaining and len(leaders) < limit:
+            score = self._score_at(remaining)
+            position = len(self._scores) - remaining + 1
+            bucket = self._buckets[score]
+            for user_id in bucket:
+                leaders.append((position, user_id, score))
+                if len(leaders) == limit:
+                    break
+            remaining -= len(bucket)
+        return leaders
+
+
+class Leaderboard:
+    """Rankings by total, math and language score, updated on every score change.
+
+    Each scope has its own lock. An update takes them one after another in
+    SCOPES order, acquiring the next before releasing the previous, so two
+    updates never overtake each other between scopes while up to three run
+    at once. Callers can therefore update outside their own locks: an
+    update carries a version that grows with each change to the user, and
+    one older than the last applied for that user is dropped.
+    """
+
+    def __init__(self):
+        self._scopes = {scope: (threading.Lock(), ScoreIndex()) for scope in SCOPES}
+        self._names = {}
+        # user id -> version of the last update applied, guarded by the first scope's lock
+        self._versions = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def update(self, user, version=None):
+        """Insert or re-rank a user dict carrying the score fields.
+
+        Without a version the update always applies, so concurrent calls
+        for one user must then be ordered by the caller.
+        """
+        user_id = user['id']
+        # Set before the user can be ranked, so top() always finds the name
+        self._names[user_id] = user['name']
+        held = None
+        try:
+            for scope, field in SCOPES.items():
+                lock, index = self._scopes[scope]
+                lock.acquire()
+                if held is None:
+                    if version is not None:
+                        if self._versions.get(user_id, -1) >= version:
+                            lock.release()
+                            return
+                        self._versions[user_id] = version
+                else:
+                    held.release()
+                held = lock
+                index.set(user_id, user[field])
+        finally:
+            if held is not None:
+                held.release()
+
+    def top(self, scope='total', limit=DEFAULT_LEADERBOARD_LIMIT):
+        lock, index = self._scopes[scope]
+        with lock:
+            leaders = index.top(limit)
+        return [
+            {'position': position, 'userId': user_id, 'name': self._names[user_id], 'score': score}
+            for position, user_id, score in leaders
+        ]
+
+    def position(self, user_id, scope='total'):
+        """{'position', 'score', 'users'} for the user, or None if unknown"""
+        lock, index = self._scopes[scope]
+        with lock:
+            found = index.position(user_id)
+        if found is None:
+            return None
+        return {'position': found[0], 'score': found[1], 'users': len(self._names)}
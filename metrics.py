@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from array import array
+
+import responses
+
+METRICS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets are log-linear, like an HDR histogram with two significant bits:
+# exact below 4 us, then four buckets per power of two (at most 25% wide) up to ~134 s
+_SUB_BUCKETS = 4
+_MAX_MICROS = (1 << 27) - 1
+# Prometheus `le` edges: each power of two from 32 us to ~33 s
+_EXPORT_OCTAVES = range(5, 26)
+
+
+def bucket_index(micros):
+    if micros < _SUB_BUCKETS:
+        return micros
+    micros = min(micros, _MAX_MICROS)
+    octave = micros.bit_length() - 1
+    return octave * _SUB_BUCKETS + ((micros >> (octave - 2)) & 3) - _SUB_BUCKETS
+
+
+_BUCKETS = bucket_index(_MAX_MICROS) + 1
+# Slot after the buckets holds the sum of observed microseconds
+_SUM = _BUCKETS
+
+
+def bucket_upper_bound(index):
+    """Exclusive upper edge of a bucket, in microseconds"""
+    if index < _SUB_BUCKETS:
+        return index + 1
+    octave, sub = divmod(index + _SUB_BUCKETS, _SUB_BUCKETS)
+    return (_SUB_BUCKETS + 1 + sub) << (octave - 2)
+
+
+# Bucket index whose upper edge is 2**octave us, for each exported edge
+_EXPORT_EDGES = [(octave, bucket_index((1 << octave) - 1)) for octave in _EXPORT_OCTAVES]
+
+
+class _ThreadShard:
+    __slots__ = ('thread', 'histograms', 'statuses')
+
+    def __init__(self, thread):
+        self.thread = thread
+        # (method, route) -> array of bucket counts plus the sum
+        self.histograms = {}
+        # (method, route, status) -> count
+        self.statuses = {}
+
+    def merge(self, other):
+        for key, counts in other.histograms.items():
+            mine = self.histograms.get(key)
+            if mine is None:
+                self.histograms[key] = array('Q', counts)
+            else:
+                for i, count in enumerate(counts):
+                    mine[i] += count
+        for key, count in other.statuses.items():
+            self.statuses[key] = self.statuses.get(key, 0) + count
+
+
+class Metrics:
+    """Per-route request counts, status codes and latency histograms.
+
+    observe() has the Router timing hook signature. Each thread records
+    into its own shard without taking a lock; a scrape sums the shards.
+    Shards of threads that have exited (thread-per-request mode makes
+    many) are folded into one, so memory stays proportional to the live
+    threads. Counts are per process.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = _ThreadShard(None)
+        self.started = time.time()
+
+    def _new_shard(self):
+        shard = self._local.shard = _ThreadShard(threading.current_thread())
+        with self._lock:
+            if len(self._shards) > 2 * threading.active_count() + 8:
+                self._retire_dead()
+            self._shards.append(shard)
+        return shard
+
+    def _retire_dead(self):
+        live = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                live.append(shard)
+            else:
+                # The thread is gone, so nothing writes to this shard any more
+                self._retired.merge(shard)
+        self._shards = live
+
+    def observe(self, method, route, status, seconds):
+        shard = getattr(self._local, 'shard', None) or self._new_shard()
+        key = (method, route or 'other')
+        counts = shard.histograms.get(key)
+        if counts is None:
+            counts = shard.histograms[key] = array('Q', bytes(8 * (_BUCKETS + 1)))
+        micros = int(seconds * 1e6)
+        counts[bucket_index(micros)] += 1
+        counts[_SUM] += micros
+        key += (status or 0,)
+        shard.statuses[key] = shard.statuses.get(key, 0) + 1
+
+    def snapshot(self):
+        """One shard holding the totals of every thread so far"""
+        total = _ThreadShard(None)
+        with self._lock:
+            self._retire_dead()
+            total.merge(self._retired)
+            shards = list(self._shards)
+        for shard in shards:
+            # Copying a dict is atomic under the GIL, so the owner may keep recording
+            copy = _ThreadShard(None)
+            copy.histograms = {key: array('Q', counts) for key, counts in list(shard.histograms.items())}
+            copy.statuses = dict(shard.statuses)
+            total.merge(copy)
+        return total
+
+    def render(self, samples=()):
+        """Prometheus text exposition of the request metrics plus extra samples"""
+        total = self.snapshot()
+        out = MetricsWriter()
+        out.family('quiz_requests_total', 'counter', 'Requests by route, method and status')
+        for (method, route, status), count in sorted(total.statuses.items()):
+            out.sample('quiz_requests_total', {'method': method, 'route': route, 'status': status}, count)
+        out.family('quiz_request_duration_seconds', 'histogram', 'Time spent in the route handler')
+        for (method, route), counts in sorted(total.histograms.items()):
+            labels = {'method': method, 'route': route}
+            cumulative = 0
+            done = 0
+            for octave, last in _EXPORT_EDGES:
+                cumulative += sum(counts[done:last + 1])
+                done = last + 1
+                out.sample('quiz_request_duration_seconds_bucket',
+                           dict(labels, le=repr((1 << octave) / 1e6)), cumulative)
+            count = sum(counts[:_BUCKETS])
+            out.sample('quiz_request_duration_seconds_bucket', dict(labels, le='+Inf'), count)
+            out.sample('quiz_request_duration_seconds_sum', labels, counts[_SUM] / 1e6)
+            out.sample('quiz_request_duration_seconds_count', labels, count)
+        out.family('process_start_time_seconds', 'gauge', 'Start time of the process since the epoch')
+        out.sample('process_start_time_seconds', {}, self.started)
+        for name, kind, help_text, values in samples:
+            out.family(name, kind, help_text)
+            for labels, value in values:
+                out.sample(name, labels, value)
+        return out.getvalue()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsWriter:
+    def __init__(self):
+        self._lines = []
+
+    def family(self, name, kind, help_text):
+        self._lines.append(f'# HELP {name} {help_text}\n# TYPE {name} {kind}\n')
+
+    def sample(self, name, labels, value):
+        if labels:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            self._lines.append(f'{name}{{{label_text}}} {value}\n')
+        else:
+            self._lines.append(f'{name} {value}\n')
+
+    def getvalue(self):
+        return ''.join(self._lines).encode('utf-8')
+
+
+def _cache_info_samples(prefix, help_name, info):
+    return [
+        (f'{prefix}_hits_total', 'counter', f'{help_name} hits', [({}, info.hits)]),
+        (f'{prefix}_misses_total', 'counter', f'{help_name} misses', [({}, info.misses)]),
+        (f'{prefix}_size', 'gauge', f'{help_name} entries', [({}, info.currsize)]),
+    ]
+
+
+def handler_samples(handler):
+    """Store sizes and cache statistics of a quiz request handler's shared state"""
+    store = handler.store
+    cache = store.questions.stats()
+    samples = [
+        ('quiz_global_questions', 'gauge', 'Issued questions held for grading',
+         [({}, store.question_count())]),
+        ('quiz_global_storage', 'gauge', 'Registered users', [({}, store.user_count())]),
+        ('quiz_question_cache_hits_total', 'counter', 'Answers that found their question',
+         [({}, cache['hits'])]),
+        ('quiz_question_cache_misses_total', 'counter', 'Answers whose question was unknown or expired',
+         [({}, cache['misses'])]),
+        ('quiz_question_cache_evictions_total', 'counter', 'Questions dropped to stay under the size limit',
+         [({}, cache['evictions'])]),
+        ('quiz_question_cache_expirations_total', 'counter', 'Questions dropped after their TTL',
+         [({}, cache['expirations'])]),
+        ('quiz_question_cache_hit_ratio', 'gauge', 'Share of question lookups that hit',
+         [({}, round(cache['hitRate'], 6))]),
+    ]
+    pool = handler.math_pool
+    if pool is not None:
+        served = pool.served
+        samples += [
+            ('quiz_question_pool_served_total', 'counter', 'Math questions served from the pool',
+             [({}, served)]),
+            ('quiz_question_pool_misses_total', 'counter', 'Pool pops that had to generate inline',
+             [({}, pool.misses)]),
+            ('quiz_question_pool_hit_ratio', 'gauge', 'Share of pool pops served from a ready block',
+             [({}, round(1 - pool.misses / served, 6) if served else 0.0)]),
+            ('quiz_question_pool_size', 'gauge', 'Ready questions per difficulty tier',
+             [({'tier': tier}, size) for tier, size in pool.sizes().items()]),
+        ]
+    caches = responses.cache_info()
+    samples += _cache_info_samples('quiz_question_fragment_cache', 'Encoded question fragment cache',
+                                   caches['question_fragment'])
+    samples += _cache_info_samples('quiz_error_body_cache', 'Encoded error body cache', caches['error_body'])
+    events = handler.score_events
+    samples += [
+        ('quiz_score_stream_subscribers', 'gauge', 'Open /api/stream/scores connections',
+         [({}, events.subscriber_count())]),
+        ('quiz_score_stream_events_total', 'counter', 'Score updates published to subscribers',
+         [({}, events.published)]),
+        ('quiz_score_stream_coalesced_total', 'counter', 'Updates merged into a pending event',
+         [({}, events.coalesced)]),
+        ('quiz_score_stream_dropped_total', 'counter', 'Subscribers disconnected for falling behind',
+         [({}, events.dropped)]),
+    ]
+    access_log = handler.access_log
+    if access_log is not None:
+        samples += [
+            ('quiz_access_log_written_total', 'counter', 'Access log records written',
+             [({}, access_log.written)]),
+            ('quiz_access_log_dropped_total', 'counter', 'Access log records dropped because the queue was full',
+             [({}, access_log.dropped)]),
+            ('quiz_access_log_sampled_out_total', 'counter', 'Access log records skipped by route sampling',
+             [({}, access_log.sampled_out)]),
+            ('quiz_access_log_pending', 'gauge', 'Access log records waiting for the writer',
+             [({}, access_log.pending())]),
+        ]
+    return samples
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import struct
+import threading
+import time
+
+from quiz_engine import update_rank
+
+DEFAULT_COMMIT_INTERVAL = 0.01
+DEFAULT_SEGMENT_EVENTS = 1000000
+DEFAULT_SNAPSHOT_INTERVAL = 300
+SYNC_MODES = ('batch', 'always')
+
+SNAPSHOT_NAME = 'snapshot.jsonl'
+_SEGMENT_PATTERN = re.compile(r'^segment-(\d+)\.(users\.jsonl|scores\.bin)$')
+
+# user index, total increment, math increment, language increment
+SCORE_RECORD = struct.Struct('<Iiii')
+_READ_CHUNK = SCORE_RECORD.size * 65536
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class ScoreJournal:
+    """Write-ahead log of user creations and score changes, with snapshots.
+
+    Each log segment is a pair of files: new users as JSON lines and score
+    events as fixed 16-byte records keyed by a dense user index. Appends
+    only touch an in-memory buffer; a background thread writes and fsyncs
+    whatever has accumulated every `commit_interval` seconds, so many
+    requests share one fsync (group commit). In 'always' sync mode an
+    append waits for that commit before returning.
+
+    Once a segment holds `segment_events` events (or `snapshot_interval`
+    seconds have passed) a new segment is started and the closed ones are
+    folded into snapshot.jsonl on another thread, so startup only has to
+    read the snapshot plus the short tail written since.
+    """
+
+    def __init__(self, directory, sync='batch', commit_interval=DEFAULT_COMMIT_INTERVAL,
+                 segment_events=DEFAULT_SEGMENT_EVENTS, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+        if sync not in SYNC_MODES:
+            raise ValueError(f'sync must be one of {SYNC_MODES}')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync = sync
+        self.commit_interval = commit_interval
+        self.segment_events = segment_events
+        self.snapshot_interval = snapshot_interval
+
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._commit_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._pending_users = []
+        self._pending_scores = bytearray()
+        self._index = {}
+        self._seq = 0
+        self._durable_seq = 0
+
+        self._segment = None
+        self._segment_count = 0
+        self._segment_started = time.monotonic()
+        self._users_file = None
+        self._scores_file = None
+        self._flusher = None
+        self._compactor = None
+        self._closed = threading.Event()
+
+        self.commits = 0
+        self.snapshots = 0
+
+    # Files
+
+    def _segment_paths(self, number):
+        base = os.path.join(self.directory, f'segment-{number:06d}')
+        return base + '.users.jsonl', base + '.scores.bin'
+
+    def _segments(self):
+        numbers = set()
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_PATTERN.match(name)
+            if match:
+                numbers.add(int(match.group(1)))
+        return sorted(numbers)
+
+    def _read_snapshot(self):
+        """Return (last segment folded in, users ordered by index)"""
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if not os.path.exists(path):
+            return 0, []
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            users = [json.loads(line) for line in f]
+        return header['segment'], users
+
+    def _replay_segment(self, number, users):
+        users_path, scores_path = self._segment_paths(number)
+        if os.path.exists(users_path):
+            with open(users_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        users.append(json.loads(line))
+                    except ValueError:
+                        # Torn write at the end of a crashed segment
+                        break
+        if not os.path.exists(scores_path):
+            return 0
+
+        count = len(users)
+        totals = [user['totalScore'] for user in users]
+        maths = [user['mathScore'] for user in users]
+        languages = [user['languageScore'] for user in users]
+        events = 0
+        with open(scores_path, 'rb') as f:
+            while True:
+                chunk = f.read(_READ_CHUNK)
+                usable = len(chunk) - len(chunk) % SCORE_RECORD.size
+                if usable <= 0:
+                    break
+                for index, total, math, language in SCORE_RECORD.iter_unpack(chunk[:usable]):
+                    if index < count:
+                        totals[index] += total
+                        maths[index] += math
+                        languages[index] += language
+                events += usable // SCORE_RECORD.size
+                if usable < len(chunk):
+                    break
+        for user, total, math, language in zip(users, totals, maths, languages):
+            user['totalScore'] = total
+            user['mathScore'] = math
+            user['languageScore'] = language
+        return events
+
+    def _segment_empty(self, number):
+        return all(not os.path.exists(path) or os.path.getsize(path) == 0
+                   for path in self._segment_paths(number))
+
+    def _open_segment(self, number):
+        users_path, scores_path = self._segment_paths(number)
+        self._users_file = open(users_path, 'ab')
+        self._scores_file = open(scores_path, 'ab')
+        self._segment = number
+        self._segment_count = 0
+        self._segment_started = time.monotonic()
+        _fsync_directory(self.directory)
+
+    def recover(self):
+        """Rebuild every user from the snapshot and log tail, then open a new segment.
+
+        Must be called once before anything is appended. Returns the users
+        as dicts with scores and ranks restored.
+        """
+        snapshot_segment, users = self._read_snapshot()
+        segments = self._segments()
+        replayed = False
+        for number in segments:
+            if number <= snapshot_segment or self._segment_empty(number):
+                # Folded into the snapshot already, or a restart that logged nothing
+                self._remove_segment(number)
+            else:
+                self._replay_segment(number, users)
+                replayed = True
+        for user in users:
+            update_rank(user)
+        self._index = {user['id']: i for i, user in enumerate(users)}
+        self._open_segment(max(segments + [snapshot_segment]) + 1)
+        if replayed:
+            # Fold the tail we just replayed so the next start is snapshot-only
+            self._start_compaction()
+        return users
+
+    # Appending
+
+    def _appended(self, seq):
+        self._ensure_flusher()
+        if self.sync == 'always':
+            self.wait(seq)
+        return seq
+
+    def user_created(self, user):
+        line = (json.dumps(user, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            if user['id'] in self._index:
+                return self._seq
+            # Replay numbers users by their order in the log, so assign and append together
+            self._index[user['id']] = len(self._index)
+            self._pending_users.append(line)
+            self._seq += 1
+            seq = self._seq
+        return self._appended(seq)
+
+    def scores_added(self, user_id, increments):
+        index = self._index.get(user_id)
+        if index is None:
+            return None
+        record = SCORE_RECORD.pack(
+            index,
+            sum(increments.values()),
+            increments.get('math', 0),
+            increments.get('language', 0),
+        )
+        with self._lock:
+            self._pending_scores += record
+            self._seq += 1
+            seq = self._seq
+        return self._appended(seq)
+
+    def wait(self, seq):
+        """Block until the event numbered seq has been fsynced"""
+        with self._committed:
+            while self._durable_seq < seq:
+                self._committed.wait()
+
+    # Committing
+
+    def _ensure_flusher(self):
+        # Started on first append so it runs in the process that serves requests
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop,
+                                                     name='score-journal-commit', daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.commit_interval):
+            self.flush()
+
+    def flush(self):
+        """Write and fsync everything appended so far"""
+        with self._commit_lock:
+            if self._users_file is None or self._users_file.closed:
+                return
+            with self._lock:
+                users, scores, seq = self._pending_users, self._pending_scores, self._seq
+                self._pending_users, self._pending_scores = [], bytearray()
+            if users:
+                self._users_file.write(b''.join(users))
+                self._users_file.flush()
+                os.fsync(self._users_file.fileno())
+            if scores:
+                self._scores_file.write(scores)
+                self._scores_file.flush()
+                os.fsync(self._scores_file.fileno())
+            if users or scores:
+                self._segment_count += len(users) + len(scores) // SCORE_RECORD.size
+                self.commits += 1
+            with self._committed:
+                self._durable_seq = seq
+                self._committed.notify_all()
+
+            age = time.monotonic() - self._segment_started
+            if self._segment_count >= self.segment_events or \
+                    (self._segment_count and age >= self.snapshot_interval):
+                self._rotate()
+
+    def _rotate(self):
+        # Called with _commit_lock held, so no write is in progress
+        self._users_file.close()
+        self._scores_file.close()
+        self._open_segment(self._segment + 1)
+        self._start_compaction()
+
+    def _start_compaction(self):
+        self._compactor = threading.Thread(target=self.compact, name='score-journal-snapshot', daemon=True)
+        self._compactor.start()
+
+    # Snapshots
+
+    def _remove_segment(self, number):
+        for path in self._segment_paths(number):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def compact(self):
+        """Fold every closed segment into a new snapshot and delete them"""
+        with self._compact_lock:
+            with self._commit_lock:
+                active = self._segment
+            snapshot_segment, users = self._read_snapshot()
+            closed = [n for n in self._segments() if snapshot_segment < n < active]
+            if not closed:
+                return False
+            for number in closed:
+                self._replay_segment(number, users)
+            for user in users:
+                update_rank(user)
+
+            path = os.path.join(self.directory, SNAPSHOT_NAME)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'segment': closed[-1], 'users': len(users)}) + '\n')
+                for user in users:
+                    f.write(json.dumps(user, ensure_ascii=False, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            _fsync_directory(self.directory)
+            for number in closed:
+                self._remove_segment(number)
+            self.snapshots += 1
+            return True
+
+    def snapshot(self):
+        """Close the current segment and compact now (e.g. before a planned restart)"""
+        self.flush()
+        with self._commit_lock:
+            if self._segment_count:
+                self._users_file.close()
+                self._scores_file.close()
+                self._open_segment(self._segment + 1)
+        return self.compact()
+
+    def close(self):
+        self._closed.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        if self._segment is None:
+            return
+        self.flush()
+        with self._commit_lock:
+            self._users_file.close()
+            self._scores_file.close()
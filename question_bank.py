@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MATH_QUESTIONS_PATH = os.path.join(BASE_DIR, 'math-questions.json')
+JAPANESE_QUESTIONS_PATH = os.path.join(BASE_DIR, 'japanese-questions.json')
+BANK_PATHS = (MATH_QUESTIONS_PATH, JAPANESE_QUESTIONS_PATH)
+
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+ID_PREFIXES = {'math': 'math', 'language': 'lang'}
+
+# One curated question; options is a tuple for multiple choice, otherwise None
+BankQuestion = namedtuple('BankQuestion', [
+    'bank_id', 'type', 'subtype', 'difficulty', 'question', 'answer', 'explanation', 'options'
+])
+
+
+class UnknownSubtype(ValueError):
+    """No curated questions exist for the requested type/subtype"""
+
+
+def _subtype_of(item):
+    if item.get('subtype'):
+        return item['subtype']
+    # japanese-questions.json has no subtype field; ids look like jp_katakana_12
+    parts = str(item.get('id', '')).split('_')
+    return parts[1] if len(parts) >= 3 else 'general'
+
+
+def _record(item):
+    options = item.get('choices') or item.get('options')
+    return BankQuestion(
+        bank_id=str(item.get('id', '')),
+        type=item['type'],
+        subtype=_subtype_of(item),
+        difficulty=int(item.get('difficulty', 1)),
+        question=item['question'],
+        answer=str(item['answer']),
+        explanation=item.get('explanation', ''),
+        options=tuple(options) if options else None,
+    )
+
+
+def _read_items(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        # math-questions.json groups lists by subtype next to a "total" count
+        return [item for value in data.values() if isinstance(value, list) for item in value]
+    return data
+
+
+class QuestionBank:
+    """Curated questions loaded once and indexed for constant-time sampling.
+
+    Every record is filed under (type, subtype, difficulty) and the
+    wildcard variants with subtype and/or difficulty set to None, so a
+    random pick from any bucket is a single random.choice.
+    """
+
+    def __init__(self, records=()):
+        records = list(records)
+        buckets = {}
+        for record in records:
+            for subtype in (record.subtype, None):
+                for difficulty in (record.difficulty, None):
+                    buckets.setdefault((record.type, subtype, difficulty), []).append(record)
+        self._buckets = {key: tuple(value) for key, value in buckets.items()}
+        # Lookup for rebuilding a question that was issued earlier; texts are not unique
+        self._by_id = {record.bank_id: record for record in records if record.bank_id}
+        self.size = len(self._buckets.get(('math', None, None), ())) + \
+            len(self._buckets.get(('language', None, None), ()))
+
+    @classmethod
+    def load(cls, paths=BANK_PATHS):
+        """Build a bank from the question files, skipping any that are missing"""
+        records = []
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            records.extend(_record(item) for item in _read_items(path))
+        return cls(records)
+
+    def subtypes(self, question_type):
+        return sorted(subtype for (qtype, subtype, difficulty) in self._buckets
+                      if qtype == question_type and subtype is not None and difficulty is None)
+
+    def has(self, question_type, subtype=None):
+        return (question_type, subtype, None) in self._buckets
+
+    def sample(self, question_type, subtype=None, difficulty=None):
+        """Random record for the bucket, ignoring difficulty if it has none"""
+        bucket = self._buckets.get((question_type, subtype, difficulty))
+        if bucket is None:
+            bucket = self._buckets.get((question_type, subtype, None))
+        if bucket is None:
+            if subtype is not None:
+                raise UnknownSubtype(f'Unknown {question_type} subtype: {subtype}')
+            return None
+        return random.choice(bucket)
+
+    def get(self, bank_id):
+        """The record an issued question came from (its bankId), or None"""
+        return self._by_id.get(bank_id)
+
+    def issue(self, question_type, subtype=None, difficulty=1):
+        """Return a question dict ready to hand out, or None if the bank has none"""
+        record = self.sample(question_type, subtype, difficulty)
+        if record is None:
+            return None
+        return self.issue_record(record, difficulty)
+
+    def issue_record(self, record, difficulty=None):
+        """Question dict for one record; difficulty defaults to the record's own"""
+        if difficulty is None:
+            difficulty = record.difficulty
+        question = {
+            'id': f"{ID_PREFIXES.get(record.type, record.type)}_{int(time.time())}_{random.randint(1000, 9999)}",
+            'type': record.type,
+            'subtype': record.subtype,
+            'question': record.question,
+            'answer': record.answer,
+            'difficulty': difficulty,
+            'explanation': record.explanation
+        }
+        if record.bank_id:
+            question['bankId'] = record.bank_id
+        if record.options:
+            # The files list the correct answer first
+            question['options'] = random.sample(record.options, len(record.options))
+        return question
+
+
+def _signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class BankWatcher:
+    """Reload the question files in the background when they change.
+
+    Polls file mtimes, waits until a change has settled for one interval
+    (so a half-written file is not picked up), builds a fresh QuestionBank
+    on the watcher thread and hands it to `on_reload`. Swapping the
+    handler's bank attribute is a single assignment, so a request that
+    already holds the old bank keeps using it consistently.
+    """
+
+    def __init__(self, on_reload, paths=BANK_PATHS, interval=DEFAULT_RELOAD_INTERVAL):
+        self.on_reload = on_reload
+        self.paths = paths
+        self.interval = interval
+        self.reloads = 0
+        self.errors = 0
+        self._loaded = _signature(paths)
+        self._failed = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='question-bank-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            current = _signature(self.paths)
+            if current == self._loaded or current == self._failed:
+                pending = None
+            elif current != pending:
+                # Changed since the last poll: give the writer one interval to finish
+                pending = current
+            else:
+                self.reload(current)
+                pending = None
+
+    def reload(self, signature=None):
+        """Build a new bank now; keeps the old one if the files cannot be parsed"""
+        signature = signature or _signature(self.paths)
+        try:
+            bank = QuestionBank.load(self.paths)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            self._failed = signature
+            print(f"❌ 問題バンク再読み込みエラー: {e}")
+            return None
+        self._loaded = signature
+        self.reloads += 1
+        self.on_reload(bank)
+        print(f"🔄 問題バンクを再読み込みしました: {bank.size}問")
+        return bank
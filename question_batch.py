@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import random
+
+MAX_BATCH_SIZE = 100
+QUESTION_TYPES = ('math', 'language')
+
+# Give up on finding another unique question after this many draws per slot
+_ATTEMPTS_PER_QUESTION = 20
+
+
+class BatchError(ValueError):
+    """The requested batch is malformed"""
+
+
+def _parse_item(item):
+    question_type = item.get('type', 'math')
+    if question_type not in QUESTION_TYPES:
+        raise BatchError('Invalid question type')
+    subtype = item.get('subtype') or None
+    try:
+        difficulty = int(item.get('difficulty', 1))
+        count = int(item.get('count', 1))
+    except (TypeError, ValueError):
+        raise BatchError('difficulty and count must be integers')
+    if count < 1:
+        raise BatchError('count must be at least 1')
+    return question_type, subtype, difficulty, count
+
+
+def parse_mix(data):
+    """Turn a request into a list of (type, subtype, difficulty, count).
+
+    Accepts either a single spec, {"type": "math", "difficulty": 1, "count": 20},
+    or a mix, {"items": [{"type": "math", "subtype": "word_problem", "count": 10},
+    {"type": "language", "count": 10}]}.
+    """
+    if not isinstance(data, dict):
+        raise BatchError('Request body must be a JSON object')
+    items = data.get('items', [data])
+    if not isinstance(items, list) or not items or not all(isinstance(i, dict) for i in items):
+        raise BatchError('items must be a non-empty list of objects')
+    mix = [_parse_item(item) for item in items]
+    if sum(item[-1] for item in mix) > MAX_BATCH_SIZE:
+        raise BatchError(f'At most {MAX_BATCH_SIZE} questions per batch')
+    return mix
+
+
+def generate_batch(generate, mix, shuffle=False):
+    """Generate every question in the mix with no repeats inside the batch.
+
+    `generate(question_type, difficulty, subtype)` produces one question. When a
+    bucket runs out of distinct questions the batch is returned short
+    rather than repeating one.
+    """
+    seen = set()
+    batch = []
+    for question_type, subtype, difficulty, count in mix:
+        produced = 0
+        attempts = count * _ATTEMPTS_PER_QUESTION
+        while produced < count and attempts:
+            attempts -= 1
+            question = generate(question_type, difficulty, subtype)
+            key = (question['type'], question['question'])
+            # Ids only carry a second and four random digits, so they can collide too
+            if key in seen or question['id'] in seen:
+                continue
+            seen.add(key)
+            seen.add(question['id'])
+            batch.append(question)
+            produced += 1
+    if shuffle:
+        random.shuffle(batch)
+    return batch
+
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_QUESTIONS = 50000
+DEFAULT_QUESTION_TTL = 30 * 60
+DEFAULT_STRIPES = 64
+
+
+class _Shard:
+    __slots__ = ('lock', 'items', 'dropped', 'hits', 'misses', 'evictions', 'expirations')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # question id -> (expires_at, question), least recently used first
+        self.items = OrderedDict()
+        # ids of recently dropped questions, oldest first (values unused)
+        self.dropped = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class QuestionCache:
+    """Bounded registry of issued questions with LRU and TTL eviction.
+
+    Questions live for at most `ttl` seconds after they are issued and the
+    least recently used ones are dropped once `max_size` is reached, so
+    memory stays flat no matter how many questions go unanswered. The ids
+    of the last `max_size` dropped questions are remembered (the questions
+    themselves are not) to tell an expired question from an unknown id.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_QUESTIONS, ttl=DEFAULT_QUESTION_TTL,
+                 stripes=DEFAULT_STRIPES):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._shard_limit = max(1, -(-max_size // stripes))
+        self._shards = [_Shard() for _ in range(stripes)]
+
+    def _shard(self, question_id):
+        return self._shards[hash(question_id) % len(self._shards)]
+
+    def add(self, question):
+        now = time.monotonic()
+        shard = self._shard(question['id'])
+        with shard.lock:
+            items = shard.items
+            items[question['id']] = (now + self.ttl, question)
+            items.move_to_end(question['id'])
+            # The oldest entry is the first candidate for both TTL and LRU eviction
+            while items:
+                question_id, (expires_at, _) = next(iter(items.items()))
+                if expires_at <= now:
+                    shard.expirations += 1
+                elif len(items) > self._shard_limit:
+                    shard.evictions += 1
+                else:
+                    break
+                del items[question_id]
+                self._remember_dropped(shard, question_id)
+        return question
+
+    def _remember_dropped(self, shard, question_id):
+        dropped = shard.dropped
+        dropped[question_id] = None
+        if len(dropped) > self._shard_limit:
+            del dropped[next(iter(dropped))]
+
+    def get(self, question_id):
+        """Return the question, or None if it is unknown or expired"""
+        shard = self._shard(question_id)
+        with shard.lock:
+            entry = shard.items.get(question_id)
+            if entry is None:
+                shard.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del shard.items[question_id]
+                self._remember_dropped(shard, question_id)
+                shard.expirations += 1
+                shard.misses += 1
+                return None
+            shard.items.move_to_end(question_id)
+            shard.hits += 1
+            return entry[1]
+
+    def is_expired(self, question_id):
+        """Whether a missing question was held here and has since been dropped.
+
+        Lets callers tell "question expired" apart from an id this process
+        never issued (made up, from another process, or from before a
+        restart), as long as it is among the recently dropped ids.
+        """
+        shard = self._shard(question_id)
+        with shard.lock:
+            return question_id in shard.dropped
+
+    def __len__(self):
+        return sum(len(shard.items) for shard in self._shards)
+
+    def stats(self):
+        totals = {'size': 0, 'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        for shard in self._shards:
+            totals['size'] += len(shard.items)
+            totals['hits'] += shard.hits
+            totals['misses'] += shard.misses
+            totals['evictions'] += shard.evictions
+            totals['expirations'] += shard.expirations
+        lookups = totals['hits'] + totals['misses']
+        totals['hitRate'] = totals['hits'] / lookups if lookups else 0.0
+        return totals
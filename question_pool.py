@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import random
+import threading
+import time
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:
+    # Falls back to random.choices when NumPy is not installed
+    np = None
+
+DEFAULT_BLOCK_SIZE = 4096
+DEFAULT_LOW_WATER = 1024
+
+# Ranges per difficulty tier, shared with quiz_engine.generate_math_question:
+# (num1 range, num2 range, operations)
+TIERS = {
+    1: ((1, 20), (1, 20), ('+', '-')),
+    2: ((1, 50), (1, 10), ('+', '-', '*')),
+}
+
+SYMBOLS = {'+': '+', '-': '-', '*': '×'}
+
+
+def tier_for(difficulty):
+    return 1 if difficulty == 1 else 2
+
+
+def _sample_block(count, range1, range2, operations):
+    """Return (operations, num1s, num2s, answers) lists for a block of questions"""
+    if np is not None:
+        rng = np.random.default_rng()
+        ops = rng.integers(0, len(operations), size=count)
+        num1 = rng.integers(range1[0], range1[1] + 1, size=count)
+        num2 = rng.integers(range2[0], range2[1] + 1, size=count)
+        # Keep subtraction answers non-negative, as the handler does by swapping operands
+        minus = ops == operations.index('-')
+        num1, num2 = np.where(minus, np.maximum(num1, num2), num1), np.where(minus, np.minimum(num1, num2), num2)
+        answer = np.where(ops == operations.index('+'), num1 + num2,
+                          np.where(minus, num1 - num2, num1 * num2))
+        return [operations[i] for i in ops.tolist()], num1.tolist(), num2.tolist(), answer.tolist()
+
+    ops = random.choices(operations, k=count)
+    num1 = random.choices(range(range1[0], range1[1] + 1), k=count)
+    num2 = random.choices(range(range2[0], range2[1] + 1), k=count)
+    answer = []
+    for i, op in enumerate(ops):
+        a, b = num1[i], num2[i]
+        if op == '+':
+            answer.append(a + b)
+        elif op == '-':
+            if a < b:
+                num1[i], num2[i] = b, a
+            answer.append(abs(a - b))
+        else:
+            answer.append(a * b)
+    return ops, num1, num2, answer
+
+
+class MathQuestionPool:
+    """Pre-generated math questions served by popping from per-tier pools.
+
+    Blocks of questions (operation mix included) are built per difficulty
+    tier with vectorized sampling (NumPy when installed) and refilled by a
+    background thread once a pool drops below `low_water`, so the request
+    path only pops a ready question and stamps the time on its id.
+    """
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE, low_water=DEFAULT_LOW_WATER,
+                 explanation='計算結果は {} です。'):
+        self.block_size = block_size
+        self.low_water = min(low_water, block_size)
+        self.explanation = explanation
+        self._pools = {tier: deque(self._build_block(tier, block_size)) for tier in TIERS}
+        self._refill_needed = threading.Event()
+        self._refill_lock = threading.Lock()
+        self._refiller = None
+        self.refills = 0
+        self.served = 0
+        self.misses = 0
+
+    def _build_block(self, tier, count):
+        range1, range2, operations = TIERS[tier]
+        explanation = self.explanation
+        ops, num1s, num2s, answers = _sample_block(count, range1, range2, operations)
+        suffixes = random.choices(range(1000, 10000), k=count)
+        return [
+            (f"{a} {SYMBOLS[op]} {b} = ?", str(c), explanation.format(c), suffix)
+            for op, a, b, c, suffix in zip(ops, num1s, num2s, answers, suffixes)
+        ]
+
+    def _ensure_refiller(self):
+        # Started on first use so prefork children each get their own thread
+        if self._refiller is None or not self._refiller.is_alive():
+            with self._refill_lock:
+                if self._refiller is None or not self._refiller.is_alive():
+                    self._refiller = threading.Thread(target=self._refill_loop,
+                                                      name='question-pool-refill', daemon=True)
+                    self._refiller.start()
+
+    def _refill_loop(self):
+        while True:
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            for tier, pool in self._pools.items():
+                if len(pool) < self.low_water:
+                    pool.extend(self._build_block(tier, self.block_size))
+                    self.refills += 1
+
+    def pop(self, difficulty=1):
+        """Return a ready math question dict for the given difficulty"""
+        pool = self._pools[tier_for(difficulty)]
+        self.served += 1
+        try:
+            text, answer, explanation, suffix = pool.popleft()
+        except IndexError:
+            # Burst outran the refiller: build a small block inline
+            self.misses += 1
+            block = self._build_block(tier_for(difficulty), self.low_water or 1)
+            text, answer, explanation, suffix = block.pop()
+            pool.extend(block)
+        if len(pool) < self.low_water:
+            self._ensure_refiller()
+            self._refill_needed.set()
+        return {
+            'id': f"math_{int(time.time())}_{suffix}",
+            'type': 'math',
+            'question': text,
+            'answer': answer,
+            'difficulty': difficulty,
+            'explanation': explanation
+        }
+
+    def sizes(self):
+        return {tier: len(pool) for tier, pool in self._pools.items()}
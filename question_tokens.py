@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import struct
+import time
+
+from question_cache import DEFAULT_QUESTION_TTL
+
+TOKEN_PREFIX = 'q1.'
+SECRET_ENV = 'QUIZ_TOKEN_SECRET'
+
+QUESTION_TYPES = ('math', 'language')
+
+# version, question type, difficulty, expiry (unix seconds), nonce, answer digest
+_PAYLOAD = struct.Struct('>BBBI4s8s')
+_SIGNATURE_SIZE = 12
+_VERSION = 1
+# Decoded length of every token
+TOKEN_SIZE = _PAYLOAD.size + _SIGNATURE_SIZE
+
+
+class TokenError(Exception):
+    """The question token is malformed or its signature does not match"""
+
+
+class TokenExpired(TokenError):
+    """The question token was valid but its expiry has passed"""
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def token_bytes(token):
+    """The TOKEN_SIZE raw bytes behind a token id, or None if it does not look like one.
+
+    Only checks the shape, not the signature.
+    """
+    if not isinstance(token, str) or not token.startswith(TOKEN_PREFIX):
+        return None
+    try:
+        raw = _b64decode(token[len(TOKEN_PREFIX):])
+    except (binascii.Error, ValueError):
+        return None
+    return raw if len(raw) == TOKEN_SIZE else None
+
+
+def token_from_bytes(raw):
+    """The token id for raw bytes from token_bytes()"""
+    return TOKEN_PREFIX + _b64encode(bytes(raw))
+
+
+def normalize_answer(question_type, answer):
+    """Answers are compared the same way check_answer does"""
+    if question_type == 'math':
+        return str(answer).strip()
+    return str(answer)
+
+
+class QuestionTokens:
+    """Self-verifying question ids.
+
+    The id handed to the client carries the question type, difficulty,
+    expiry and a keyed digest of the correct answer, all signed with HMAC,
+    so any process that knows the secret can grade an answer without
+    looking the question up.
+    """
+
+    def __init__(self, secret=None, ttl=DEFAULT_QUESTION_TTL):
+        if secret is None:
+            secret = os.environ.get(SECRET_ENV)
+        if secret is None:
+            # Only valid inside this process; set a shared secret for multiple nodes
+            secret = os.urandom(32)
+        if isinstance(secret, str):
+            secret = secret.encode('utf-8')
+        self._sign_key = hmac.new(secret, b'quiz-token-signature', hashlib.sha256).digest()
+        self._answer_key = hmac.new(secret, b'quiz-token-answer', hashlib.sha256).digest()
+        self.ttl = ttl
+
+    @staticmethod
+    def is_token(question_id):
+        return isinstance(question_id, str) and question_id.startswith(TOKEN_PREFIX)
+
+    def _answer_digest(self, nonce, question_type, answer):
+        value = normalize_answer(question_type, answer).encode('utf-8')
+        return hmac.new(self._answer_key, nonce + value, hashlib.sha256).digest()[:8]
+
+    def _sign(self, payload):
+        return hmac.new(self._sign_key, payload, hashlib.sha256).digest()[:_SIGNATURE_SIZE]
+
+    def issue(self, question):
+        """Return a signed token to use as the question's id"""
+        question_type = question['type']
+        nonce = os.urandom(4)
+        payload = _PAYLOAD.pack(
+            _VERSION,
+            QUESTION_TYPES.index(question_type),
+            min(max(int(question.get('difficulty', 1)), 0), 255),
+            int(time.time()) + self.ttl,
+            nonce,
+            self._answer_digest(nonce, question_type, question['answer']),
+        )
+        return TOKEN_PREFIX + _b64encode(payload + self._sign(payload))
+
+    def decode(self, token):
+        """Verify a token and return (question_type, difficulty, expires, nonce, digest)"""
+        if not self.is_token(token):
+            raise TokenError('Not a question token')
+        try:
+            raw = _b64decode(token[len(TOKEN_PREFIX):])
+        except (binascii.Error, ValueError):
+            raise TokenError('Malformed question token')
+        if len(raw) != TOKEN_SIZE:
+            raise TokenError('Malformed question token')
+        payload, signature = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            raise TokenError('Invalid question token')
+        version, type_code, difficulty, expires, nonce, digest = _PAYLOAD.unpack(payload)
+        if version != _VERSION or type_code >= len(QUESTION_TYPES):
+            raise TokenError('Invalid question token')
+        if expires < time.time():
+            raise TokenExpired('Question expired')
+        return QUESTION_TYPES[type_code], difficulty, expires, nonce, digest
+
+    def check(self, token, user_answer):
+        """Grade an answer against a token; returns (question_type, is_correct)"""
+        question_type, _, _, nonce, digest = self.decode(token)
+        expected = self._answer_digest(nonce, question_type, user_answer)
+        return question_type, hmac.compare_digest(expected, digest)
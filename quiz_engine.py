@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Question generation, grading and ranking, independent of any request handler.
+
+The servers' handler methods delegate here; so do the benchmarks in
+benchmarks/bench_engine.py.
+"""
+
+import random
+import threading
+import time
+
+from question_bank import UnknownSubtype
+from question_pool import SYMBOLS, TIERS, tier_for
+
+# Antonym questions used when the question bank is not loaded
+LANGUAGE_QUESTIONS = [
+    {
+        'question': '「早い」の反対語はどれですか？',
+        'options': ['遅い', '速い', '近い', '遠い', '高い'],
+        'answer': '遅い',
+        'explanation': '「早い」の反対語は「遅い」です。'
+    },
+    {
+        'question': '「大きい」の反対語はどれですか？',
+        'options': ['小さい', '長い', '短い', '太い', '細い'],
+        'answer': '小さい',
+        'explanation': '「大きい」の反対語は「小さい」です。'
+    },
+    {
+        'question': '「暑い」の反対語はどれですか？',
+        'options': ['寒い', '冷たい', '涼しい', '暖かい', '熱い'],
+        'answer': '寒い',
+        'explanation': '「暑い」の反対語は「寒い」です。'
+    },
+    {
+        'question': '「重い」の反対語はどれですか？',
+        'options': ['軽い', '軟らかい', '硬い', '強い', '弱い'],
+        'answer': '軽い',
+        'explanation': '「重い」の反対語は「軽い」です。'
+    },
+    {
+        'question': '「新しい」の反対語はどれですか？',
+        'options': ['古い', '若い', '新品', '綺麗', '汚い'],
+        'answer': '古い',
+        'explanation': '「新しい」の反対語は「古い」です。'
+    }
+]
+
+
+def generate_math_question(difficulty=1, pool=None, operations=None):
+    """Generate a math question based on difficulty level, from `pool` when given.
+
+    `operations` narrows the difficulty's operation mix, e.g. ('+',) for
+    addition only; the pool only holds the full mix.
+    """
+    range1, range2, tier_operations = TIERS[tier_for(difficulty)]
+    if pool and (operations is None or set(operations) == set(tier_operations)):
+        return pool.pop(difficulty)
+    
+    num1 = random.randint(*range1)
+    num2 = random.randint(*range2)
+    operation = random.choice(operations or tier_operations)
+    if operation == '-' and num1 < num2:
+        num1, num2 = num2, num1
+    return _math_question(num1, operation, num2, difficulty)
+
+
+def _math_question(num1, operation, num2, difficulty):
+    if operation == '+':
+        answer = num1 + num2
+    elif operation == '-':
+        answer = num1 - num2
+    else:  # multiplication
+        answer = num1 * num2
+    
+    return {
+        'id': f"math_{int(time.time())}_{random.randint(1000, 9999)}",
+        'type': 'math',
+        'question': f"{num1} {SYMBOLS[operation]} {num2} = ?",
+        'answer': str(answer),
+        'difficulty': difficulty,
+        'explanation': f"計算結果は {answer} です。"
+    }
+
+
+def generate_language_question(difficulty=1, bank=None):
+    """Generate a Japanese language question, from `bank` when it has one"""
+    if bank:
+        question = bank.issue('language', difficulty=difficulty)
+        if question:
+            return question
+    
+    # Fallback when japanese-questions.json could not be loaded
+    return _fallback_question(random.choice(LANGUAGE_QUESTIONS), difficulty)
+
+
+def _fallback_question(selected, difficulty):
+    return {
+        'id': f"lang_{int(time.time())}_{random.randint(1000, 9999)}",
+        'type': 'language',
+        'question': selected['question'],
+        'options': selected['options'],
+        'answer': selected['answer'],
+        'difficulty': difficulty,
+        'explanation': selected['explanation']
+    }
+
+
+def generate_question(question_type, difficulty=1, subtype=None, pool=None, bank=None):
+    """Generate a question of the given type; raises UnknownSubtype"""
+    if subtype:
+        # Curated questions of one kind, e.g. math word problems
+        if not bank:
+            raise UnknownSubtype(f'Unknown {question_type} subtype: {subtype}')
+        return bank.issue(question_type, subtype, difficulty)
+    if question_type == 'math':
+        return generate_math_question(difficulty, pool)
+    return generate_language_question(difficulty, bank)
+
+
+def check_answer(question, user_answer):
+    """Check if the user's answer is correct"""
+    if question['type'] == 'math':
+        # For math questions, normalize the answer
+        correct_answer = str(question['answer']).strip()
+        user_answer = str(user_answer).strip()
+        return correct_answer == user_answer
+    elif question['type'] == 'language':
+        # For language questions, exact match
+        return question['answer'] == user_answer
+    return False
+
+
+def update_rank(user):
+    """Set rank/currentRank from the user's total score"""
+    if user['totalScore'] >= 100:
+        user['rank'] = 'エキスパート'
+        user['currentRank'] = 'gold'
+    elif user['totalScore'] >= 50:
+        user['rank'] = '中級者'
+        user['currentRank'] = 'silver'
+    else:
+        user['rank'] = '初心者'
+        user['currentRank'] = 'bronze'
+
+
+# Question keys: the low two bits say how the rest of the key rebuilds the question
+_KEY_MATH, _KEY_BANK, _KEY_FALLBACK = 0, 1, 2
+_KEY_OPERATIONS = ('+', '-', '*')
+_OPERATION_BY_SYMBOL = {symbol: operation for operation, symbol in SYMBOLS.items()}
+_FALLBACK_INDEX = {item['question']: i for i, item in enumerate(LANGUAGE_QUESTIONS)}
+
+
+class QuestionKeys:
+    """Small ints that identify a question's content, to keep instead of the question.
+
+    A generated math question packs its tier, operation and operands into
+    the key. A bank question is referred to by its interned bank id, so the
+    key survives bank reloads; a fallback language question by its index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bank_ids = []
+        self._bank_index = {}
+
+    def key(self, question, bank=None):
+        """Key for an issued question dict, or None if it could not be rebuilt later"""
+        bank_id = question.get('bankId')
+        if bank_id:
+            # Several bank records can share a text, so only the id says which one was shown
+            if bank and bank.get(bank_id) is not None:
+                return (self._intern(bank_id) << 2) | _KEY_BANK
+            return None
+        if question['type'] == 'math':
+            return _math_key(question)
+        index = _FALLBACK_INDEX.get(question['question'])
+        return None if index is None else (index << 2) | _KEY_FALLBACK
+
+    def question(self, key, bank=None):
+        """A new question dict for a key, or None if the bank no longer has it"""
+        kind, payload = key & 3, key >> 2
+        if kind == _KEY_MATH:
+            tier, operation = (payload >> 16) + 1, _KEY_OPERATIONS[(payload >> 14) & 3]
+            return _math_question((payload >> 7) & 0x7f, operation, payload & 0x7f, tier)
+        if kind == _KEY_BANK:
+            record = bank.get(self._bank_ids[payload]) if bank and payload < len(self._bank_ids) else None
+            return bank.issue_record(record) if record is not None else None
+        if kind == _KEY_FALLBACK and payload < len(LANGUAGE_QUESTIONS):
+            return _fallback_question(LANGUAGE_QUESTIONS[payload], 1)
+        return None
+
+    def _intern(self, bank_id):
+        index = self._bank_index.get(bank_id)
+        if index is None:
+            with self._lock:
+                index = self._bank_index.get(bank_id)
+                if index is None:
+                    index = self._bank_index[bank_id] = len(self._bank_ids)
+                    self._bank_ids.append(bank_id)
+        return index
+
+
+def _math_key(question):
+    parts = question['question'].split()
+    try:
+        num1, operation, num2 = int(parts[0]), _OPERATION_BY_SYMBOL[parts[1]], int(parts[2])
+    except (IndexError, KeyError, ValueError):
+        return None
+    if not (0 <= num1 < 128 and 0 <= num2 < 128):
+        return None
+    tier = tier_for(question.get('difficulty') or 1)
+    payload = ((tier - 1) << 16) | (_KEY_OPERATIONS.index(operation) << 14) | (num1 << 7) | num2
+    return (payload << 2) | _KEY_MATH
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""The request handler and startup shared by main.py, working_server.py and simple_server.py."""
+
+import atexit
+import http.server
+import json
+import os
+import time
+import random
+
+import quiz_engine
+import server_modes
+from adaptive import AdaptiveDifficulty
+from answer_log import HistoryError, parse_history_query
+from grading import (SCORE_PER_CORRECT, GradingError, answer_record, answer_records, grade_batch,
+                     parse_answer_batch, summarize)
+from leaderboard import LeaderboardError, parse_leaderboard_query
+from metrics import METRICS_TYPE, Metrics, handler_samples
+from persistence import ScoreJournal
+from question_bank import BankWatcher, QuestionBank, UnknownSubtype
+from question_batch import BatchError, generate_batch, parse_mix
+from question_pool import MathQuestionPool
+from question_tokens import QuestionTokens, TokenError, TokenExpired
+from quiz_store import QuizStore
+from responses import (CORS_PREFLIGHT_HEADERS, TEXT_TYPE, JSONResponseMixin, encode_array, encode_question,
+                       health_body)
+from review_queue import ReviewError, ReviewQueue, parse_review_query
+from router import Router, RoutingMixin
+from score_stream import ScoreBroker, ScoreStreamMixin, StreamError, parse_stream_query, validate_class_id
+from sqlite_store import SqliteStore
+from static_assets import DEFAULT_ROOT, StaticAssetMixin, StaticAssets
+
+# Startup lines printed by configure(); simple_server.py passes English ones
+NOTICES = {
+    'sqlite': '💾 SQLiteストレージ: {path}',
+    'restored': '💾 {count}人のユーザーを復元しました ({path})',
+    'access_log': '📝 アクセスログ: {path}',
+    'assets': '📦 静的ファイル: {count}件 (圧縮済み {compressed}件)',
+}
+
+class QuizRequestHandler(RoutingMixin, JSONResponseMixin, StaticAssetMixin, ScoreStreamMixin,
+                         http.server.SimpleHTTPRequestHandler):
+    """The quiz API and client files, shared by the server scripts.
+
+    Each script serves a thin subclass; configure() sets that subclass's
+    store, bank and the rest of its shared state from the command line.
+    Routes are registered once, here, so a subclass changes behaviour by
+    overriding the helpers they call (generate_question, check_answer,
+    answer_body), not the route functions.
+    """
+    # Questions and users shared by all request threads
+    store = QuizStore()
+    # Set to a QuestionTokens instance to issue self-verifying question ids
+    tokens = None
+    # Set to a MathQuestionPool to serve pre-generated math questions
+    math_pool = None
+    # Set to a QuestionBank to serve the curated question files
+    bank = None
+    # Set to StaticAssets to serve the client build from memory
+    assets = None
+    # Recent accuracy per user, for type=auto questions
+    adaptive = AdaptiveDifficulty()
+    # Missed questions to review, kept as integer keys
+    reviews = ReviewQueue()
+    review_keys = quiz_engine.QuestionKeys()
+    # Live score updates for /api/stream/scores subscribers
+    score_events = ScoreBroker()
+    # Per-route request counts and latency for /api/metrics
+    metrics = Metrics()
+    # API endpoints, registered by the @routes decorators below
+    routes = Router(timing_hooks=[metrics.observe])
+    
+    @classmethod
+    def new_math_pool(cls):
+        """The MathQuestionPool configure() installs unless --no-question-pool is given"""
+        return MathQuestionPool()
+    
+    def generate_math_question(self, difficulty=1):
+        """Generate a math question based on difficulty level"""
+        return quiz_engine.generate_math_question(difficulty, self.math_pool)
+    
+    def generate_language_question(self, difficulty=1):
+        """Generate a Japanese language question"""
+        # One read of the attribute: a reload swaps in a new bank, never edits this one
+        return quiz_engine.generate_language_question(difficulty, self.bank)
+    
+    def check_answer(self, question, user_answer):
+        """Check if the user's answer is correct"""
+        return quiz_engine.check_answer(question, user_answer)
+    
+    def generate_question(self, question_type, difficulty=1, subtype=None):
+        """Generate a question of the given type"""
+        return quiz_engine.generate_question(question_type, difficulty, subtype, self.math_pool, self.bank)
+    
+    def generate_adaptive_question(self, user_id):
+        """Pick the type, difficulty and operation mix from the user's recent answers"""
+        question_type, difficulty, operations = self.adaptive.choose(user_id)
+        if question_type == 'math':
+            return quiz_engine.generate_math_question(difficulty, self.math_pool, operations)
+        return self.generate_language_question(difficulty)
+    
+    def issue_question(self, question):
+        """Make a generated question answerable through /api/answers"""
+        if self.tokens:
+            # The signed id carries everything needed to grade the answer
+            question['id'] = self.tokens.issue(question)
+        else:
+            self.store.add_question(question)
+        return question
+    
+    def send_question_batch(self, mix, shuffle=False):
+        """Generate a whole quiz set and send it as one JSON array"""
+        questions = generate_batch(self.generate_question, mix, shuffle)
+        self.send_body(200, encode_array(encode_question(self.issue_question(q)) for q in questions))
+    
+    def grade_answer(self, question_id, user_answer):
+        """Grade one answer; returns (question_type, is_correct, question) or raises GradingError.
+
+        question is None for signed ids, which are graded without the question.
+        """
+        if self.tokens and self.tokens.is_token(question_id):
+            # Stateless mode: grade straight from the signed id, no lookup
+            try:
+                question_type, is_correct = self.tokens.check(question_id, user_answer)
+                return question_type, is_correct, None
+            except TokenExpired as e:
+                raise GradingError(410, str(e))
+            except TokenError as e:
+                raise GradingError(400, str(e))
+        
+        question = self.store.get_question(question_id)
+        if not question:
+            if self.store.question_expired(question_id):
+                raise GradingError(410, 'Question expired')
+            raise GradingError(404, 'Question not found')
+        return question['type'], self.check_answer(question, user_answer), question
+    
+    def answer_body(self, record):
+        """The /api/answers response for a graded answer record"""
+        return record
+    
+    def learn_from_answers(self, user_id, graded):
+        """Feed graded answers to the user's adaptive levels and review schedule"""
+        for question_type, is_correct, question in graded:
+            self.adaptive.record(user_id, question_type, is_correct)
+            # A correct answer only matters if the question may be scheduled
+            if question is not None and (not is_correct or self.reviews.pending(user_id)):
+                self.reviews.answered(user_id, self.review_keys.key(question, self.bank), is_correct)
+    
+    def do_OPTIONS(self):
+        self.send_body(200, b'', TEXT_TYPE, CORS_PREFLIGHT_HEADERS)
+    
+    @routes.get('/api/health')
+    def get_health(self):
+        self.send_body(200, health_body())
+    
+    @routes.get('/api/metrics')
+    def get_metrics(self):
+        self.send_body(200, self.metrics.render(handler_samples(self)), METRICS_TYPE)
+    
+    @routes.get('/api/questions/generate')
+    def get_question(self):
+        params = self.query
+        
+        question_type = params.get('type', ['math'])[0]
+        difficulty = int(params.get('difficulty', ['1'])[0])
+        subtype = params.get('subtype', [None])[0]
+        
+        try:
+            if 'count' in params:
+                # Batch mode: the whole quiz set in one response
+                self.send_question_batch(parse_mix({
+                    'type': question_type,
+                    'subtype': subtype,
+                    'difficulty': difficulty,
+                    'count': params['count'][0]
+                }))
+                return
+            
+            if subtype or question_type in ('math', 'language'):
+                question = self.generate_question(question_type, difficulty, subtype)
+            elif question_type == 'auto':
+                user_id = params.get('userId', [None])[0]
+                if not user_id:
+                    self.send_json_error(400, 'userId is required for type=auto')
+                    return
+                question = self.generate_adaptive_question(user_id)
+            else:
+                self.send_json_error(400, 'Invalid question type')
+                return
+            
+            # Store question in shared storage
+            self.issue_question(question)
+            
+            self.send_body(200, encode_question(question))
+            
+        except (BatchError, UnknownSubtype) as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            print(f"❌ 問題生成エラー: {e}")
+            self.send_json(500, {'error': str(e)})
+    
+    @routes.get('/api/leaderboard')
+    def get_leaderboard(self):
+        try:
+            scope, limit = parse_leaderboard_query(self.query)
+        except LeaderboardError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        
+        self.send_json(200, {'scope': scope, 'leaders': self.store.top_users(scope, limit)})
+    
+    @routes.get('/api/stream/scores')
+    def get_score_stream(self):
+        try:
+            class_id = parse_stream_query(self.query)
+        except StreamError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        
+        self.send_score_stream(class_id)
+    
+    @routes.get('/api/users/{user_id}/position')
+    def get_position(self, user_id):
+        try:
+            scope, _ = parse_leaderboard_query(self.query)
+        except LeaderboardError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        
+        position = self.store.user_position(user_id, scope)
+        if position is None:
+            self.send_json_error(404, 'User not found')
+            return
+        
+        position.update({'userId': user_id, 'scope': scope})
+        self.send_json(200, position)
+    
+    @routes.get('/api/users/{user_id}/review')
+    def get_review(self, user_id):
+        try:
+            count = parse_review_query(self.query)
+        except ReviewError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        
+        if self.store.get_user(user_id) is None:
+            self.send_json_error(404, 'User not found')
+            return
+        
+        questions = []
+        for key, box in self.reviews.due(user_id, count):
+            question = self.review_keys.question(key, self.bank)
+            if question is None:
+                # Its bank question was removed by a reload
+                self.reviews.forget(user_id, key)
+                continue
+            question['reviewBox'] = box
+            questions.append(self.issue_question(question))
+        
+        self.send_json(200, {'userId': user_id, 'questions': questions,
+                             'scheduled': self.reviews.pending(user_id)})
+    
+    @routes.get('/api/users/{user_id}/answers')
+    def get_history(self, user_id):
+        try:
+            limit, before = parse_history_query(self.query)
+        except HistoryError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        
+        history = self.store.answer_history(user_id, limit, before)
+        if history is None:
+            self.send_json_error(404, 'User not found')
+            return
+        
+        history['userId'] = user_id
+        self.send_json(200, history)
+    
+    @routes.get('/')
+    @routes.get('/index.html')
+    def get_index(self):
+        asset = self.assets.find('/index.html') if self.assets else None
+        if asset is None:
+            self.send_body(404, b'File not found', TEXT_TYPE)
+            return
+        self.send_asset(asset)
+    
+    def fallback_get(self):
+        # Client build files from memory; anything else from the working directory
+        asset = self.assets.find(self.path.partition('?')[0]) if self.assets else None
+        if asset is not None:
+            self.send_asset(asset)
+        else:
+            super().fallback_get()
+    
+    @routes.post('/api/users')
+    def post_user(self):
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            
+            if not data.get('name'):
+                self.send_json_error(400, 'Name is required')
+                return
+            if not isinstance(data['name'], str):
+                self.send_json_error(400, 'Name must be a string')
+                return
+            
+            try:
+                class_id = validate_class_id(data.get('classId'))
+            except StreamError as e:
+                self.send_json(400, {'error': str(e)})
+                return
+            
+            user_id = f"user_{int(time.time())}_{random.randint(1000, 9999)}"
+            
+            user = {
+                'id': user_id,
+                'name': data['name'],
+                'classId': class_id,
+                'totalScore': 0,
+                'mathScore': 0,
+                'languageScore': 0,
+                'rank': '初心者',
+                'currentRank': 'bronze',
+                'rewards': [],
+                'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            }
+            
+            # Store user in shared storage
+            self.store.add_user(user)
+            
+            self.log_user_id = user_id
+            self.send_json(200, user)
+            
+        except json.JSONDecodeError:
+            self.send_json_error(400, 'Invalid JSON')
+    
+    @routes.post('/api/questions/generate')
+    def post_question_batch(self):
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            mix = parse_mix(data)
+            self.send_question_batch(mix, shuffle=bool(data.get('shuffle')))
+            
+        except json.JSONDecodeError:
+            self.send_json_error(400, 'Invalid JSON')
+        except (BatchError, UnknownSubtype) as e:
+            self.send_json(400, {'error': str(e)})
+    
+    @routes.post('/api/answers')
+    def post_answer(self):
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            
+            question_id = data.get('questionId')
+            user_answer = data.get('answer')
+            user_id = data.get('userId')
+            
+            self.log_user_id = user_id
+            if not question_id or not user_answer or not user_id:
+                self.send_json_error(400, 'Missing required fields')
+                return
+            if not isinstance(question_id, str) or not isinstance(user_id, str):
+                self.send_json_error(400, 'questionId and userId must be strings')
+                return
+            
+            try:
+                question_type, is_correct, question = self.grade_answer(question_id, user_answer)
+            except GradingError as e:
+                self.send_json_error(e.status, e.message)
+                return
+            
+            # Calculate score increment
+            score_increment = SCORE_PER_CORRECT if is_correct else 0
+            
+            # Update user score and rank in one atomic step
+            user = self.store.add_score(user_id, question_type, score_increment)
+            
+            # Create answer record
+            record = answer_record(question_id, user_id, user_answer, is_correct, score_increment)
+            if user:
+                self.learn_from_answers(user['id'], [(question_type, is_correct, question)])
+                # An unknown userId has no history to keep the record in
+                self.store.add_answers([record])
+            
+            self.send_json(200, self.answer_body(record))
+            self.publish_score(user)
+            
+        except json.JSONDecodeError:
+            self.send_json_error(400, 'Invalid JSON')
+    
+    @routes.post('/api/answers/batch')
+    def post_answer_batch(self):
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        
+        try:
+            data = json.loads(post_data.decode('utf-8'))
+            user_id, items = parse_answer_batch(data)
+            self.log_user_id = user_id
+            graded = []
+            
+            def grade(question_id, user_answer):
+                outcome = self.grade_answer(question_id, user_answer)
+                graded.append(outcome)
+                return outcome[:2]
+            
+            results, increments = grade_batch(grade, items)
+            
+            # One score and rank update for the whole submission
+            if increments:
+                user = self.store.add_scores(user_id, increments)
+            else:
+                user = self.store.get_user(user_id)
+            if user:
+                self.learn_from_answers(user['id'], graded)
+                self.store.add_answers(answer_records(user_id, results))
+            
+            result = {'userId': user_id, 'results': results, 'user': user}
+            result.update(summarize(results, increments))
+            
+            self.send_json(200, result)
+            if increments:
+                self.publish_score(user)
+            
+        except json.JSONDecodeError:
+            self.send_json_error(400, 'Invalid JSON')
+        except BatchError as e:
+            self.send_json(400, {'error': str(e)})
+
+
+def configure(handler_class, args, notices=NOTICES):
+    """Set the handler class's store, bank, pool and logs from server_modes.parse_args() output"""
+    handler_class.store = QuizStore(max_questions=args.max_questions, question_ttl=args.question_ttl)
+    if args.sqlite:
+        handler_class.store = SqliteStore(args.sqlite, max_questions=args.max_questions,
+                                          question_ttl=args.question_ttl)
+        server_modes.at_worker_exit(handler_class.store.close)
+        print(notices['sqlite'].format(path=args.sqlite))
+    elif args.data_dir:
+        # Users and scores survive restarts: replay the snapshot and log tail
+        journal = ScoreJournal(args.data_dir, sync=args.wal_sync)
+        users = journal.recover()
+        handler_class.store.load_users(users)
+        handler_class.store.journal = journal
+        atexit.register(journal.close)
+        print(notices['restored'].format(count=len(users), path=args.data_dir))
+    if args.stateless_questions:
+        handler_class.tokens = QuestionTokens(args.token_secret, ttl=args.question_ttl)
+    handler_class.bank = QuestionBank.load()
+    if args.reload_interval > 0:
+        watcher = BankWatcher(lambda bank: setattr(handler_class, 'bank', bank), interval=args.reload_interval)
+        server_modes.at_worker_start(watcher.start)
+    if not args.no_question_pool:
+        handler_class.math_pool = handler_class.new_math_pool()
+    handler_class.access_log = server_modes.create_access_log(args)
+    if handler_class.access_log:
+        print(notices['access_log'].format(path=args.access_log))
+    if os.path.isdir(DEFAULT_ROOT):
+        handler_class.assets = StaticAssets.load()
+        print(notices['assets'].format(count=len(handler_class.assets),
+                                       compressed=handler_class.assets.compressed_count()))
+
+
+def run_app(handler_class, args):
+    """Serve the configured handler class from the workspace with the startup banner, until interrupted"""
+    port = args.port
+    
+    # Change to the correct directory
+    os.chdir('/home/runner/workspace')
+    
+    # Start Python HTTP server
+    with server_modes.create_server(handler_class, ('0.0.0.0', port), args) as httpd:
+        print("🌐 ========================================")
+        print("🚀 学習Webアプリケーションが起動しました！")
+        print("🌐 ========================================")
+        print(f"📱 アクセスURL: http://localhost:{port}")
+        print(f"💚 Health check: http://localhost:{port}/api/health")
+        print(f"⚙️ 実行モード: {server_modes.describe(args)}")
+        print(f"📚 問題バンク: {handler_class.bank.size}問")
+        print("🌐 ========================================")
+        print("🎯 ブラウザでアクセスして学習を開始してください！")
+        print("========================================")
+        server_modes.serve(httpd, args)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import threading
+
+from answer_log import DEFAULT_HISTORY_LIMIT, AnswerLog
+from leaderboard import DEFAULT_LEADERBOARD_LIMIT, Leaderboard
+from question_cache import DEFAULT_MAX_QUESTIONS, DEFAULT_QUESTION_TTL, QuestionCache
+from quiz_engine import update_rank
+
+DEFAULT_STRIPES = 64
+
+SCORE_FIELDS = {
+    'math': 'mathScore',
+    'language': 'languageScore',
+}
+
+
+class _Shard:
+    __slots__ = ('lock', 'items', 'version')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = {}
+        # Bumped on every user change in the shard, so it orders a user's leaderboard updates
+        self.version = 0
+
+
+class QuizStore:
+    """In-memory questions and users shared by every request thread.
+
+    Users are spread over lock-striped shards, so two answers for different
+    users almost never wait on each other while answers for the same user
+    are applied one after another. Questions live in a bounded QuestionCache,
+    graded answers in a columnar AnswerLog, and every score change re-ranks
+    the user on the Leaderboard, after the shard lock is released.
+    """
+
+    def __init__(self, stripes=DEFAULT_STRIPES, max_questions=DEFAULT_MAX_QUESTIONS,
+                 question_ttl=DEFAULT_QUESTION_TTL, journal=None):
+        self.questions = QuestionCache(max_questions, question_ttl, stripes)
+        self._user_shards = [_Shard() for _ in range(stripes)]
+        self.answers = AnswerLog()
+        self.leaderboard = Leaderboard()
+        # Optional persistence.ScoreJournal that records users and score changes
+        self.journal = journal
+
+    def _shard(self, shards, key):
+        return shards[hash(key) % len(shards)]
+
+    # Questions
+
+    def add_question(self, question):
+        return self.questions.add(question)
+
+    def get_question(self, question_id):
+        """Return the question, or None if it is unknown or has been evicted"""
+        return self.questions.get(question_id)
+
+    def question_expired(self, question_id):
+        return self.questions.is_expired(question_id)
+
+    def question_count(self):
+        return len(self.questions)
+
+    # Users
+
+    def add_user(self, user):
+        shard = self._shard(self._user_shards, user['id'])
+        with shard.lock:
+            shard.items[user['id']] = user
+            shard.version += 1
+            version = shard.version
+            created = dict(user)
+        self.leaderboard.update(created, version)
+        if self.journal:
+            self.journal.user_created(created)
+        return created
+
+    def load_users(self, users):
+        """Insert users recovered from disk without journaling them again"""
+        for user in users:
+            shard = self._shard(self._user_shards, user['id'])
+            with shard.lock:
+                shard.items[user['id']] = user
+                shard.version += 1
+                version = shard.version
+            self.leaderboard.update(user, version)
+
+    def get_user(self, user_id):
+        """Return a copy of the user, or None"""
+        shard = self._shard(self._user_shards, user_id)
+        with shard.lock:
+            user = shard.items.get(user_id)
+            return dict(user) if user is not None else None
+
+    def add_score(self, user_id, question_type, increment):
+        """Atomically add to a user's scores and update their rank.
+
+        Returns a copy of the updated user, or None if the user is unknown.
+        """
+        return self.add_scores(user_id, {question_type: increment})
+
+    def add_scores(self, user_id, increments):
+        """Apply {question_type: increment} to a user as one update.
+
+        Returns a copy of the updated user, or None if the user is unknown.
+        """
+        shard = self._shard(self._user_shards, user_id)
+        with shard.lock:
+            user = shard.items.get(user_id)
+            if user is None:
+                return None
+            for question_type, increment in increments.items():
+                user['totalScore'] += increment
+                field = SCORE_FIELDS.get(question_type)
+                if field:
+                    user[field] += increment
+            update_rank(user)
+            shard.version += 1
+            version = shard.version
+            updated = dict(user)
+        # Outside the shard lock; the version keeps a late, older update from winning
+        self.leaderboard.update(updated, version)
+        if self.journal:
+            # Increments commute, so logging outside the shard lock keeps replay exact
+            self.journal.scores_added(user_id, increments)
+        return updated
+
+    def user_count(self):
+        return sum(len(shard.items) for shard in self._user_shards)
+
+    def top_users(self, scope='total', limit=DEFAULT_LEADERBOARD_LIMIT):
+        """Highest scoring users for a leaderboard scope"""
+        return self.leaderboard.top(scope, limit)
+
+    def user_position(self, user_id, scope='total'):
+        """The user's leaderboard position, or None if the user is unknown"""
+        return self.leaderboard.position(user_id, scope)
+
+    # Answers
+
+    def add_answers(self, records):
+        """Append graded answer records to the answer history"""
+        self.answers.extend(records)
+
+    def answer_history(self, user_id, limit=DEFAULT_HISTORY_LIMIT, before=None):
+        """Page of the user's answers, newest first; None if the user is unknown"""
+        if self.get_user(user_id) is None:
+            return None
+        return self.answers.history(user_id, limit, before)
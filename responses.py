@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+import json
+import time
+from email.utils import formatdate
+from functools import lru_cache
+from http import HTTPStatus
+
+try:
+    import orjson
+except ImportError:
+    # Falls back to the stdlib encoder when orjson is not installed
+    orjson = None
+
+JSON_TYPE = 'application/json'
+TEXT_TYPE = 'text/plain; charset=utf-8'
+
+CORS_PREFLIGHT_HEADERS = (b'Access-Control-Allow-Methods: GET, POST, PUT, DELETE, OPTIONS\r\n'
+                          b'Access-Control-Allow-Headers: Content-Type, Authorization\r\n')
+_CONNECTION_CLOSE = b'Connection: close\r\n'
+_CONNECTION_KEEP_ALIVE = b'Connection: keep-alive\r\n'
+
+# Headers every API response carries, encoded once
+_COMMON_HEADERS = b'Access-Control-Allow-Origin: *\r\n'
+
+# Static question fields are re-encoded for every issue of the same question
+_FRAGMENT_CACHE_SIZE = 8192
+_QUESTION_FIELDS = frozenset(('id', 'type', 'question', 'answer', 'difficulty', 'explanation'))
+_QUESTION_KEYS = _QUESTION_FIELDS | {'subtype', 'bankId', 'options'}
+
+
+def dumps(payload):
+    """JSON-encode to bytes with the fastest encoder available"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            # orjson refuses integers beyond 64 bits, which clients can send and get echoed back
+            pass
+    return json.dumps(payload).encode()
+
+
+@lru_cache(maxsize=None)
+def _head_prefix(protocol, status, content_type, server):
+    """Everything before the Date header that only depends on these four"""
+    status = HTTPStatus(status)
+    return (f'{protocol} {status.value} {status.phrase}\r\nServer: {server}\r\n'
+            f'Content-Type: {content_type}\r\n').encode('latin-1') + _COMMON_HEADERS
+
+
+_date = (0, b'')
+
+
+def _date_header():
+    # Formatting the date costs more than the rest of the head, so do it once a second
+    global _date
+    now = int(time.time())
+    second, header = _date
+    if second != now:
+        header = b'Date: ' + formatdate(now, usegmt=True).encode('ascii') + b'\r\n'
+        _date = (now, header)
+    return header
+
+
+def build_head(status, length, content_type=JSON_TYPE, server='', protocol='HTTP/1.0', extra_headers=b''):
+    """Status line and headers; `extra_headers` is pre-encoded header lines.
+
+    Content-Length is left out when `length` is None (e.g. for a 304).
+    """
+    parts = [_head_prefix(protocol, status, content_type, server), _date_header(), extra_headers]
+    if length is not None:
+        parts += [b'Content-Length: ', str(length).encode('ascii'), b'\r\n']
+    parts.append(b'\r\n')
+    return b''.join(parts)
+
+
+def build_response(status, body, content_type=JSON_TYPE, server='', protocol='HTTP/1.0', extra_headers=b''):
+    """Status line, headers and body as one bytes object ready for a single write"""
+    return build_head(status, len(body), content_type, server, protocol, extra_headers) + body
+
+
+@lru_cache(maxsize=256)
+def error_body(message):
+    """Encoded {"error": message}; messages are a small fixed set, so they stay cached"""
+    return dumps({'error': message})
+
+
+_health = (0, b'')
+
+
+def health_body():
+    """The /api/health payload, re-encoded at most once a second"""
+    global _health
+    now = int(time.time())
+    second, body = _health
+    if second != now:
+        body = dumps({'status': 'ok', 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S.000Z',
+                                                                  time.localtime(now))})
+        _health = (now, body)
+    return body
+
+
+@lru_cache(maxsize=_FRAGMENT_CACHE_SIZE)
+def _question_fragment(question_type, subtype, bank_id, text, answer, explanation):
+    fields = {'type': question_type}
+    if subtype is not None:
+        fields['subtype'] = subtype
+    if bank_id is not None:
+        fields['bankId'] = bank_id
+    fields.update({'question': text, 'answer': answer, 'explanation': explanation})
+    # Drop the braces so the fragment can be spliced between the per-issue fields
+    return dumps(fields)[1:-1]
+
+
+def encode_question(question):
+    """Encode an issued question dict.
+
+    Only the id, difficulty and shuffled options change between issues of
+    the same question, so the rest comes from a cache of encoded fragments
+    keyed by the question's static fields.
+    """
+    if not _QUESTION_KEYS.issuperset(question) or not _QUESTION_FIELDS.issubset(question):
+        return dumps(question)
+    fragment = _question_fragment(question['type'], question.get('subtype'), question.get('bankId'),
+                                  question['question'], question['answer'], question['explanation'])
+    parts = [b'{"id":', dumps(question['id']), b',', fragment,
+             b',"difficulty":', dumps(question['difficulty'])]
+    if 'options' in question:
+        parts += [b',"options":', dumps(question['options'])]
+    parts.append(b'}')
+    return b''.join(parts)
+
+
+def cache_info():
+    """functools cache statistics of the encoded question fragments and error bodies"""
+    return {'question_fragment': _question_fragment.cache_info(), 'error_body': error_body.cache_info()}
+
+
+def encode_array(encoded_items):
+    """Join already-encoded JSON values into an array"""
+    return b'[' + b','.join(encoded_items) + b']'
+
+
+class JSONResponseMixin:
+    """Response helpers for request handlers: each response is one socket write.
+
+    Mix in before BaseHTTPRequestHandler; send_json/send_json_error log the
+    request like send_response does. Every response carries Content-Length,
+    so with protocol_version set to HTTP/1.1 connections are kept open for
+    up to `max_requests` requests (None for no limit), and closed after
+    `timeout` idle seconds by StreamRequestHandler.
+    """
+
+    max_requests = None
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        self.requests_handled = getattr(self, 'requests_handled', 0) + 1
+        if self.max_requests is not None and self.requests_handled >= self.max_requests:
+            self.close_connection = True
+        return True
+
+    def _connection_value(self):
+        if self.protocol_version < 'HTTP/1.1':
+            return None
+        if self.close_connection:
+            return 'close'
+        if self.request_version == 'HTTP/1.0':
+            # A 1.0 client asked for keep-alive; it has to be told it got it
+            return 'keep-alive'
+        return None
+
+    def _connection_header(self):
+        value = self._connection_value()
+        if value is None:
+            return b''
+        return _CONNECTION_CLOSE if value == 'close' else _CONNECTION_KEEP_ALIVE
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'connection':
+            self._connection_sent = True
+        super().send_header(keyword, value)
+
+    def end_headers(self):
+        # Responses built by send_response/send_header (file fallthrough, send_error)
+        if not getattr(self, '_connection_sent', False):
+            value = self._connection_value()
+            if value is not None:
+                self.send_header('Connection', value)
+        self._connection_sent = False
+        super().end_headers()
+
+    def send_body(self, status, body, content_type=JSON_TYPE, extra_headers=b''):
+        self.log_request(status)
+        self.wfile.write(build_response(status, body, content_type, self.version_string(),
+                                        self.protocol_version, extra_headers + self._connection_header()))
+
+    def send_head_only(self, status, length, content_type=JSON_TYPE, extra_headers=b''):
+        """Headers for a body the caller sends itself (or none, for a 304)"""
+        self.log_request(status)
+        self.wfile.write(build_head(status, length, content_type, self.version_string(),
+                                    self.protocol_version, extra_headers + self._connection_header()))
+
+    def send_json(self, status, payload):
+        self.send_body(status, dumps(payload))
+
+    def send_json_error(self, status, message):
+        self.send_body(status, error_body(message))
+
+    def discard_body(self):
+        """Read and drop an unread request body so the connection stays usable"""
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import heapq
+import threading
+import time
+
+# Leitner boxes: seconds until a question in each box is due again
+DEFAULT_INTERVALS = (60, 600, 3600, 86400, 3 * 86400)
+# A served review that is never answered comes back after this long
+DEFAULT_LEASE = 300
+DEFAULT_MAX_ITEMS = 200
+DEFAULT_REVIEW_COUNT = 10
+MAX_REVIEW_COUNT = 50
+DEFAULT_STRIPES = 64
+
+# Question keys (quiz_engine.QuestionKeys) must fit below the due time in a heap entry
+KEY_BITS = 24
+_KEY_MASK = (1 << KEY_BITS) - 1
+_BOX_BITS = 3
+_BOX_MASK = (1 << _BOX_BITS) - 1
+
+
+class ReviewError(ValueError):
+    """Bad count parameter for a review query"""
+
+
+def parse_review_query(query):
+    """Return the number of review items asked for in parse_qs output"""
+    try:
+        count = int(query.get('count', [DEFAULT_REVIEW_COUNT])[0])
+    except ValueError:
+        raise ReviewError('count must be an integer')
+    if not 1 <= count <= MAX_REVIEW_COUNT:
+        raise ReviewError(f'count must be between 1 and {MAX_REVIEW_COUNT}')
+    return count
+
+
+class _UserReviews:
+    __slots__ = ('heap', 'boxes')
+
+    def __init__(self):
+        # due << KEY_BITS | key, a min-heap; entries whose due no longer matches `boxes` are stale
+        self.heap = []
+        # key -> due << _BOX_BITS | box
+        self.boxes = {}
+
+
+class ReviewQueue:
+    """Leitner-style review schedule of each user's missed questions.
+
+    A wrong answer puts the question in box 0; answering it correctly
+    when it comes back moves it up a box, with a longer interval each
+    time, until it leaves the last box. A wrong answer sends it back to
+    box 0. Each user has a heap of due times, so fetching k due items is
+    O(k log n). Questions are kept as integer keys, and heap entries and
+    boxes as single ints. Rescheduling leaves the old heap entry behind;
+    it is skipped when popped, and the heap is rebuilt once stale entries
+    outnumber live ones. Users are spread over lock-striped shards like
+    QuizStore. State is per process and not persisted.
+    """
+
+    def __init__(self, intervals=DEFAULT_INTERVALS, lease=DEFAULT_LEASE, max_items=DEFAULT_MAX_ITEMS,
+                 stripes=DEFAULT_STRIPES):
+        if not 0 < len(intervals) <= _BOX_MASK + 1:
+            raise ValueError(f'between 1 and {_BOX_MASK + 1} intervals are supported')
+        self.intervals = tuple(intervals)
+        self.lease = lease
+        self.max_items = max_items
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._users = {}
+        self.scheduled = 0
+        self.graduated = 0
+        self.overflow = 0
+
+    def _lock(self, user_id):
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    def _schedule(self, reviews, key, box, due):
+        reviews.boxes[key] = (due << _BOX_BITS) | box
+        heapq.heappush(reviews.heap, (due << KEY_BITS) | key)
+        if len(reviews.heap) > 2 * len(reviews.boxes) + 16:
+            reviews.heap = [(state >> _BOX_BITS << KEY_BITS) | key for key, state in reviews.boxes.items()]
+            heapq.heapify(reviews.heap)
+
+    def answered(self, user_id, key, is_correct, now=None):
+        """Update the schedule after a graded answer to the question with this key"""
+        if key is None or not 0 <= key <= _KEY_MASK:
+            return
+        now = int(now if now is not None else time.time())
+        with self._lock(user_id):
+            reviews = self._users.get(user_id)
+            state = reviews.boxes.get(key) if reviews is not None else None
+            if state is None:
+                if is_correct:
+                    return
+                if reviews is None:
+                    reviews = self._users[user_id] = _UserReviews()
+                elif len(reviews.boxes) >= self.max_items:
+                    self.overflow += 1
+                    return
+                self.scheduled += 1
+                self._schedule(reviews, key, 0, now + self.intervals[0])
+                return
+            box = (state & _BOX_MASK) + 1 if is_correct else 0
+            if box >= len(self.intervals):
+                # Learned: the stale heap entry is dropped when it surfaces
+                del reviews.boxes[key]
+                self.graduated += 1
+                return
+            self._schedule(reviews, key, box, now + self.intervals[box])
+
+    def due(self, user_id, count, now=None):
+        """Up to `count` (key, box) pairs that are due, soonest first.
+
+        Each one is pushed back by the lease, so asking again does not
+        return it until it has been answered or the lease runs out.
+        """
+        now = int(now if now is not None else time.time())
+        items = []
+        with self._lock(user_id):
+            reviews = self._users.get(user_id)
+            if reviews is None:
+                return items
+            heap = reviews.heap
+            taken = set()
+            while heap and len(items) < count and heap[0] >> KEY_BITS <= now:
+                entry = heapq.heappop(heap)
+                key = entry & _KEY_MASK
+                state = reviews.boxes.get(key)
+                # A question put back at a due time it had before has two matching entries
+                if state is None or state >> _BOX_BITS != entry >> KEY_BITS or key in taken:
+                    continue
+                taken.add(key)
+                items.append((key, state & _BOX_MASK))
+            for key, box in items:
+                self._schedule(reviews, key, box, now + self.lease)
+        return items
+
+    def forget(self, user_id, key):
+        """Drop a question that can no longer be rebuilt"""
+        with self._lock(user_id):
+            reviews = self._users.get(user_id)
+            if reviews is not None:
+                reviews.boxes.pop(key, None)
+
+    def pending(self, user_id):
+        """How many questions the user has scheduled, due or not"""
+        reviews = self._users.get(user_id)
+        return len(reviews.boxes) if reviews is not None else 0
+
+    def user_count(self):
+        return len(self._users)
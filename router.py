@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import time
+from urllib.parse import parse_qs, unquote
+
+from responses import JSON_TYPE, error_body
+
+
+class Route:
+    """A path pattern and the handler function for each method it accepts"""
+
+    __slots__ = ('pattern', 'params', 'handlers', 'allow')
+
+    def __init__(self, pattern, params):
+        self.pattern = pattern
+        self.params = params
+        self.handlers = {}
+        self.allow = b''
+
+    def add(self, method, func):
+        self.handlers[method] = func
+        methods = ', '.join(sorted(self.handlers) + ['OPTIONS'])
+        self.allow = f'Allow: {methods}\r\n'.encode('ascii')
+
+
+class Router:
+    """Dispatch table from request paths to handler functions.
+
+    Literal paths are one dict lookup. Paths with {name} segments, such as
+    /api/users/{id}/answers, are grouped by their shape (segment count and
+    which segments are parameters); within a shape, the literal segments
+    form a dict key. Lookup cost therefore depends on the number of
+    distinct shapes, not on the number of routes. When two shapes match,
+    the one with fewer parameters wins.
+
+    Hooks added to `timing_hooks` are called after every dispatched
+    request as hook(method, pattern, status, seconds); pattern is None for
+    requests that matched no route, and a handler that raises before
+    sending a response is reported with status 500.
+    """
+
+    def __init__(self, timing_hooks=()):
+        self._exact = {}
+        # segment count -> [(parameter positions, {literal segments: Route})]
+        self._shapes = {}
+        self.timing_hooks = list(timing_hooks)
+
+    def add(self, method, pattern, func):
+        segments = pattern[1:].split('/')
+        positions = tuple(i for i, segment in enumerate(segments) if segment.startswith('{'))
+        if not positions:
+            route = self._exact.get(pattern)
+            if route is None:
+                route = self._exact[pattern] = Route(pattern, [])
+            route.add(method, func)
+            return
+        shapes = self._shapes.setdefault(len(segments), [])
+        for shape_positions, table in shapes:
+            if shape_positions == positions:
+                break
+        else:
+            table = {}
+            shapes.append((positions, table))
+            shapes.sort(key=lambda shape: len(shape[0]))
+        key = tuple(None if i in positions else segment for i, segment in enumerate(segments))
+        route = table.get(key)
+        if route is None:
+            route = table[key] = Route(pattern, [segments[i][1:-1] for i in positions])
+        route.add(method, func)
+
+    def route(self, method, pattern):
+        """Decorator registering a handler method: func(handler, **params)"""
+        def register(func):
+            self.add(method, pattern, func)
+            return func
+        return register
+
+    def get(self, pattern):
+        return self.route('GET', pattern)
+
+    def post(self, pattern):
+        return self.route('POST', pattern)
+
+    def find(self, path):
+        """(Route, {name: value}) for a path without its query string, or (None, None)"""
+        route = self._exact.get(path)
+        if route is not None:
+            return route, {}
+        segments = path[1:].split('/')
+        for positions, table in self._shapes.get(len(segments), ()):
+            key = segments[:]
+            for i in positions:
+                key[i] = None
+            route = table.get(tuple(key))
+            if route is not None:
+                values = [segments[i] for i in positions]
+                if all(values):
+                    return route, {name: unquote(value) if '%' in value else value
+                                   for name, value in zip(route.params, values)}
+        return None, None
+
+
+class RoutingMixin:
+    """do_GET/do_POST that dispatch through the handler class's `routes`.
+
+    Mix in with JSONResponseMixin. Route handlers read the parsed query
+    string from `self.query`. Paths that match no route go to
+    fallback_get() or fallback_post(); a path registered only for other
+    methods gets 405 with an Allow header.
+
+    Set `access_log` to an AccessLog to record every request there instead
+    of the per-request line on stderr. The user id comes from a {user_id}
+    path parameter, or from `self.log_user_id` set by the route handler.
+    """
+
+    routes = None
+    access_log = None
+    log_user_id = None
+
+    def do_GET(self):
+        self.dispatch('GET', self.fallback_get)
+
+    def do_POST(self):
+        self.dispatch('POST', self.fallback_post)
+
+    def fallback_get(self):
+        super().do_GET()
+
+    def fallback_post(self):
+        self.discard_body()
+        self.send_json_error(404, 'Not found')
+
+    def log_request(self, code='-', size='-'):
+        self.response_status = code
+        if self.access_log is None:
+            super().log_request(code, size)
+
+    def dispatch(self, method, fallback):
+        path, _, query = self.path.partition('?')
+        self.query = parse_qs(query) if query else {}
+        route, params = self.routes.find(path)
+        hooks = self.routes.timing_hooks
+        access_log = self.access_log
+        timed = hooks or access_log is not None
+        if timed:
+            self.response_status = None
+            self.log_user_id = params.get('user_id') if params else None
+            start = time.perf_counter()
+        try:
+            if route is None:
+                fallback()
+            else:
+                func = route.handlers.get(method)
+                if func is not None:
+                    func(self, **params)
+                else:
+                    self.discard_body()
+                    self.send_body(405, error_body('Method not allowed'), JSON_TYPE, route.allow)
+        except BaseException:
+            # Recorded as a server error unless a status went out before the failure
+            if timed and self.response_status is None:
+                self.response_status = 500
+            raise
+        finally:
+            if timed:
+                elapsed = time.perf_counter() - start
+                pattern = route.pattern if route is not None else None
+                status = self.response_status
+                status = int(status) if status != '-' and status is not None else None
+                for hook in hooks:
+                    hook(method, pattern, status, elapsed)
+                if access_log is not None:
+                    access_log.record(method, pattern, status, elapsed, self.log_user_id,
+                                      path if route is None else None)
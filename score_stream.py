@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+import threading
+
+from responses import dumps
+
+# Distinct users with an undelivered update before a subscriber counts as too slow
+DEFAULT_BUFFER_SIZE = 256
+# Seconds between keep-alive comments on a quiet stream; also how soon a gone client is noticed
+DEFAULT_HEARTBEAT = 15.0
+MAX_CLASS_ID_LENGTH = 64
+
+EVENT_STREAM_TYPE = 'text/event-stream'
+STREAM_HEADERS = b'Cache-Control: no-cache\r\nX-Accel-Buffering: no\r\n'
+# Sent first: clients reconnect after 3 seconds if the stream drops
+STREAM_PREAMBLE = b'retry: 3000\n\n'
+HEARTBEAT = b': keep-alive\n\n'
+
+
+class StreamError(ValueError):
+    """Bad or missing classId"""
+
+
+def validate_class_id(value):
+    """A classId from a request, or None when absent"""
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str) or len(value) > MAX_CLASS_ID_LENGTH:
+        raise StreamError(f'classId must be a string of at most {MAX_CLASS_ID_LENGTH} characters')
+    return value
+
+
+def parse_stream_query(query):
+    """Return the classId from parse_qs output"""
+    class_id = validate_class_id(query.get('classId', [None])[0])
+    if class_id is None:
+        raise StreamError('classId is required')
+    return class_id
+
+
+def score_event(user, position=None):
+    """The payload of a `score` event for an updated user"""
+    return {
+        'userId': user['id'],
+        'name': user['name'],
+        'classId': user.get('classId'),
+        'totalScore': user['totalScore'],
+        'mathScore': user['mathScore'],
+        'languageScore': user['languageScore'],
+        'rank': user['rank'],
+        'currentRank': user['currentRank'],
+        'position': position,
+    }
+
+
+def encode_event(event_id, payload):
+    return b'id: %d\nevent: score\ndata: %s\n\n' % (event_id, dumps(payload))
+
+
+class Subscription:
+    """Undelivered events for one stream client.
+
+    Pending events are keyed by user id, so a student who answers several
+    times before the client reads costs one slot and delivers only the
+    latest scores. A client with more than `buffer_size` users pending is
+    closed instead of buffering without bound or slowing publishers down;
+    EventSource reconnects on its own once it catches up.
+    """
+
+    def __init__(self, broker, class_id, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.broker = broker
+        self.class_id = class_id
+        self.buffer_size = buffer_size
+        self.closed = False
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._ready = threading.Event()
+        self._waker = None
+
+    def set_waker(self, waker):
+        """Also call waker() when events arrive, e.g. to wake an event loop"""
+        with self._lock:
+            self._waker = waker
+            ready = bool(self._pending) or self.closed
+        if ready:
+            waker()
+
+    def _wake(self):
+        self._ready.set()
+        if self._waker is not None:
+            self._waker()
+
+    def offer(self, user_id, event):
+        """Queue an encoded event; returns 'queued', 'coalesced', 'dropped' or 'closed'"""
+        with self._lock:
+            if self.closed:
+                return 'closed'
+            if user_id in self._pending:
+                self._pending[user_id] = event
+                return 'coalesced'
+            if len(self._pending) >= self.buffer_size:
+                self.closed = True
+                self._pending.clear()
+                outcome = 'dropped'
+            else:
+                self._pending[user_id] = event
+                outcome = 'queued'
+                if len(self._pending) > 1:
+                    return outcome
+        self._wake()
+        return outcome
+
+    def take(self):
+        """Pending events, oldest user first; None once the subscription is closed"""
+        with self._lock:
+            if self.closed:
+                return None
+            events = list(self._pending.values())
+            self._pending.clear()
+            self._ready.clear()
+        return events
+
+    def wait(self, timeout):
+        """Block until events arrive or `timeout` passes, then take()"""
+        self._ready.wait(timeout)
+        return self.take()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._pending.clear()
+        self.broker.unsubscribe(self)
+        self._wake()
+
+
+class ScoreBroker:
+    """Fans score updates out to the stream subscribers of each class.
+
+    An update is encoded once however many teachers are watching, and
+    handed to each subscription without blocking, so the answer path
+    never waits on a stream client.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._classes = {}
+        self._next_id = 0
+        self.published = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def subscribe(self, class_id):
+        subscription = Subscription(self, class_id, self.buffer_size)
+        with self._lock:
+            self._classes.setdefault(class_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._classes.get(subscription.class_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._classes[subscription.class_id]
+
+    def has_subscribers(self, class_id):
+        return class_id in self._classes
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._classes.values())
+
+    def publish(self, user, position=None):
+        """Send a score event for the user to their class's subscribers"""
+        class_id = user.get('classId')
+        with self._lock:
+            subscribers = self._classes.get(class_id)
+            if not subscribers:
+                return
+            subscribers = list(subscribers)
+            self._next_id += 1
+            event_id = self._next_id
+            self.published += 1
+        event = encode_event(event_id, score_event(user, position))
+        for subscription in subscribers:
+            outcome = subscription.offer(user['id'], event)
+            if outcome == 'coalesced':
+                with self._lock:
+                    self.coalesced += 1
+            elif outcome == 'dropped':
+                with self._lock:
+                    self.dropped += 1
+                # Its stream sees the closed subscription and ends the response
+                self.unsubscribe(subscription)
+
+
+class ScoreStreamMixin:
+    """The /api/stream/scores response and score publishing for request handlers.
+
+    Mix in with JSONResponseMixin; the handler class provides `store` and
+    `score_events` (a ScoreBroker). Threaded servers stream from the
+    request thread, holding a `stream_slots` permit where the server has
+    one. Servers with `takes_event_streams` set (the asyncio engine) are
+    handed the subscription and stream it from their loop.
+    """
+
+    stream_heartbeat = DEFAULT_HEARTBEAT
+
+    def publish_score(self, user):
+        """Tell stream subscribers about an updated user (a no-op when nobody watches)"""
+        if user is None or not self.score_events.has_subscribers(user.get('classId')):
+            return
+        position = self.store.user_position(user['id'])
+        self.score_events.publish(user, position['position'] if position else None)
+
+    def send_score_stream(self, class_id):
+        if getattr(self.server, 'serial', False):
+            # One request at a time: a stream would hold the only one forever
+            self.send_json_error(503, 'Score streams need --mode thread, pool or async')
+            return
+        if getattr(self.server, 'max_streams', None) == 0:
+            # Prefork children, or a pool too small to spare a thread
+            self.send_json_error(503, 'Score streams are off in this server; use --mode thread or async')
+            return
+        # Pool servers cap streams so they cannot hold every worker thread
+        slots = getattr(self.server, 'stream_slots', None)
+        if slots is not None and not slots.acquire(blocking=False):
+            self.send_json_error(503, 'Too many score streams, please retry')
+            return
+        try:
+            self._stream_scores(class_id)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def _stream_scores(self, class_id):
+        subscription = self.score_events.subscribe(class_id)
+        # The stream has no length, so the connection ends with it
+        self.close_connection = True
+        self.send_head_only(200, None, EVENT_STREAM_TYPE, STREAM_HEADERS)
+        self.wfile.write(STREAM_PREAMBLE)
+        if getattr(self.server, 'takes_event_streams', False):
+            self.event_stream = subscription
+            return
+        try:
+            # A client that stops reading makes writes block; give up after two heartbeats
+            self.connection.settimeout(self.stream_heartbeat * 2)
+            while True:
+                events = subscription.wait(self.stream_heartbeat)
+                if events is None:
+                    break
+                self.wfile.write(b''.join(events) if events else HEARTBEAT)
+        except OSError:
+            pass
+        finally:
+            subscription.close()
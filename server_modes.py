@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+
+from access_log import DEFAULT_BACKUPS, DEFAULT_MAX_BYTES, AccessLog, AccessLogError, parse_sample_rates
+from async_server import AsyncServer
+from persistence import SYNC_MODES
+from question_bank import DEFAULT_RELOAD_INTERVAL
+from question_cache import DEFAULT_MAX_QUESTIONS, DEFAULT_QUESTION_TTL
+
+MODES = ('single', 'thread', 'pool', 'prefork', 'async')
+DEFAULT_MODE = 'thread'
+DEFAULT_POOL_THREADS = 16
+DEFAULT_QUEUE_SIZE = 128
+DEFAULT_IDLE_TIMEOUT = 15.0
+DEFAULT_MAX_REQUESTS = 1000
+# Pool workers per score stream allowed at once, so streams never take the whole pool
+STREAM_SHARE = 4
+
+# Sent as-is when the pending queue is full, so a rejected client costs no parsing
+BUSY_BODY = b'{"error": "Server busy, please retry"}'
+BUSY_RESPONSE = (
+    b'HTTP/1.0 503 Service Unavailable\r\n'
+    b'Content-Type: application/json\r\n'
+    b'Access-Control-Allow-Origin: *\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n'
+    b'Content-Length: ' + str(len(BUSY_BODY)).encode() + b'\r\n'
+    b'\r\n' + BUSY_BODY
+)
+
+
+class SingleServer(socketserver.TCPServer):
+    """Original behaviour: one request at a time"""
+    allow_reuse_address = True
+    # Long-lived responses (event streams) would block every other client
+    serial = True
+
+
+class ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """One thread per request"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class PooledServer(socketserver.TCPServer):
+    """Fixed pool of worker threads fed from a bounded queue.
+
+    When the queue is full the connection is answered with 503 straight away
+    instead of waiting behind everyone else. An event stream holds its
+    worker for as long as the client watches, so at most `max_streams`
+    (a quarter of the threads by default, 0 to refuse them) run at once.
+    """
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, threads=DEFAULT_POOL_THREADS,
+                 queue_size=DEFAULT_QUEUE_SIZE, max_streams=None, bind_and_activate=True):
+        super().__init__(server_address, handler_class, bind_and_activate)
+        self.threads = threads
+        self.max_streams = threads // STREAM_SHARE if max_streams is None else max_streams
+        self.stream_slots = threading.BoundedSemaphore(self.max_streams) if self.max_streams else None
+        self.pending = queue.Queue(maxsize=queue_size)
+        self.rejected = 0
+        self._workers = []
+
+    def start_workers(self):
+        # Started lazily so a prefork parent can build the server before forking
+        if self._workers:
+            return
+        for i in range(self.threads):
+            worker = threading.Thread(target=self._work, name=f'quiz-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def serve_forever(self, poll_interval=0.5):
+        self.start_workers()
+        super().serve_forever(poll_interval)
+
+    def process_request(self, request, client_address):
+        try:
+            self.pending.put_nowait((request, client_address))
+        except queue.Full:
+            # Only the accept loop touches this counter
+            self.rejected += 1
+            self.reject_request(request)
+
+    def reject_request(self, request):
+        try:
+            request.sendall(BUSY_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # Connections still waiting are dropped, so the stop markers below always fit
+        while True:
+            try:
+                item = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+        for _ in self._workers:
+            try:
+                self.pending.put_nowait(None)
+            except queue.Full:
+                # More workers than queue slots: the rest are daemon threads and end with the process
+                break
+        self._workers = []
+
+
+# Called in every serving process right before it starts accepting requests
+_worker_start_hooks = []
+_worker_exit_hooks = []
+
+
+def at_worker_start(hook):
+    """Run hook() in each serving process (every child in prefork mode).
+
+    Background threads must be started this way, since threads started
+    before os.fork() do not exist in the children.
+    """
+    _worker_start_hooks.append(hook)
+    return hook
+
+
+def at_worker_exit(hook):
+    """Run hook() when a serving process stops, e.g. to flush buffered writes.
+
+    Prefork children leave with os._exit(), which skips atexit handlers.
+    """
+    _worker_exit_hooks.append(hook)
+    return hook
+
+
+def _run_worker_start_hooks():
+    for hook in _worker_start_hooks:
+        hook()
+
+
+def _run_worker_exit_hooks():
+    for hook in _worker_exit_hooks:
+        try:
+            hook()
+        except Exception as e:
+            print(f"worker exit hook failed: {e}", file=sys.stderr)
+
+
+def add_arguments(parser, port=3001):
+    """Add the --port/--mode/--workers switches to an argument parser"""
+    parser.add_argument('--port', type=int, default=port,
+                        help=f'listening port (default: {port})')
+    parser.add_argument('--mode', choices=MODES, default=DEFAULT_MODE,
+                        help='single: one request at a time, thread: thread per request, '
+                             'pool: bounded thread pool (score streams capped at a quarter of '
+                             'the threads), prefork: forked processes sharing the socket (each '
+                             'has its own memory, so it needs --sqlite and --stateless-questions; '
+                             'score streams refused), async: one asyncio event loop '
+                             f'holding every connection, always kept alive (default: {DEFAULT_MODE}). '
+                             'Score streams are refused in single mode')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='pool mode: worker threads (default: '
+                             f'{DEFAULT_POOL_THREADS}); prefork mode: worker processes, each running '
+                             '--threads threads (default: one per CPU); async mode: handler threads '
+                             '(default: handlers run on the event loop)')
+    parser.add_argument('--threads', type=int, default=DEFAULT_POOL_THREADS,
+                        help='worker threads in each prefork process; pool mode uses --workers '
+                             f'(default: {DEFAULT_POOL_THREADS})')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='pending connections before answering 503 '
+                             f'(default: {DEFAULT_QUEUE_SIZE})')
+    parser.add_argument('--max-questions', type=int, default=DEFAULT_MAX_QUESTIONS,
+                        help='issued questions kept for grading before the least recently '
+                             f'used are dropped (default: {DEFAULT_MAX_QUESTIONS})')
+    parser.add_argument('--question-ttl', type=int, default=DEFAULT_QUESTION_TTL,
+                        help='seconds an issued question can still be answered '
+                             f'(default: {DEFAULT_QUESTION_TTL})')
+    parser.add_argument('--stateless-questions', action='store_true',
+                        help='issue HMAC-signed question ids that any process can grade '
+                             'without keeping the question in memory')
+    parser.add_argument('--token-secret', default=None,
+                        help='shared secret for signed question ids (default: $QUIZ_TOKEN_SECRET, '
+                             'or a random per-process key)')
+    parser.add_argument('--no-question-pool', action='store_true',
+                        help='generate every math question on demand instead of serving '
+                             'from the pre-generated pool')
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help='seconds between checks for edited question bank files, 0 to disable '
+                             f'(default: {DEFAULT_RELOAD_INTERVAL})')
+    parser.add_argument('--data-dir', default=None,
+                        help='keep users and scores across restarts in this directory '
+                             '(write-ahead log plus snapshots)')
+    parser.add_argument('--wal-sync', choices=SYNC_MODES, default='batch',
+                        help='batch: answer before the group commit fsync, always: wait for it '
+                             '(default: batch)')
+    parser.add_argument('--keep-alive', action='store_true',
+                        help='speak HTTP/1.1 and keep connections open between requests '
+                             '(in pool/prefork mode an idle connection holds a worker thread)')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help='seconds a kept-alive connection may sit idle before it is closed '
+                             f'(default: {DEFAULT_IDLE_TIMEOUT})')
+    parser.add_argument('--max-requests', type=int, default=DEFAULT_MAX_REQUESTS,
+                        help='requests served on one kept-alive connection before it is closed '
+                             f'(default: {DEFAULT_MAX_REQUESTS})')
+    parser.add_argument('--sqlite', default=None, metavar='PATH',
+                        help='keep users, scores and answer history in this SQLite database '
+                             '(WAL mode; prefork workers share it, with --stateless-questions)')
+    parser.add_argument('--access-log', default=None, metavar='PATH',
+                        help='write one JSON line per request to this file from a background '
+                             "thread, '-' for stderr (default: the standard stderr request log)")
+    parser.add_argument('--access-log-max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                        help=f'rotate the access log at this size (default: {DEFAULT_MAX_BYTES})')
+    parser.add_argument('--access-log-backups', type=int, default=DEFAULT_BACKUPS,
+                        help=f'rotated access logs to keep (default: {DEFAULT_BACKUPS})')
+    parser.add_argument('--access-log-sample', action='append', default=[], metavar='ROUTE=RATE',
+                        help='log only this fraction of successful requests to a route pattern, '
+                             'e.g. /api/questions/generate=0.1 (repeatable)')
+    return parser
+
+
+def parse_args(argv=None, port=3001, description=None):
+    parser = add_arguments(argparse.ArgumentParser(description=description), port)
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.threads < 1 or args.queue_size < 1:
+        parser.error('--threads and --queue-size must be at least 1')
+    if args.max_questions < 1 or args.question_ttl < 1:
+        parser.error('--max-questions and --question-ttl must be at least 1')
+    if args.idle_timeout <= 0 or args.max_requests < 1:
+        parser.error('--idle-timeout must be positive and --max-requests at least 1')
+    if args.sqlite and args.data_dir:
+        parser.error('--sqlite and --data-dir are alternative storage backends; pick one')
+    if args.mode == 'prefork' and args.data_dir:
+        parser.error('--data-dir needs a single process; use --mode thread or pool')
+    if args.mode == 'prefork' and not (args.sqlite and args.stateless_questions):
+        # A question issued by one child would be graded by another that never saw it
+        parser.error('prefork workers do not share memory; use --sqlite with --stateless-questions, '
+                     'or --mode thread or pool')
+    if args.mode == 'prefork' and not hasattr(os, 'fork'):
+        parser.error('prefork mode needs os.fork (not available on this platform)')
+    if args.access_log_max_bytes < 1 or args.access_log_backups < 0:
+        parser.error('--access-log-max-bytes must be positive and --access-log-backups at least 0')
+    try:
+        args.access_log_sample = parse_sample_rates(args.access_log_sample)
+    except AccessLogError as e:
+        parser.error(str(e))
+    return args
+
+
+def create_access_log(args):
+    """AccessLog for --access-log, writing from each serving process, or None"""
+    if not args.access_log:
+        return None
+    log = AccessLog(args.access_log, max_bytes=args.access_log_max_bytes, backups=args.access_log_backups,
+                    sample_rates=args.access_log_sample, per_process=args.mode == 'prefork')
+    at_worker_start(log.start)
+    at_worker_exit(log.close)
+    return log
+
+
+def create_server(handler_class, address, args):
+    """Build the server for the selected mode (not yet serving)"""
+    if args.mode == 'async':
+        # The event loop frames requests itself; handlers only need to answer in HTTP/1.1
+        handler_class.protocol_version = 'HTTP/1.1'
+        return AsyncServer(address, handler_class, handler_threads=args.workers or 0,
+                           idle_timeout=args.idle_timeout, max_requests=args.max_requests)
+    if args.keep_alive:
+        # Handlers must send Content-Length on every response (see responses.JSONResponseMixin)
+        handler_class.protocol_version = 'HTTP/1.1'
+        # Responses written in two parts (file fallthrough) must not wait on delayed ACKs
+        handler_class.disable_nagle_algorithm = True
+        handler_class.timeout = args.idle_timeout
+        handler_class.max_requests = args.max_requests
+    if args.mode == 'single':
+        return SingleServer(address, handler_class)
+    if args.mode == 'thread':
+        return ThreadedServer(address, handler_class)
+    if args.mode == 'pool':
+        return PooledServer(address, handler_class,
+                            threads=args.workers or DEFAULT_POOL_THREADS,
+                            queue_size=args.queue_size)
+    # prefork: every child process runs its own pool on the shared socket. Score
+    # events are published in the child that graded the answer, so a stream in
+    # any one child would miss the rest; streams are refused
+    return PooledServer(address, handler_class,
+                        threads=args.threads, queue_size=args.queue_size, max_streams=0)
+
+
+def describe(args):
+    if args.mode == 'async':
+        handlers = f"{args.workers} handler threads" if args.workers else 'handlers on the loop'
+        return f"async ({handlers}, {args.idle_timeout:g}s idle, {args.max_requests} requests)"
+    if args.keep_alive:
+        return f"{_describe_mode(args)}, keep-alive ({args.idle_timeout:g}s idle, {args.max_requests} requests)"
+    return _describe_mode(args)
+
+
+def _describe_mode(args):
+    if args.mode == 'pool':
+        return f"pool ({args.workers or DEFAULT_POOL_THREADS} threads, queue {args.queue_size})"
+    if args.mode == 'prefork':
+        return (f"prefork ({args.workers or os.cpu_count() or 1} processes x "
+                f"{args.threads} threads, queue {args.queue_size}; "
+                "users in SQLite, signed question ids)")
+    return args.mode
+
+
+def serve(httpd, args):
+    """Run the server until interrupted"""
+    if args.mode != 'prefork':
+        _run_worker_start_hooks()
+        try:
+            httpd.serve_forever()
+        finally:
+            _run_worker_exit_hooks()
+        return
+    _serve_prefork(httpd, args.workers or os.cpu_count() or 1)
+
+
+def _serve_prefork(httpd, processes):
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+            try:
+                _run_worker_start_hooks()
+                httpd.serve_forever()
+            finally:
+                _run_worker_exit_hooks()
+                os._exit(0)
+        children.append(pid)
+
+    def stop_children(*_):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    finally:
+        stop_children()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+import json
+import sqlite3
+import threading
+import weakref
+
+from answer_log import DEFAULT_HISTORY_LIMIT
+from leaderboard import DEFAULT_LEADERBOARD_LIMIT
+from question_cache import DEFAULT_MAX_QUESTIONS, DEFAULT_QUESTION_TTL, QuestionCache
+from quiz_engine import update_rank
+from quiz_store import DEFAULT_STRIPES, SCORE_FIELDS
+
+DEFAULT_ANSWER_BATCH = 256
+DEFAULT_ANSWER_FLUSH_INTERVAL = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    total_score INTEGER NOT NULL DEFAULT 0,
+    math_score INTEGER NOT NULL DEFAULT 0,
+    language_score INTEGER NOT NULL DEFAULT 0,
+    rewards TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT NOT NULL,
+    class_id TEXT
+);
+CREATE TABLE IF NOT EXISTS answers (
+    id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    is_correct INTEGER NOT NULL,
+    score_increment INTEGER NOT NULL,
+    answered_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_by_user ON answers (user_id);
+CREATE INDEX IF NOT EXISTS users_by_total ON users (total_score DESC);
+CREATE INDEX IF NOT EXISTS users_by_math ON users (math_score DESC);
+CREATE INDEX IF NOT EXISTS users_by_language ON users (language_score DESC);
+"""
+
+# Statements are kept as fixed strings so each connection compiles them
+# once and reuses the prepared statement from its statement cache.
+_USER_COLUMNS = 'id, name, total_score, math_score, language_score, rewards, created_at, class_id'
+_INSERT_USER = ('INSERT OR IGNORE INTO users (id, name, total_score, math_score, language_score, '
+                'rewards, created_at, class_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+_SELECT_USER = f'SELECT {_USER_COLUMNS} FROM users WHERE id = ?'
+_ADD_SCORES = ('UPDATE users SET total_score = total_score + ?, math_score = math_score + ?, '
+               f'language_score = language_score + ? WHERE id = ? RETURNING {_USER_COLUMNS}')
+_COUNT_USERS = 'SELECT COUNT(*) FROM users'
+_SCOPE_COLUMNS = {'total': 'total_score', 'math': 'math_score', 'language': 'language_score'}
+# Top-N walks the score index; a position is a count of the index range above the score
+_TOP_USERS = {scope: f'SELECT id, name, {column} FROM users ORDER BY {column} DESC, rowid LIMIT ?'
+              for scope, column in _SCOPE_COLUMNS.items()}
+_COUNT_ABOVE = {scope: f'SELECT COUNT(*) FROM users WHERE {column} > ?'
+                for scope, column in _SCOPE_COLUMNS.items()}
+_USER_SCORE = {scope: f'SELECT {column} FROM users WHERE id = ?'
+               for scope, column in _SCOPE_COLUMNS.items()}
+# The index on user_id also orders by rowid, which serves as the page cursor
+_ANSWER_PAGE = ('SELECT rowid, question_id, is_correct, answered_at FROM answers '
+                'WHERE user_id = ? AND rowid < ? ORDER BY rowid DESC LIMIT ?')
+_ANSWER_TOTALS = 'SELECT COUNT(*), COALESCE(SUM(is_correct), 0) FROM answers WHERE user_id = ?'
+_INSERT_ANSWER = ('INSERT INTO answers (id, question_id, user_id, answer, is_correct, '
+                  'score_increment, answered_at) VALUES (?, ?, ?, ?, ?, ?, ?)')
+
+
+class _ThreadConnection:
+    """A thread's connection, held in its thread-local data"""
+
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+def _close_connection(conn, connections, lock):
+    with lock:
+        connections.discard(conn)
+    conn.close()
+
+
+def _user_from_row(row):
+    user_id, name, total, math, language, rewards, created_at, class_id = row
+    user = {
+        'id': user_id,
+        'name': name,
+        'classId': class_id,
+        'totalScore': total,
+        'mathScore': math,
+        'languageScore': language,
+        'rewards': json.loads(rewards),
+        'createdAt': created_at,
+    }
+    # Rank is derived from the total, so it is not stored
+    update_rank(user)
+    return user
+
+
+def _answer_row(record):
+    return (record['id'], record['questionId'], record['userId'], str(record['answer']),
+            int(record['isCorrect']), record['scoreIncrement'], record['answeredAt'])
+
+
+class SqliteStore:
+    """QuizStore interface backed by a SQLite database in WAL mode.
+
+    Users, scores and every answer record are kept in `path`, so history
+    can be queried with plain SQL. Each request thread gets its own
+    connection, opened on first use and closed when the thread ends, so
+    thread-per-request mode does not pile up file handles. A score update
+    is a single UPDATE ... RETURNING, which SQLite applies atomically.
+    Answer records are queued and inserted by a background thread in
+    batches of up to `answer_batch` rows per transaction.
+
+    Connections are per thread and per process, so prefork children can
+    share the database. Issued questions still live in this process's
+    QuestionCache, so other processes cannot grade them; prefork needs
+    signed question ids as well (server_modes.parse_args enforces it).
+    """
+
+    def __init__(self, path, max_questions=DEFAULT_MAX_QUESTIONS, question_ttl=DEFAULT_QUESTION_TTL,
+                 stripes=DEFAULT_STRIPES, answer_batch=DEFAULT_ANSWER_BATCH,
+                 flush_interval=DEFAULT_ANSWER_FLUSH_INTERVAL):
+        self.path = path
+        self.questions = QuestionCache(max_questions, question_ttl, stripes)
+        self.answer_batch = answer_batch
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+        # Connections of threads still running; each removes itself when its thread ends
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        self._pending_answers = []
+        self._answers_lock = threading.Lock()
+        self._answers_ready = threading.Condition(self._answers_lock)
+        self._writer = None
+        self._closed = False
+        self.answer_commits = 0
+
+        # Create the schema and switch to WAL without keeping the connection,
+        # so forked children never inherit an open handle
+        conn = self._open()
+        try:
+            conn.executescript(_SCHEMA)
+            # Databases created before users had a class
+            if 'class_id' not in {column[1] for column in conn.execute('PRAGMA table_info(users)')}:
+                conn.execute('ALTER TABLE users ADD COLUMN class_id TEXT')
+        finally:
+            conn.close()
+
+    # Connections
+
+    def _open(self):
+        # Autocommit: single statements are their own transaction, batches use BEGIN
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL makes NORMAL crash-safe for the database file; only the last commits can be lost
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _conn(self):
+        held = getattr(self._local, 'held', None)
+        if held is None:
+            conn = self._open()
+            with self._connections_lock:
+                self._connections.add(conn)
+            held = self._local.held = _ThreadConnection(conn)
+            # Thread-local data is dropped when its thread exits, which closes the connection
+            weakref.finalize(held, _close_connection, conn, self._connections, self._connections_lock)
+        return held.conn
+
+    def connection_count(self):
+        """Connections currently open, one per thread that has used the store and is still running"""
+        with self._connections_lock:
+            return len(self._connections)
+
+    # Questions
+
+    def add_question(self, question):
+        return self.questions.add(question)
+
+    def get_question(self, question_id):
+        """Return the question, or None if it is unknown or has been evicted"""
+        return self.questions.get(question_id)
+
+    def question_expired(self, question_id):
+        return self.questions.is_expired(question_id)
+
+    def question_count(self):
+        return len(self.questions)
+
+    # Users
+
+    def add_user(self, user):
+        self._conn().execute(_INSERT_USER, (
+            user['id'], user['name'], user['totalScore'], user['mathScore'],
+            user['languageScore'], json.dumps(user.get('rewards', []), ensure_ascii=False),
+            user['createdAt'], user.get('classId'),
+        ))
+        return dict(user)
+
+    def load_users(self, users):
+        """Insert users, e.g. migrated from another store"""
+        conn = self._conn()
+        conn.execute('BEGIN')
+        try:
+            for user in users:
+                self.add_user(user)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get_user(self, user_id):
+        """Return the user, or None"""
+        row = self._conn().execute(_SELECT_USER, (user_id,)).fetchone()
+        return _user_from_row(row) if row is not None else None
+
+    def add_score(self, user_id, question_type, increment):
+        """Atomically add to a user's scores and update their rank.
+
+        Returns the updated user, or None if the user is unknown.
+        """
+        return self.add_scores(user_id, {question_type: increment})
+
+    def add_scores(self, user_id, increments):
+        """Apply {question_type: increment} to a user as one update.
+
+        Returns the updated user, or None if the user is unknown.
+        """
+        by_field = {field: 0 for field in SCORE_FIELDS.values()}
+        for question_type, increment in increments.items():
+            field = SCORE_FIELDS.get(question_type)
+            if field:
+                by_field[field] += increment
+        row = self._conn().execute(_ADD_SCORES, (
+            sum(increments.values()), by_field['mathScore'], by_field['languageScore'], user_id,
+        )).fetchone()
+        return _user_from_row(row) if row is not None else None
+
+    def user_count(self):
+        return self._conn().execute(_COUNT_USERS).fetchone()[0]
+
+    def top_users(self, scope='total', limit=DEFAULT_LEADERBOARD_LIMIT):
+        """Highest scoring users for a leaderboard scope"""
+        leaders = []
+        previous = None
+        for i, (user_id, name, score) in enumerate(self._conn().execute(_TOP_USERS[scope], (limit,))):
+            # Ties share the position of the first user with that score
+            if score != previous:
+                position, previous = i + 1, score
+            leaders.append({'position': position, 'userId': user_id, 'name': name, 'score': score})
+        return leaders
+
+    def user_position(self, user_id, scope='total'):
+        """The user's leaderboard position, or None if the user is unknown"""
+        conn = self._conn()
+        row = conn.execute(_USER_SCORE[scope], (user_id,)).fetchone()
+        if row is None:
+            return None
+        above = conn.execute(_COUNT_ABOVE[scope], (row[0],)).fetchone()[0]
+        return {'position': above + 1, 'score': row[0], 'users': self.user_count()}
+
+    # Answers
+
+    def add_answers(self, records):
+        """Queue answer records for the next batched insert"""
+        if not records:
+            return
+        rows = [_answer_row(record) for record in records]
+        self._ensure_writer()
+        with self._answers_ready:
+            self._pending_answers.extend(rows)
+            if len(self._pending_answers) >= self.answer_batch:
+                self._answers_ready.notify()
+
+    def _ensure_writer(self):
+        # Started on first use so prefork children each get their own thread
+        if self._writer is None or not self._writer.is_alive():
+            with self._connections_lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop,
+                                                    name='sqlite-answer-writer', daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            with self._answers_ready:
+                if not self._closed and len(self._pending_answers) < self.answer_batch:
+                    self._answers_ready.wait(self.flush_interval)
+                if self._closed and not self._pending_answers:
+                    return
+            self.flush_answers()
+
+    def flush_answers(self):
+        """Insert every queued answer record now"""
+        with self._answers_lock:
+            rows, self._pending_answers = self._pending_answers, []
+        if not rows:
+            return 0
+        conn = self._conn()
+        for start in range(0, len(rows), self.answer_batch):
+            conn.execute('BEGIN')
+            try:
+                conn.executemany(_INSERT_ANSWER, rows[start:start + self.answer_batch])
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self.answer_commits += 1
+        return len(rows)
+
+    def answer_history(self, user_id, limit=DEFAULT_HISTORY_LIMIT, before=None):
+        """Page of the user's answers, newest first; None if the user is unknown"""
+        if self.get_user(user_id) is None:
+            return None
+        # Include answers still waiting in the insert queue
+        self.flush_answers()
+        conn = self._conn()
+        rows = conn.execute(_ANSWER_PAGE, (user_id, before if before is not None else 2 ** 63 - 1,
+                                           limit + 1)).fetchall()
+        answered, correct = conn.execute(_ANSWER_TOTALS, (user_id,)).fetchone()
+        page = rows[:limit]
+        return {
+            'answers': [
+                {'cursor': row, 'questionId': question_id, 'isCorrect': bool(is_correct),
+                 'answeredAt': answered_at}
+                for row, question_id, is_correct, answered_at in page
+            ],
+            'nextCursor': page[-1][0] if len(rows) > limit else None,
+            'answered': answered,
+            'correct': correct,
+            'accuracy': round(correct / answered, 4) if answered else None,
+        }
+
+    def answer_count(self):
+        self.flush_answers()
+        return self._conn().execute('SELECT COUNT(*) FROM answers').fetchone()[0]
+
+    def close(self):
+        with self._answers_ready:
+            self._closed = True
+            self._answers_ready.notify()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush_answers()
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import unquote
+
+try:
+    import brotli
+except ImportError:
+    # Only gzip variants are built when the brotli package is not installed
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.path.join(BASE_DIR, 'client', 'dist')
+
+# Files up to this size are held in memory; larger ones are sent from disk with sendfile
+DEFAULT_MAX_CACHED = 1024 * 1024
+# Below this, compression saves less than the extra header costs
+MIN_COMPRESS_SIZE = 1024
+
+IMMUTABLE = b'public, max-age=31536000, immutable'
+REVALIDATE = b'no-cache'
+SHORT_LIVED = b'public, max-age=3600'
+
+_COMPRESSIBLE = re.compile(r'^(text/|application/(javascript|json|xml|wasm|manifest\+json)|image/svg\+xml)')
+# Vite puts content-hashed bundles under assets/; webpack-style names carry a hex hash
+_HASHED = re.compile(r'(^|/)assets/|\.[0-9a-f]{8,}\.\w+$')
+
+
+def cache_control(name, content_type):
+    if _HASHED.search(name):
+        # The name changes whenever the content does
+        return IMMUTABLE
+    if content_type.startswith('text/html'):
+        return REVALIDATE
+    return SHORT_LIVED
+
+
+def accepted_encodings(header):
+    """Content codings the client accepts, from an Accept-Encoding header"""
+    accepted = set()
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if coding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.lower())
+    return accepted
+
+
+def etag_matches(header, etag):
+    """True if an If-None-Match header matches the ETag (weak comparison)"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tag = etag.decode('ascii')
+    return any(candidate.strip().removeprefix('W/') == tag for candidate in header.split(','))
+
+
+class Asset:
+    """One static file: its content type, ETag and either in-memory variants or a disk path"""
+
+    __slots__ = ('name', 'content_type', 'etag', 'size', 'variants', 'path', 'headers')
+
+    def __init__(self, name, content_type, etag, size, variants=None, path=None):
+        self.name = name
+        self.content_type = content_type
+        self.etag = etag
+        self.size = size
+        # {'gzip': body, 'br': body, 'identity': body}; None when served from disk
+        self.variants = variants
+        self.path = path
+        vary = b'Vary: Accept-Encoding\r\n' if variants and len(variants) > 1 else b''
+        common = b'ETag: ' + etag + b'\r\nCache-Control: ' + cache_control(name, content_type) + b'\r\n' + vary
+        # Pre-encoded extra headers per coding, plus the 304 set under None
+        self.headers = {None: common}
+        for coding in (variants or {'identity': None}):
+            encoding = b'' if coding == 'identity' else b'Content-Encoding: ' + coding.encode('ascii') + b'\r\n'
+            self.headers[coding] = common + encoding
+
+    def choose(self, accept_encoding):
+        """Pick (coding, body) for the request; body is None for disk-backed assets"""
+        if self.variants is None:
+            return 'identity', None
+        if len(self.variants) > 1:
+            accepted = accepted_encodings(accept_encoding)
+            for coding in ('br', 'gzip'):
+                if coding in self.variants and (coding in accepted or '*' in accepted):
+                    return coding, self.variants[coding]
+        return 'identity', self.variants['identity']
+
+
+def _load_asset(path, name, max_cached):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type == 'application/javascript':
+        content_type += '; charset=utf-8'
+    stat = os.stat(path)
+    if stat.st_size > max_cached:
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'.encode('ascii')
+        return Asset(name, content_type, etag, stat.st_size, path=path)
+
+    with open(path, 'rb') as f:
+        body = f.read()
+    etag = b'"' + hashlib.blake2b(body, digest_size=12).hexdigest().encode('ascii') + b'"'
+    variants = {'identity': body}
+    if len(body) >= MIN_COMPRESS_SIZE and _COMPRESSIBLE.match(content_type):
+        # mtime=0 keeps the gzip bytes identical across restarts
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            variants['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                variants['br'] = compressed
+    return Asset(name, content_type, etag, len(body), variants)
+
+
+class StaticAssets:
+    """The client build loaded once at startup and served from memory.
+
+    Small files are read, hashed for a strong ETag and compressed ahead of
+    time, so a request costs a dict lookup and one write. Files larger
+    than `max_cached` keep only their metadata and are streamed from disk.
+    """
+
+    def __init__(self, assets):
+        self._assets = assets
+
+    @classmethod
+    def load(cls, root=DEFAULT_ROOT, max_cached=DEFAULT_MAX_CACHED):
+        assets = {}
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                assets['/' + name] = _load_asset(path, name, max_cached)
+        return cls(assets)
+
+    def __len__(self):
+        return len(self._assets)
+
+    def compressed_count(self):
+        return sum(1 for asset in self._assets.values() if asset.variants and len(asset.variants) > 1)
+
+    def find(self, url_path):
+        """Asset for a request path (no query string), or None"""
+        path = posixpath.normpath(unquote(url_path))
+        if path in ('/', '.'):
+            path = '/index.html'
+        return self._assets.get(path)
+
+
+class StaticAssetMixin:
+    """send_asset() for request handlers that also mix in JSONResponseMixin"""
+
+    def send_asset(self, asset):
+        if etag_matches(self.headers.get('If-None-Match'), asset.etag):
+            self.send_head_only(304, None, asset.content_type, asset.headers[None])
+            return
+        coding, body = asset.choose(self.headers.get('Accept-Encoding'))
+        if body is not None:
+            self.send_body(200, body, asset.content_type, asset.headers[coding])
+            return
+        try:
+            f = open(asset.path, 'rb')
+        except OSError:
+            self.send_error(404, 'File not found')
+            return
+        with f:
+            self.send_head_only(200, asset.size, asset.content_type, asset.headers[coding])
+            # Zero-copy from the page cache to the socket where os.sendfile exists
+            self.connection.sendfile(f, 0, asset.size)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import glob
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from access_log import AccessLog, AccessLogError, parse_sample_rates  # noqa: E402
+from quiz_handler import QuizRequestHandler  # noqa: E402
+from quiz_store import QuizStore  # noqa: E402
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class ParseSampleRatesTest(unittest.TestCase):
+    def test_rates(self):
+        self.assertEqual(parse_sample_rates(['/api/health=0.01', '/api/users/{user_id}/position=1']),
+                         {'/api/health': 0.01, '/api/users/{user_id}/position': 1.0})
+        self.assertEqual(parse_sample_rates(None), {})
+
+    def test_invalid(self):
+        for spec in ('/api/health', 'api/health=0.5', '/api/health=2', '/api/health=-0.1', '/api/health=often'):
+            with self.assertRaises(AccessLogError, msg=spec):
+                parse_sample_rates([spec])
+
+
+class AccessLogTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'access.jsonl')
+
+    def test_records_written_on_close(self):
+        log = AccessLog(self.path)
+        log.record('GET', '/api/users/{user_id}/position', 200, 0.0012345, user_id='user_1')
+        log.record('GET', None, 404, 0.002, path='/' + 'x' * 300)
+        log.record('POST', '/api/answers', 500, 0.5)
+        self.assertEqual(log.pending(), 3)
+        log.close()
+        first, unmatched, failed = read_records(self.path)
+        self.assertEqual({key: first[key] for key in ('method', 'route', 'status', 'ms', 'userId')},
+                         {'method': 'GET', 'route': '/api/users/{user_id}/position', 'status': 200, 'ms': 1.234,
+                          'userId': 'user_1'})
+        self.assertAlmostEqual(first['ts'], time.time(), delta=5)
+        # Paths are only kept for requests that matched no route, and cut short
+        self.assertNotIn('path', first)
+        self.assertEqual(len(unmatched['path']), 200)
+        self.assertNotIn('userId', failed)
+        self.assertEqual((log.written, log.pending()), (3, 0))
+
+    def test_background_writer(self):
+        log = AccessLog(self.path, flush_interval=0.02).start()
+        self.addCleanup(log.close)
+        log.record('GET', '/api/health', 200, 0.001)
+        self.assertTrue(wait_until(lambda: log.written == 1))
+        self.assertEqual(read_records(self.path)[0]['route'], '/api/health')
+
+    def test_sampling_keeps_errors(self):
+        log = AccessLog(self.path, sample_rates={'/api/health': 0.0, '/api/leaderboard': 1.0})
+        for _ in range(10):
+            log.record('GET', '/api/health', 200, 0.001)
+        log.record('GET', '/api/health', 503, 0.001)
+        log.record('GET', '/api/leaderboard', 200, 0.001)
+        log.record('GET', '/api/answers', 200, 0.001)
+        log.close()
+        records = read_records(self.path)
+        self.assertEqual(log.sampled_out, 10)
+        self.assertEqual([(r['route'], r['status'], r.get('sampleRate')) for r in records],
+                         [('/api/health', 503, None), ('/api/leaderboard', 200, 1.0), ('/api/answers', 200, None)])
+
+    def test_sample_rate(self):
+        log = AccessLog(self.path, sample_rates={'/api/health': 0.25})
+        random.seed(11)
+        for _ in range(4000):
+            log.record('GET', '/api/health', 200, 0.001)
+        self.assertAlmostEqual(log.pending() / 4000, 0.25, delta=0.03)
+        self.assertEqual(log.pending() + log.sampled_out, 4000)
+
+    def test_full_queue_drops(self):
+        log = AccessLog(self.path, capacity=3)
+        for i in range(5):
+            log.record('GET', '/api/health', 200, 0.001, user_id=str(i))
+        log.close()
+        self.assertEqual((log.written, log.dropped), (3, 2))
+        # The oldest records are kept; new ones are refused
+        self.assertEqual([r['userId'] for r in read_records(self.path)], ['0', '1', '2'])
+
+    def test_rotation(self):
+        log = AccessLog(self.path, max_bytes=400, backups=2)
+        for i in range(40):
+            log.record('GET', '/api/health', 200, 0.001, user_id=f'user_{i}')
+            log.flush()
+        log.close()
+        self.assertGreater(log.rotations, 2)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['access.jsonl', 'access.jsonl.1', 'access.jsonl.2'])
+        kept = []
+        for path in (self.path + '.2', self.path + '.1', self.path):
+            self.assertLessEqual(os.path.getsize(path), 400)
+            kept += [r['userId'] for r in read_records(path)]
+        # The newest records survive, in order
+        self.assertEqual(kept, [f'user_{i}' for i in range(40 - len(kept), 40)])
+
+    def test_appends_to_an_existing_file(self):
+        for _ in range(2):
+            log = AccessLog(self.path)
+            log.record('GET', '/api/health', 200, 0.001)
+            log.close()
+        self.assertEqual(len(read_records(self.path)), 2)
+
+    def test_per_process_file(self):
+        log = AccessLog(self.path, per_process=True)
+        log.record('GET', '/api/health', 200, 0.001)
+        log.close()
+        self.assertEqual(glob.glob(os.path.join(self.directory, '*')),
+                         [os.path.join(self.directory, f'access-{os.getpid()}.jsonl')])
+
+
+class _Server:
+    server_name = 'test'
+    server_port = 0
+
+
+class Handler(QuizRequestHandler):
+    store = QuizStore()
+
+
+class HandlerLogTest(unittest.TestCase):
+    def test_requests_are_logged_instead_of_printed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'access.jsonl')
+        Handler.access_log = AccessLog(path)
+        self.addCleanup(setattr, Handler, 'access_log', None)
+        requests = [b'POST /api/users HTTP/1.0\r\nContent-Length: 16\r\n\r\n{"name": "hana"}',
+                    b'GET /api/users/user_9/position HTTP/1.0\r\n\r\n',
+                    b'GET /api/nothing HTTP/1.0\r\n\r\n']
+        for raw in requests:
+            handler = object.__new__(Handler)
+            handler.rfile = io.BytesIO(raw)
+            handler.wfile = io.BytesIO()
+            handler.client_address = ('127.0.0.1', 0)
+            handler.server = _Server()
+            handler.directory = directory
+            handler.close_connection = True
+            with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+                handler.handle_one_request()
+            # No per-request line; send_error's own error line for a missing file is still printed
+            self.assertNotIn('HTTP/1.0"', stderr.getvalue())
+        Handler.access_log.close()
+        created, position, missing = read_records(path)
+        self.assertEqual((created['route'], created['status']), ('/api/users', 200))
+        self.assertTrue(created['userId'].startswith('user_'))
+        self.assertEqual((position['status'], position['userId']), (404, 'user_9'))
+        self.assertEqual((missing['route'], missing['path'], missing['status']), (None, '/api/nothing', 404))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adaptive import LANGUAGE_LEVELS, MATH_LEVELS, MIN_ANSWERS, WINDOW, AdaptiveDifficulty  # noqa: E402
+
+
+def record(adaptive, question_type, answers, user_id='u'):
+    for is_correct in answers:
+        adaptive.record(user_id, question_type, is_correct)
+
+
+class AdaptiveDifficultyTest(unittest.TestCase):
+    def test_new_user_starts_at_the_easiest_level(self):
+        adaptive = AdaptiveDifficulty()
+        self.assertEqual(adaptive.progress('u', 'math'), (0, 0, 0))
+        self.assertEqual(adaptive.choose('u', 'math'), ('math',) + MATH_LEVELS[0])
+        self.assertEqual(adaptive.choose('u', 'language'), ('language', LANGUAGE_LEVELS[0], None))
+        self.assertEqual(len(adaptive), 0)
+
+    def test_promotion_waits_for_min_answers(self):
+        adaptive = AdaptiveDifficulty()
+        record(adaptive, 'math', [True] * (MIN_ANSWERS - 1))
+        self.assertEqual(adaptive.progress('u', 'math'), (0, MIN_ANSWERS - 1, MIN_ANSWERS - 1))
+        record(adaptive, 'math', [True])
+        # The window starts over at the new level
+        self.assertEqual(adaptive.progress('u', 'math'), (1, 0, 0))
+        self.assertEqual(adaptive.choose('u', 'math'), ('math',) + MATH_LEVELS[1])
+
+    def test_demotion_and_bounds(self):
+        adaptive = AdaptiveDifficulty()
+        record(adaptive, 'math', [True] * MIN_ANSWERS * (len(MATH_LEVELS) + 2))
+        self.assertEqual(adaptive.progress('u', 'math')[0], len(MATH_LEVELS) - 1)
+        # The top level's window is full of correct answers: half of it must be missed
+        record(adaptive, 'math', [False] * (WINDOW // 2 - 1))
+        self.assertEqual(adaptive.progress('u', 'math')[0], len(MATH_LEVELS) - 1)
+        record(adaptive, 'math', [False])
+        self.assertEqual(adaptive.progress('u', 'math'), (len(MATH_LEVELS) - 2, 0, 0))
+        record(adaptive, 'math', [False] * MIN_ANSWERS * (len(MATH_LEVELS) + 2))
+        level, correct, count = adaptive.progress('u', 'math')
+        self.assertEqual((level, correct), (0, 0))
+        self.assertLessEqual(count, WINDOW)
+
+    def test_window_keeps_the_latest_answers(self):
+        adaptive = AdaptiveDifficulty()
+        # Two thirds correct moves neither up nor down
+        record(adaptive, 'language', [True, True, False] * 10)
+        level, correct, count = adaptive.progress('u', 'language')
+        self.assertEqual((level, count), (0, WINDOW))
+        self.assertEqual(correct, sum(([True, True, False] * 10)[-WINDOW:]))
+
+    def test_subjects_and_users_are_independent(self):
+        adaptive = AdaptiveDifficulty()
+        record(adaptive, 'language', [True] * MIN_ANSWERS)
+        record(adaptive, 'math', [False, True, False])
+        record(adaptive, 'math', [True], user_id='v')
+        record(adaptive, 'science', [True] * MIN_ANSWERS)
+        self.assertEqual(adaptive.progress('u', 'language'), (1, 0, 0))
+        self.assertEqual(adaptive.progress('u', 'math'), (0, 1, 3))
+        self.assertEqual(adaptive.progress('v', 'math'), (0, 1, 1))
+        self.assertEqual(adaptive.progress('v', 'language'), (0, 0, 0))
+        self.assertEqual(len(adaptive), 2)
+
+    def test_auto_favours_the_subject_with_more_mistakes(self):
+        adaptive = AdaptiveDifficulty()
+        record(adaptive, 'math', [False] * (MIN_ANSWERS - 1))
+        random.seed(3)
+        picks = [adaptive.choose('u')[0] for _ in range(1000)]
+        # Weights 1 + mistakes: math 5 + 1 against language 1
+        self.assertGreater(picks.count('math'), 750)
+        self.assertGreater(picks.count('language'), 50)
+
+
+class ConcurrentRecordTest(unittest.TestCase):
+    def setUp(self):
+        # Switch threads as often as possible so unlocked updates would interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+    def test_subjects_recorded_together_keep_every_answer(self):
+        adaptive = AdaptiveDifficulty(stripes=4)
+        user_ids = [f'user_{i}' for i in range(500)]
+        answers = MIN_ANSWERS - 1
+
+        def answer(question_type):
+            for _ in range(answers):
+                for user_id in user_ids:
+                    adaptive.record(user_id, question_type, True)
+
+        # Both subjects share each user's int, so a lost update would reset the other one's count
+        threads = [threading.Thread(target=answer, args=(question_type,))
+                   for question_type in ('math', 'language', 'math', 'language')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Ten correct answers per subject: promoted after MIN_ANSWERS, then four into the new level
+        expected = (1, 2 * answers - MIN_ANSWERS, 2 * answers - MIN_ANSWERS)
+        for user_id in user_ids:
+            for question_type in ('math', 'language'):
+                self.assertEqual(adaptive.progress(user_id, question_type), expected, (user_id, question_type))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_log import AnswerLog  # noqa: E402
+from question_tokens import QuestionTokens  # noqa: E402
+
+
+def all_question_ids(log, user_id, limit=7):
+    """Every question id in the user's history, oldest first, read page by page"""
+    ids = []
+    before = None
+    while True:
+        page = log.history(user_id, limit, before)
+        ids.extend(answer['questionId'] for answer in page['answers'])
+        before = page['nextCursor']
+        if before is None:
+            return ids[::-1]
+
+
+class AnswerLogTest(unittest.TestCase):
+    def test_question_ids_round_trip(self):
+        token = QuestionTokens('test-secret').issue({'type': 'math', 'answer': '4', 'difficulty': 1})
+        question_ids = [
+            'math_1721000000_1234',
+            'lang_1721000000_9999',
+            'bank_4294967295_9999999',
+            token,
+            # Not packable: leading zero, oversized parts, another shape
+            'math_1721000000_0123',
+            'math_4294967296_1234',
+            'math_1721000000_16777216',
+            'custom-question',
+            'q1.not-a-token',
+        ]
+        log = AnswerLog()
+        for question_id in question_ids:
+            log.append('user_a', question_id, True)
+        self.assertEqual(all_question_ids(log, 'user_a'), question_ids)
+
+    def test_pages_and_totals(self):
+        log = AnswerLog()
+        expected = []
+        for i in range(50):
+            user_id = 'user_a' if i % 3 else 'user_b'
+            question_id = f'math_{1721000000 + i}_{1000 + i}'
+            log.append(user_id, question_id, i % 2 == 0, answered_at=1721000000 + i)
+            if user_id == 'user_a':
+                expected.append(question_id)
+
+        self.assertEqual(all_question_ids(log, 'user_a'), expected)
+        page = log.history('user_a', 5)
+        self.assertEqual(page['answered'], len(expected))
+        self.assertEqual(page['correct'], sum(1 for i in range(50) if i % 3 and i % 2 == 0))
+        self.assertEqual([answer['questionId'] for answer in page['answers']], expected[:-6:-1])
+        # Cursors are global row numbers, newest first
+        cursors = [answer['cursor'] for answer in page['answers']]
+        self.assertEqual(cursors, sorted(cursors, reverse=True))
+        self.assertEqual(page['nextCursor'], cursors[-1])
+
+    def test_unknown_user_gets_empty_page(self):
+        log = AnswerLog()
+        log.append('user_a', 'math_1721000000_1234', True)
+        self.assertEqual(log.history('user_b'), {
+            'answers': [], 'nextCursor': None, 'answered': 0, 'correct': 0, 'accuracy': None,
+        })
+
+    def test_extend_records(self):
+        log = AnswerLog()
+        log.extend([
+            {'userId': 'user_a', 'questionId': 'math_1721000000_1234', 'isCorrect': True},
+            {'userId': 'user_a', 'questionId': 'lang_1721000000_4321', 'isCorrect': False},
+        ])
+        page = log.history('user_a')
+        self.assertEqual([answer['isCorrect'] for answer in page['answers']], [False, True])
+        self.assertEqual(page['accuracy'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
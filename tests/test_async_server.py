@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import http.client
+import http.server
+import os
+import socket
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_server import MAX_BODY_SIZE, MAX_HEAD_SIZE, AsyncServer, BadRequest, parse_head, wants_keep_alive  # noqa: E402,E501
+
+
+class EchoHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, body):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.reply(self.path.encode())
+
+    def do_POST(self):
+        self.reply(self.rfile.read(int(self.headers['Content-Length'])))
+
+
+class ParseHeadTest(unittest.TestCase):
+    def test_request_line_and_headers(self):
+        method, target, version, headers = parse_head(
+            b'POST /api/answers?x=1 HTTP/1.1\r\nHost: quiz\r\nContent-Length: 12\r\n'
+            b'X-Multi: a\r\nX-Multi: b\r\n\r\n')
+        self.assertEqual((method, target, version), ('POST', '/api/answers?x=1', 'HTTP/1.1'))
+        self.assertEqual(headers['content-length'], '12')
+        self.assertEqual(headers.get_all('X-Multi'), ['a', 'b'])
+
+    def test_no_headers(self):
+        method, target, version, headers = parse_head(b'GET / HTTP/1.0\r\n\r\n')
+        self.assertEqual((method, target, version), ('GET', '/', 'HTTP/1.0'))
+        self.assertEqual(len(headers), 0)
+
+    def test_bad_request_lines(self):
+        for line in (b'GET /\r\n\r\n', b'GET  / HTTP/1.1\r\n\r\n', b'GET / HTTP/1.1 extra\r\n\r\n', b'\r\n\r\n'):
+            with self.assertRaises(BadRequest) as caught:
+                parse_head(line)
+            self.assertEqual(caught.exception.status, 400, line)
+
+    def test_unsupported_version(self):
+        for version in (b'HTTP/2.0', b'HTTP/0.9', b'http/1.1'):
+            with self.assertRaises(BadRequest) as caught:
+                parse_head(b'GET / ' + version + b'\r\n\r\n')
+            self.assertEqual(caught.exception.status, 505)
+
+    def test_too_many_headers(self):
+        head = b'GET / HTTP/1.1\r\n' + b''.join(b'X-%d: 1\r\n' % i for i in range(200)) + b'\r\n'
+        with self.assertRaises(BadRequest) as caught:
+            parse_head(head)
+        self.assertEqual(caught.exception.status, 400)
+
+    def test_keep_alive_defaults(self):
+        def headers(value):
+            return parse_head(b'GET / HTTP/1.1\r\n' + (b'Connection: ' + value + b'\r\n' if value else b'') + b'\r\n')[3]
+        self.assertTrue(wants_keep_alive('HTTP/1.1', headers(b'')))
+        self.assertFalse(wants_keep_alive('HTTP/1.1', headers(b'close')))
+        self.assertFalse(wants_keep_alive('HTTP/1.0', headers(b'')))
+        self.assertTrue(wants_keep_alive('HTTP/1.0', headers(b'Keep-Alive')))
+
+
+class AsyncServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = AsyncServer(('127.0.0.1', 0), EchoHandler, idle_timeout=5, max_requests=3)
+        # The loop has no stop call; the daemon thread ends with the test run
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.server_close()
+
+    def raw(self, data):
+        """Send raw bytes and read until the server closes the connection"""
+        with socket.create_connection(self.server.server_address, timeout=5) as sock:
+            sock.sendall(data)
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+
+    def test_bound_address(self):
+        host, port = self.server.server_address
+        self.assertEqual(host, '127.0.0.1')
+        self.assertNotEqual(port, 0)
+        self.assertEqual(self.server.server_port, port)
+
+    def test_keep_alive_until_max_requests(self):
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        self.addCleanup(conn.close)
+        for i in range(3):
+            conn.request('POST', '/echo', body=f'body {i}')
+            response = conn.getresponse()
+            self.assertEqual((response.status, response.read()), (200, f'body {i}'.encode()))
+            if i == 0:
+                sock = conn.sock
+            elif i < 2:
+                self.assertIs(conn.sock, sock)
+        # The third request was the last one this connection may carry
+        self.assertTrue(response.will_close)
+        self.assertIsNone(conn.sock)
+
+    def test_pipelined_requests_are_framed_by_content_length(self):
+        reply = self.raw(b'POST /a HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello'
+                         b'GET /second HTTP/1.1\r\nConnection: close\r\n\r\n')
+        self.assertEqual(reply.count(b'HTTP/1.1 200'), 2)
+        self.assertTrue(reply.endswith(b'/second'))
+        self.assertIn(b'\r\n\r\nhello', reply)
+
+    def test_errors_close_the_connection(self):
+        cases = [
+            (b'NONSENSE\r\n\r\n', 400),
+            (b'GET / HTTP/2.0\r\n\r\n', 505),
+            (b'POST / HTTP/1.1\r\nContent-Length: abc\r\n\r\n', 400),
+            (b'POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n' % (MAX_BODY_SIZE + 1), 413),
+            (b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n', 501),
+            (b'GET / HTTP/1.1\r\nX-Big: ' + b'a' * MAX_HEAD_SIZE + b'\r\n\r\n', 431),
+        ]
+        for request, status in cases:
+            reply = self.raw(request)
+            self.assertTrue(reply.startswith(b'HTTP/1.1 %d ' % status), (request[:40], reply[:60]))
+            self.assertIn(b'Connection: close', reply)
+
+    def test_unknown_method(self):
+        reply = self.raw(b'BREW /pot HTTP/1.1\r\nConnection: close\r\n\r\n')
+        self.assertTrue(reply.startswith(b'HTTP/1.1 501 '), reply[:60])
+
+
+if __name__ == '__main__':
+    unittest.main()
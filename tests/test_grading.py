@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import MAX_ANSWER_BATCH, GradingError, grade_batch, parse_answer_batch  # noqa: E402
+from question_batch import BatchError  # noqa: E402
+
+
+class ParseAnswerBatchTest(unittest.TestCase):
+    def test_items(self):
+        user_id, items = parse_answer_batch({'userId': 'user_1', 'answers': [
+            {'questionId': 'math_1', 'answer': '4'},
+            {'questionId': 'math_2', 'answer': 7},
+        ]})
+        self.assertEqual((user_id, items), ('user_1', [('math_1', '4'), ('math_2', 7)]))
+
+    def test_rejects_missing_and_malformed_fields(self):
+        answer = {'questionId': 'math_1', 'answer': '4'}
+        bodies = [
+            [],
+            {'answers': [answer]},
+            {'userId': 'user_1', 'answers': []},
+            {'userId': 'user_1', 'answers': answer},
+            {'userId': 'user_1', 'answers': [answer] * (MAX_ANSWER_BATCH + 1)},
+            {'userId': 'user_1', 'answers': ['math_1']},
+            {'userId': 'user_1', 'answers': [{'questionId': 'math_1'}]},
+            # Truthy but unhashable or not text: these used to reach grade_batch and the store
+            {'userId': [1], 'answers': [answer]},
+            {'userId': {'id': 'user_1'}, 'answers': [answer]},
+            {'userId': 7, 'answers': [answer]},
+            {'userId': 'user_1', 'answers': [{'questionId': {'a': 1}, 'answer': '4'}]},
+            {'userId': 'user_1', 'answers': [{'questionId': ['math_1'], 'answer': '4'}]},
+        ]
+        for body in bodies:
+            with self.assertRaises(BatchError, msg=body):
+                parse_answer_batch(body)
+
+
+class GradeBatchTest(unittest.TestCase):
+    def test_increments_duplicates_and_errors(self):
+        def grade(question_id, answer):
+            if question_id == 'gone':
+                raise GradingError(410, 'Question expired')
+            return question_id.split('_')[0], answer == 'right'
+
+        results, increments = grade_batch(grade, [
+            ('math_1', 'right'), ('math_2', 'wrong'), ('lang_1', 'right'), ('math_1', 'right'), ('gone', 'x'),
+        ])
+        self.assertEqual(increments, {'math': 10, 'lang': 10})
+        self.assertEqual([result.get('status') for result in results], [None, None, None, 409, 410])
+        self.assertEqual([result.get('isCorrect') for result in results], [True, False, True, None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server_modes  # noqa: E402
+from quiz_handler import QuizRequestHandler  # noqa: E402
+from quiz_store import QuizStore  # noqa: E402
+
+
+class Handler(QuizRequestHandler):
+    store = QuizStore()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class KeepAliveTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        args = server_modes.parse_args(['--keep-alive', '--max-requests', '3', '--idle-timeout', '0.5'])
+        cls.server = server_modes.create_server(Handler, ('127.0.0.1', 0), args)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def connect(self):
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_connection_is_reused_until_max_requests(self):
+        conn = self.connect()
+        for i in range(3):
+            conn.request('GET', '/api/health')
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.read())['status'], 'ok')
+            if i == 0:
+                sock = conn.sock
+            elif i < 2:
+                self.assertIs(conn.sock, sock)
+                self.assertIsNone(response.getheader('Connection'))
+        self.assertEqual(response.getheader('Connection'), 'close')
+        self.assertIsNone(conn.sock)
+
+    def test_every_response_has_a_length(self):
+        conn = self.connect()
+        requests = [
+            ('POST', '/api/users', json.dumps({'name': 'keepalive'}), 200),
+            ('GET', '/api/users/nobody/position', None, 404),
+            ('POST', '/api/nothing-here', '{"unread": "body"}', 404),
+        ]
+        for method, path, body, status in requests:
+            conn.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            self.assertEqual(response.status, status, path)
+            self.assertEqual(int(response.getheader('Content-Length')), len(response.read()), path)
+        # Three responses, each framed, on the one connection
+        self.assertEqual(response.getheader('Connection'), 'close')
+
+    def test_file_fallthrough_has_a_length(self):
+        conn = self.connect()
+        conn.request('GET', '/no-such-file.txt')
+        response = conn.getresponse()
+        self.assertEqual(response.status, 404)
+        self.assertEqual(int(response.getheader('Content-Length')), len(response.read()))
+
+    def test_405_keeps_the_connection(self):
+        conn = self.connect()
+        conn.request('POST', '/api/health', body='{}')
+        response = conn.getresponse()
+        response.read()
+        self.assertEqual(response.status, 405)
+        self.assertFalse(response.will_close)
+        conn.request('GET', '/api/health')
+        self.assertEqual(conn.getresponse().status, 200)
+
+    def raw(self, data, sock=None):
+        """Send a request on a raw socket and read one response framed by Content-Length"""
+        sock.sendall(data)
+        reply = b''
+        while b'\r\n\r\n' not in reply:
+            reply += sock.recv(65536)
+        head, _, body = reply.partition(b'\r\n\r\n')
+        length = int(head.lower().split(b'content-length: ')[1].split(b'\r\n')[0])
+        while len(body) < length:
+            body += sock.recv(65536)
+        return head
+
+    def test_http_10_keep_alive(self):
+        with socket.create_connection(self.server.server_address, timeout=5) as sock:
+            head = self.raw(b'GET /api/health HTTP/1.0\r\nConnection: keep-alive\r\n\r\n', sock)
+            self.assertIn(b'\r\nConnection: keep-alive', head)
+            head = self.raw(b'GET /api/health HTTP/1.0\r\n\r\n', sock)
+            self.assertIn(b'\r\nConnection: close', head)
+            self.assertEqual(sock.recv(65536), b'')
+
+    def test_idle_connection_is_closed(self):
+        with socket.create_connection(self.server.server_address, timeout=5) as sock:
+            self.raw(b'GET /api/health HTTP/1.1\r\nHost: quiz\r\n\r\n', sock)
+            start = time.monotonic()
+            self.assertEqual(sock.recv(65536), b'')
+            self.assertLess(time.monotonic() - start, 4)
+
+
+class DefaultModeTest(unittest.TestCase):
+    def test_http_10_without_keep_alive(self):
+        # Not Handler: create_server() above switched that class to keep-alive
+        class Plain(QuizRequestHandler):
+            pass
+        args = server_modes.parse_args([])
+        server = server_modes.create_server(Plain, ('127.0.0.1', 0), args)
+        self.addCleanup(server.server_close)
+        self.assertEqual(Plain.protocol_version, 'HTTP/1.0')
+        self.assertIsNone(Plain.max_requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
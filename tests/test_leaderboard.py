@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Leaderboard, LeaderboardError, ScoreIndex, parse_leaderboard_query  # noqa: E402
+from quiz_store import QuizStore  # noqa: E402
+
+
+class BruteForceIndex:
+    """The ranking ScoreIndex should produce, recomputed from scratch on every query"""
+
+    def __init__(self):
+        self.scores = {}
+        self.arrived = {}
+        self.clock = 0
+
+    def set(self, user_id, score):
+        score = max(0, score)
+        if self.scores.get(user_id) == score:
+            return
+        self.scores[user_id] = score
+        # Users sharing a score are listed in the order they reached it
+        self.clock += 1
+        self.arrived[user_id] = self.clock
+
+    def position(self, user_id):
+        if user_id not in self.scores:
+            return None
+        score = self.scores[user_id]
+        return 1 + sum(1 for other in self.scores.values() if other > score), score
+
+    def top(self, limit):
+        ordered = sorted(self.scores, key=lambda u: (-self.scores[u], self.arrived[u]))[:limit]
+        return [(self.position(u)[0], u, self.scores[u]) for u in ordered]
+
+
+def new_user(i):
+    return {'id': f'user_{i}', 'name': f'student{i}', 'totalScore': 0, 'mathScore': 0, 'languageScore': 0}
+
+
+class ScoreIndexTest(unittest.TestCase):
+    def check(self, index, expected, user_ids):
+        self.assertEqual(len(index), len(expected.scores))
+        for limit in (1, 3, 10, len(user_ids) + 5):
+            self.assertEqual(index.top(limit), expected.top(limit))
+        for user_id in user_ids:
+            self.assertEqual(index.position(user_id), expected.position(user_id))
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        index, expected = ScoreIndex(), BruteForceIndex()
+        user_ids = [f'user_{i}' for i in range(60)]
+        for step in range(3000):
+            user_id = rng.choice(user_ids)
+            current = expected.scores.get(user_id, 0)
+            # Mostly small steps with many ties, some jumps past the initial capacity and below zero
+            score = rng.choice((current + 10, current + 10, current - 10, rng.randrange(0, 50),
+                                rng.randrange(0, 5000), -5))
+            index.set(user_id, score)
+            expected.set(user_id, score)
+            if step % 50 == 0:
+                self.check(index, expected, user_ids + ['nobody'])
+        self.check(index, expected, user_ids + ['nobody'])
+
+    def test_ties_share_a_position(self):
+        index = ScoreIndex()
+        for user_id, score in (('a', 30), ('b', 50), ('c', 30), ('d', 10)):
+            index.set(user_id, score)
+        self.assertEqual(index.top(10), [(1, 'b', 50), (2, 'a', 30), (2, 'c', 30), (4, 'd', 10)])
+        self.assertEqual(index.position('c'), (2, 30))
+        self.assertEqual(index.position('d'), (4, 10))
+
+    def test_growth_keeps_counts(self):
+        index = ScoreIndex()
+        for i in range(100):
+            index.set(f'user_{i}', i)
+        # Far past the initial capacity, so the tree is rebuilt from the buckets
+        index.set('high', 10 ** 6)
+        self.assertEqual(index.position('high'), (1, 10 ** 6))
+        self.assertEqual(index.position('user_0'), (101, 0))
+        self.assertEqual(index.top(2), [(1, 'high', 10 ** 6), (2, 'user_99', 99)])
+
+    def test_empty(self):
+        index = ScoreIndex()
+        self.assertEqual(index.top(10), [])
+        self.assertIsNone(index.position('nobody'))
+
+
+class LeaderboardTest(unittest.TestCase):
+    def test_scopes(self):
+        board = Leaderboard()
+        board.update(dict(new_user(1), totalScore=30, mathScore=30))
+        board.update(dict(new_user(2), totalScore=20, languageScore=20))
+        self.assertEqual([leader['userId'] for leader in board.top('total')], ['user_1', 'user_2'])
+        self.assertEqual(board.top('language', 1),
+                         [{'position': 1, 'userId': 'user_2', 'name': 'student2', 'score': 20}])
+        self.assertEqual(board.position('user_1', 'language'), {'position': 2, 'score': 0, 'users': 2})
+        self.assertIsNone(board.position('nobody'))
+
+    def test_older_version_is_ignored(self):
+        board = Leaderboard()
+        board.update(dict(new_user(1), totalScore=20, mathScore=20), version=2)
+        # A delayed update from before the one already applied
+        board.update(dict(new_user(1), totalScore=10, mathScore=10), version=1)
+        self.assertEqual(board.position('user_1'), {'position': 1, 'score': 20, 'users': 1})
+        self.assertEqual(board.position('user_1', 'math')['score'], 20)
+        board.update(dict(new_user(1), totalScore=30, mathScore=30), version=3)
+        self.assertEqual(board.position('user_1', 'math')['score'], 30)
+
+    def test_store_matches_users_under_concurrent_updates(self):
+        store = QuizStore(stripes=4)
+        user_ids = [store.add_user(new_user(i))['id'] for i in range(20)]
+
+        def answer(seed):
+            rng = random.Random(seed)
+            for _ in range(2000):
+                store.add_score(rng.choice(user_ids), rng.choice(('math', 'language')), 10)
+
+        threads = [threading.Thread(target=answer, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for user_id in user_ids:
+            user = store.get_user(user_id)
+            for scope, field in (('total', 'totalScore'), ('math', 'mathScore'), ('language', 'languageScore')):
+                self.assertEqual(store.user_position(user_id, scope)['score'], user[field])
+        self.assertEqual(sum(leader['score'] for leader in store.top_users('total', 100)), 8 * 2000 * 10)
+
+
+class ParseLeaderboardQueryTest(unittest.TestCase):
+    def test_defaults_and_errors(self):
+        self.assertEqual(parse_leaderboard_query({}), ('total', 10))
+        self.assertEqual(parse_leaderboard_query({'scope': ['math'], 'limit': ['5']}), ('math', 5))
+        for query in ({'scope': ['art']}, {'limit': ['x']}, {'limit': ['0']}, {'limit': ['101']}):
+            with self.assertRaises(LeaderboardError):
+                parse_leaderboard_query(query)
+
+
+if __name__ == '__main__':
+    unittest.main()
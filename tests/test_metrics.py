@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import METRICS_TYPE, Metrics, bucket_index, bucket_upper_bound  # noqa: E402
+from question_pool import MathQuestionPool  # noqa: E402
+from quiz_handler import QuizRequestHandler  # noqa: E402
+from quiz_store import QuizStore  # noqa: E402
+
+
+def parse_samples(text):
+    """{(name, labels): value} from Prometheus text exposition"""
+    samples = {}
+    for line in text.decode('utf-8').splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        name, _, labels = series.partition('{')
+        samples[(name, labels.rstrip('}'))] = float(value)
+    return samples
+
+
+class BucketTest(unittest.TestCase):
+    def test_buckets_cover_every_value(self):
+        previous = 0
+        for micros in list(range(5000)) + [10 ** 6, 3 * 10 ** 7, (1 << 27) - 1]:
+            index = bucket_index(micros)
+            self.assertGreaterEqual(index, previous)
+            self.assertLess(micros, bucket_upper_bound(index), micros)
+            if index > 0:
+                self.assertGreaterEqual(micros, bucket_upper_bound(index - 1), micros)
+            previous = index
+
+    def test_buckets_are_at_most_a_quarter_wide(self):
+        for index in range(4, bucket_index((1 << 27) - 1) + 1):
+            lower = bucket_upper_bound(index - 1)
+            self.assertLessEqual(4 * (bucket_upper_bound(index) - lower), lower, index)
+
+    def test_values_past_the_range_share_the_last_bucket(self):
+        self.assertEqual(bucket_index(10 ** 12), bucket_index((1 << 27) - 1))
+
+
+class MetricsTest(unittest.TestCase):
+    def test_render(self):
+        metrics = Metrics()
+        for seconds in (0.00001, 0.0002, 0.0002, 0.003, 2.0):
+            metrics.observe('GET', '/api/health', 200, seconds)
+        metrics.observe('POST', '/api/answers', 400, 0.001)
+        metrics.observe('GET', None, None, 0.001)
+        samples = parse_samples(metrics.render())
+        self.assertEqual(samples[('quiz_requests_total', 'method="GET",route="/api/health",status="200"')], 5)
+        self.assertEqual(samples[('quiz_requests_total', 'method="POST",route="/api/answers",status="400"')], 1)
+        # Unrouted requests and unsent statuses are still counted
+        self.assertEqual(samples[('quiz_requests_total', 'method="GET",route="other",status="0"')], 1)
+
+        labels = 'method="GET",route="/api/health"'
+        buckets = [(float(key[1].split('le="')[1].rstrip('"')), value) for key, value in samples.items()
+                   if key[0] == 'quiz_request_duration_seconds_bucket' and key[1].startswith(labels)]
+        self.assertEqual([value for _, value in buckets], sorted(value for _, value in buckets))
+        by_edge = dict(buckets)
+        self.assertEqual(by_edge[32e-6], 1)
+        self.assertEqual(by_edge[256e-6], 3)
+        self.assertEqual(by_edge[4096e-6], 4)
+        self.assertEqual(by_edge[float('inf')], 5)
+        self.assertEqual(samples[('quiz_request_duration_seconds_count', labels)], 5)
+        self.assertAlmostEqual(samples[('quiz_request_duration_seconds_sum', labels)], 2.00341, places=5)
+
+    def test_extra_samples(self):
+        text = Metrics().render([('quiz_thing', 'gauge', 'A thing', [({'tier': 1}, 3), ({}, 4)])]).decode()
+        self.assertIn('# TYPE quiz_thing gauge\n', text)
+        self.assertIn('quiz_thing{tier="1"} 3\n', text)
+        self.assertIn('quiz_thing 4\n', text)
+
+    def test_threads_are_summed_and_retired(self):
+        metrics = Metrics()
+
+        def work():
+            for _ in range(10):
+                metrics.observe('GET', '/api/health', 200, 0.0001)
+        for _ in range(100):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        # Shards of finished threads were folded together as new threads registered
+        self.assertLess(len(metrics._shards), 100)
+        self.assertEqual(metrics.snapshot().statuses[('GET', '/api/health', 200)], 1000)
+        self.assertEqual(metrics._shards, [])
+
+
+class _Server:
+    server_name = 'test'
+    server_port = 0
+
+
+class Handler(QuizRequestHandler):
+    store = QuizStore()
+    math_pool = MathQuestionPool(block_size=16, low_water=4)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def handle(raw):
+    handler = object.__new__(Handler)
+    handler.rfile = io.BytesIO(raw)
+    handler.wfile = io.BytesIO()
+    handler.client_address = ('127.0.0.1', 0)
+    handler.server = _Server()
+    handler.close_connection = True
+    handler.handle_one_request()
+    head, _, body = handler.wfile.getvalue().partition(b'\r\n\r\n')
+    return head, body
+
+
+class MetricsEndpointTest(unittest.TestCase):
+    def scrape(self):
+        head, body = handle(b'GET /api/metrics HTTP/1.0\r\n\r\n')
+        self.assertIn(b'Content-Type: ' + METRICS_TYPE.encode(), head)
+        return parse_samples(body)
+
+    def test_scrape(self):
+        # The route table's hook records into the class-wide Metrics, shared with other tests
+        generated = ('quiz_requests_total', 'method="GET",route="/api/questions/generate",status="200"')
+        # Routes are labelled by pattern, not by the user id in the path
+        position = ('quiz_requests_total', 'method="GET",route="/api/users/{user_id}/position",status="404"')
+        before = self.scrape()
+        handle(b'GET /api/questions/generate?type=math HTTP/1.0\r\n\r\n')
+        handle(b'GET /api/users/nobody/position HTTP/1.0\r\n\r\n')
+        samples = self.scrape()
+        self.assertEqual(samples[generated] - before.get(generated, 0), 1)
+        self.assertEqual(samples[position] - before.get(position, 0), 1)
+        self.assertEqual(samples[('quiz_question_pool_served_total', '')], 1)
+        self.assertEqual(samples[('quiz_global_questions', '')], 1)
+        self.assertIn(('quiz_score_stream_subscribers', ''), samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import SCORE_RECORD, SNAPSHOT_NAME, ScoreJournal  # noqa: E402
+
+
+def new_user(i):
+    return {
+        'id': f"user_test_{i}",
+        'name': f"student{i}",
+        'totalScore': 0,
+        'mathScore': 0,
+        'languageScore': 0,
+        'rank': '初心者',
+        'currentRank': 'bronze',
+    }
+
+
+def scores(users):
+    return {user['id']: (user['totalScore'], user['mathScore'], user['languageScore']) for user in users}
+
+
+class ScoreJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='score-journal-')
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def journal(self, **kwargs):
+        journal = ScoreJournal(self.directory, commit_interval=0.001, **kwargs)
+        self.addCleanup(journal.close)
+        return journal
+
+    def write(self, journal, users, events):
+        """Create the users and apply (user number, increments) events; returns the expected scores"""
+        expected = {}
+        for i in range(users):
+            journal.user_created(new_user(i))
+            expected[f"user_test_{i}"] = [0, 0, 0]
+        for i, increments in events:
+            journal.scores_added(f"user_test_{i}", increments)
+            totals = expected[f"user_test_{i}"]
+            totals[0] += sum(increments.values())
+            totals[1] += increments.get('math', 0)
+            totals[2] += increments.get('language', 0)
+        return {user_id: tuple(totals) for user_id, totals in expected.items()}
+
+    def segment_files(self):
+        return sorted(name for name in os.listdir(self.directory) if name.startswith('segment-'))
+
+    def test_recover_empty_directory(self):
+        self.assertEqual(self.journal().recover(), [])
+
+    def test_round_trip(self):
+        journal = self.journal()
+        journal.recover()
+        expected = self.write(journal, 3, [(0, {'math': 10}), (1, {'language': 10}), (0, {'math': 0}),
+                                           (2, {'math': 10, 'language': 10}), (0, {'language': 10})])
+        journal.close()
+
+        users = self.journal().recover()
+        self.assertEqual([user['id'] for user in users], ['user_test_0', 'user_test_1', 'user_test_2'])
+        self.assertEqual(scores(users), expected)
+        self.assertEqual(users[2]['rank'], '初心者')
+
+    def test_ranks_are_rebuilt(self):
+        journal = self.journal()
+        journal.recover()
+        self.write(journal, 1, [(0, {'math': 10})] * 12)
+        journal.close()
+
+        user, = self.journal().recover()
+        self.assertEqual(user['totalScore'], 120)
+        self.assertEqual(user['currentRank'], 'gold')
+
+    def test_recover_after_torn_tail(self):
+        journal = self.journal()
+        journal.recover()
+        expected = self.write(journal, 2, [(0, {'math': 10}), (1, {'language': 10})])
+        journal.close()
+
+        # A crash in the middle of the last write leaves half a user line and half a score record
+        users_file, scores_file = self.segment_files()
+        with open(os.path.join(self.directory, users_file), 'ab') as f:
+            f.write(b'{"id":"user_test_2","name":"stu')
+        with open(os.path.join(self.directory, scores_file), 'ab') as f:
+            f.write(SCORE_RECORD.pack(0, 10, 10, 0)[:7])
+
+        users = self.journal().recover()
+        self.assertEqual(scores(users), expected)
+
+    def test_events_after_torn_segment_keep_their_user(self):
+        journal = self.journal()
+        journal.recover()
+        self.write(journal, 2, [(1, {'math': 10})])
+        journal.close()
+        users_file = self.segment_files()[0]
+        with open(os.path.join(self.directory, users_file), 'ab') as f:
+            f.write(b'{"id":"lost"')
+
+        # The next run numbers new users after the recovered ones, not after the torn line
+        journal = self.journal(snapshot_interval=3600)
+        journal.recover()
+        journal.user_created(new_user(2))
+        journal.scores_added('user_test_2', {'language': 10})
+        journal.scores_added('user_test_1', {'math': 10})
+        journal.close()
+
+        users = self.journal().recover()
+        self.assertEqual(scores(users), {
+            'user_test_0': (0, 0, 0),
+            'user_test_1': (20, 20, 0),
+            'user_test_2': (10, 0, 10),
+        })
+
+    def test_always_sync_is_durable_on_return(self):
+        journal = self.journal(sync='always')
+        journal.recover()
+        journal.user_created(new_user(0))
+        journal.scores_added('user_test_0', {'math': 10})
+
+        # Read back while the first journal is still open, as after a crash
+        users = self.journal().recover()
+        self.assertEqual(scores(users), {'user_test_0': (10, 10, 0)})
+
+    def test_unknown_user_is_not_logged(self):
+        journal = self.journal()
+        journal.recover()
+        self.assertIsNone(journal.scores_added('nobody', {'math': 10}))
+
+    def test_duplicate_user_is_logged_once(self):
+        journal = self.journal()
+        journal.recover()
+        journal.user_created(new_user(0))
+        journal.user_created(new_user(0))
+        journal.close()
+        self.assertEqual(len(self.journal().recover()), 1)
+
+    def test_snapshot_then_tail(self):
+        journal = self.journal()
+        journal.recover()
+        expected = self.write(journal, 3, [(0, {'math': 10}), (1, {'language': 10})])
+        self.assertTrue(journal.snapshot())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, SNAPSHOT_NAME)))
+        journal.user_created(new_user(3))
+        journal.scores_added('user_test_3', {'math': 10})
+        journal.scores_added('user_test_0', {'language': 10})
+        journal.close()
+
+        expected['user_test_3'] = (10, 10, 0)
+        expected['user_test_0'] = (20, 10, 10)
+        users = self.journal().recover()
+        self.assertEqual(scores(users), expected)
+
+    def test_segments_rotate_and_compact(self):
+        journal = self.journal(segment_events=4)
+        journal.recover()
+        expected = self.write(journal, 5, [])
+        for i in range(40):
+            journal.scores_added(f"user_test_{i % 5}", {'math': 10})
+            # One commit per event, so the journal rotates every few events
+            journal.flush()
+        journal.close()
+        expected = {user_id: (80, 80, 0) for user_id in expected}
+        self.assertGreaterEqual(journal.snapshots, 1)
+
+        users = self.journal().recover()
+        self.assertEqual(scores(users), expected)
+
+    def test_crash_before_snapshot_replace(self):
+        journal = self.journal()
+        journal.recover()
+        expected = self.write(journal, 2, [(0, {'math': 10})])
+        journal.close()
+
+        # A snapshot that was being written when the process died is never renamed into place
+        with open(os.path.join(self.directory, SNAPSHOT_NAME + '.tmp'), 'w') as f:
+            f.write('{"segment": 99, "users"')
+
+        users = self.journal().recover()
+        self.assertEqual(scores(users), expected)
+
+    def test_crash_after_snapshot_before_segment_removal(self):
+        journal = self.journal()
+        journal.recover()
+        expected = self.write(journal, 2, [(0, {'math': 10}), (1, {'language': 10})])
+        journal.flush()
+        saved = {}
+        for name in self.segment_files():
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                saved[name] = f.read()
+        self.assertTrue(journal.snapshot())
+        journal.close()
+
+        # The snapshot was renamed into place but the folded segments were not deleted yet
+        for name, data in saved.items():
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(data)
+
+        users = self.journal().recover()
+        self.assertEqual(scores(users), expected)
+        # And they are not replayed twice on the following start either
+        self.assertEqual(scores(self.journal().recover()), expected)
+
+    def test_repeated_restarts_do_not_drift(self):
+        expected = None
+        for run in range(3):
+            journal = self.journal()
+            users = journal.recover()
+            if expected is not None:
+                self.assertEqual(scores(users), expected)
+            if run == 0:
+                expected = self.write(journal, 2, [(0, {'math': 10})])
+            journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
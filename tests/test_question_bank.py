@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quiz_engine  # noqa: E402
+from question_bank import BankQuestion, BankWatcher, QuestionBank, UnknownSubtype  # noqa: E402
+
+MATH_ITEMS = {
+    'calculation': [
+        {'id': 'calc_1', 'type': 'math', 'subtype': 'calculation', 'question': '1 + 1 = ?', 'answer': '2',
+         'explanation': '', 'difficulty': 1},
+        {'id': 'calc_2', 'type': 'math', 'subtype': 'calculation', 'question': '12 × 3 = ?', 'answer': 36,
+         'explanation': '', 'difficulty': 2},
+    ],
+    'wordProblems': [
+        {'id': 'word_1', 'type': 'math', 'subtype': 'word_problem', 'question': 'りんごが3個...', 'answer': '5',
+         'explanation': '3 + 2 = 5', 'difficulty': 1},
+    ],
+    'total': 3,
+}
+
+LANGUAGE_ITEMS = [
+    {'id': 'jp_hiragana_1', 'type': 'language', 'question': '「あさ」の読み方はどれですか？', 'answer': 'あさ',
+     'choices': ['あさ', 'いぬ', 'くも'], 'explanation': '', 'difficulty': 1},
+    {'id': 'jp_katakana_1', 'type': 'language', 'question': '「パン」の読み方はどれですか？', 'answer': 'ぱん',
+     'choices': ['ぱん', 'ぱす'], 'explanation': '', 'difficulty': 2},
+]
+
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    # Coarse filesystem clocks could otherwise leave the mtime unchanged
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class BankFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.math_path = os.path.join(self.directory, 'math-questions.json')
+        self.language_path = os.path.join(self.directory, 'japanese-questions.json')
+        write_json(self.math_path, MATH_ITEMS)
+        write_json(self.language_path, LANGUAGE_ITEMS)
+        self.paths = (self.math_path, self.language_path)
+
+
+class QuestionBankTest(BankFilesTest):
+    def test_load(self):
+        bank = QuestionBank.load(self.paths)
+        self.assertEqual(bank.size, 5)
+        self.assertEqual(bank.subtypes('math'), ['calculation', 'word_problem'])
+        # The language file has no subtype field: it comes from the id
+        self.assertEqual(bank.subtypes('language'), ['hiragana', 'katakana'])
+        self.assertEqual(bank.get('calc_2'), BankQuestion('calc_2', 'math', 'calculation', 2, '12 × 3 = ?',
+                                                          '36', '', None))
+        self.assertEqual(bank.get('jp_hiragana_1').options, ('あさ', 'いぬ', 'くも'))
+        self.assertIsNone(bank.get('calc_9'))
+
+    def test_load_skips_missing_files(self):
+        bank = QuestionBank.load((os.path.join(self.directory, 'missing.json'), self.language_path))
+        self.assertEqual(bank.size, 2)
+        self.assertFalse(bank.has('math'))
+
+    def test_sample_buckets(self):
+        bank = QuestionBank.load(self.paths)
+        self.assertTrue(bank.has('math', 'word_problem'))
+        self.assertFalse(bank.has('math', 'geometry'))
+        for _ in range(20):
+            self.assertEqual(bank.sample('math', 'calculation', 2).bank_id, 'calc_2')
+            self.assertEqual(bank.sample('language', difficulty=2).bank_id, 'jp_katakana_1')
+            # No word problem at difficulty 2: any difficulty of the subtype will do
+            self.assertEqual(bank.sample('math', 'word_problem', 2).bank_id, 'word_1')
+        self.assertEqual({bank.sample('math').bank_id for _ in range(200)}, {'calc_1', 'calc_2', 'word_1'})
+
+    def test_unknown_subtype(self):
+        bank = QuestionBank.load(self.paths)
+        with self.assertRaisesRegex(UnknownSubtype, 'geometry'):
+            bank.sample('math', 'geometry')
+        # Without a subtype an empty type is not an error, just nothing to serve
+        self.assertIsNone(bank.sample('science'))
+        self.assertIsNone(bank.issue('science'))
+
+    def test_issue(self):
+        bank = QuestionBank.load(self.paths)
+        question = bank.issue('language', 'hiragana', difficulty=3)
+        self.assertEqual({key: question[key] for key in ('type', 'subtype', 'answer', 'difficulty', 'bankId')},
+                         {'type': 'language', 'subtype': 'hiragana', 'answer': 'あさ', 'difficulty': 3,
+                          'bankId': 'jp_hiragana_1'})
+        self.assertRegex(question['id'], r'^lang_\d+_\d{4}$')
+        self.assertEqual(sorted(question['options']), sorted(['あさ', 'いぬ', 'くも']))
+        self.assertNotIn('options', bank.issue('math', 'word_problem'))
+
+    def test_engine_uses_the_bank(self):
+        bank = QuestionBank.load(self.paths)
+        question = quiz_engine.generate_question('math', 1, 'word_problem', bank=bank)
+        self.assertEqual(question['bankId'], 'word_1')
+        self.assertEqual(quiz_engine.generate_language_question(2, bank)['bankId'], 'jp_katakana_1')
+        with self.assertRaises(UnknownSubtype):
+            quiz_engine.generate_question('math', 1, 'word_problem')
+
+    def test_shipped_files(self):
+        bank = QuestionBank.load()
+        self.assertGreater(bank.size, 0)
+        self.assertIn('word_problem', bank.subtypes('math'))
+
+
+class BankWatcherTest(BankFilesTest):
+    def setUp(self):
+        super().setUp()
+        self.bank = QuestionBank.load(self.paths)
+        self.watcher = BankWatcher(lambda bank: setattr(self, 'bank', bank), self.paths, interval=0.02)
+        self.addCleanup(self.watcher.stop)
+
+    def test_reload_swaps_in_a_new_bank(self):
+        old = self.bank
+        write_json(self.language_path, LANGUAGE_ITEMS[:1])
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIs(self.watcher.reload(), self.bank)
+        self.assertIsNot(self.bank, old)
+        self.assertEqual((self.bank.size, self.watcher.reloads), (4, 1))
+        # A request still holding the old bank keeps seeing all of it
+        self.assertEqual(old.size, 5)
+        self.assertTrue(old.has('language', 'katakana'))
+
+    def test_bad_file_keeps_the_old_bank(self):
+        old = self.bank
+        with open(self.math_path, 'w', encoding='utf-8') as f:
+            f.write('{"calculation": [')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(self.watcher.reload())
+        self.assertIs(self.bank, old)
+        self.assertEqual((self.watcher.errors, self.watcher.reloads), (1, 0))
+
+    def test_background_reload(self):
+        old = self.bank
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.watcher.start()
+            write_json(self.math_path, {'calculation': MATH_ITEMS['calculation']})
+            self.assertTrue(wait_until(lambda: self.bank is not old))
+        self.assertEqual(self.bank.subtypes('math'), ['calculation'])
+        self.assertEqual(self.watcher.reloads, 1)
+
+    def test_background_skips_a_broken_file_until_it_changes(self):
+        old = self.bank
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.watcher.start()
+            with open(self.language_path, 'w', encoding='utf-8') as f:
+                f.write('[{"id": "jp_hiragana_2"}]')
+            self.assertTrue(wait_until(lambda: self.watcher.errors == 1))
+            # The same broken file is not parsed again on every poll
+            time.sleep(0.2)
+            self.assertEqual(self.watcher.errors, 1)
+            self.assertIs(self.bank, old)
+            write_json(self.language_path, LANGUAGE_ITEMS)
+            self.assertTrue(wait_until(lambda: self.bank is not old))
+        self.assertEqual(self.bank.size, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_batch import MAX_BATCH_SIZE, BatchError, generate_batch, parse_mix  # noqa: E402
+from quiz_handler import QuizRequestHandler  # noqa: E402
+from quiz_store import QuizStore  # noqa: E402
+
+
+def counting_generator(distinct=None):
+    """A generate() whose questions repeat after `distinct` different texts"""
+    ids = itertools.count()
+
+    def generate(question_type, difficulty, subtype):
+        n = next(ids)
+        text = f'{question_type} {subtype} {difficulty} #{n % distinct if distinct else n}'
+        return {'id': f'{question_type}_{n}', 'type': question_type, 'question': text, 'answer': '1'}
+    return generate
+
+
+class ParseMixTest(unittest.TestCase):
+    def test_single_spec(self):
+        self.assertEqual(parse_mix({'type': 'math', 'difficulty': '2', 'count': '5'}), [('math', None, 2, 5)])
+        self.assertEqual(parse_mix({}), [('math', None, 1, 1)])
+
+    def test_mix(self):
+        mix = parse_mix({'items': [{'type': 'math', 'subtype': 'word_problem', 'count': 10},
+                                   {'type': 'language', 'subtype': '', 'count': 10}]})
+        self.assertEqual(mix, [('math', 'word_problem', 1, 10), ('language', None, 1, 10)])
+
+    def test_rejects_malformed_requests(self):
+        bodies = [
+            [],
+            {'items': []},
+            {'items': {'type': 'math'}},
+            {'items': ['math']},
+            {'type': 'science'},
+            {'count': 'many'},
+            {'difficulty': None},
+            {'count': 0},
+            {'count': MAX_BATCH_SIZE + 1},
+            {'items': [{'count': MAX_BATCH_SIZE}, {'type': 'language', 'count': 1}]},
+        ]
+        for body in bodies:
+            with self.assertRaises(BatchError, msg=body):
+                parse_mix(body)
+        self.assertEqual(len(parse_mix({'count': MAX_BATCH_SIZE})), 1)
+
+
+class GenerateBatchTest(unittest.TestCase):
+    def test_counts_in_mix_order(self):
+        batch = generate_batch(counting_generator(), [('math', None, 1, 3), ('language', 'kanji', 2, 2)])
+        self.assertEqual([q['type'] for q in batch], ['math'] * 3 + ['language'] * 2)
+        self.assertTrue(all('kanji 2' in q['question'] for q in batch[3:]))
+
+    def test_no_repeats_and_short_when_exhausted(self):
+        batch = generate_batch(counting_generator(distinct=4), [('math', None, 1, 10)])
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(len({q['question'] for q in batch}), 4)
+
+    def test_colliding_ids_are_skipped(self):
+        texts = itertools.count()
+
+        def generate(question_type, difficulty, subtype):
+            return {'id': 'math_1_1000', 'type': question_type, 'question': str(next(texts))}
+        self.assertEqual(len(generate_batch(generate, [('math', None, 1, 3)])), 1)
+
+    def test_shuffle(self):
+        mix = [('math', None, 1, 20), ('language', None, 1, 20)]
+        random.seed(5)
+        batch = generate_batch(counting_generator(), mix, shuffle=True)
+        self.assertEqual(len(batch), 40)
+        self.assertNotEqual([q['type'] for q in batch], ['math'] * 20 + ['language'] * 20)
+
+
+class _Server:
+    server_name = 'test'
+    server_port = 0
+
+
+class Handler(QuizRequestHandler):
+    store = QuizStore()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def handle(raw):
+    handler = object.__new__(Handler)
+    handler.rfile = io.BytesIO(raw)
+    handler.wfile = io.BytesIO()
+    handler.client_address = ('127.0.0.1', 0)
+    handler.server = _Server()
+    handler.close_connection = True
+    handler.handle_one_request()
+    head, _, body = handler.wfile.getvalue().partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def post(path, payload):
+    body = json.dumps(payload).encode()
+    return handle(b'POST ' + path.encode() + b' HTTP/1.0\r\nContent-Type: application/json\r\n'
+                  b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+
+
+class BatchEndpointTest(unittest.TestCase):
+    def test_query_count(self):
+        status, questions = handle(b'GET /api/questions/generate?type=math&difficulty=2&count=15 HTTP/1.0\r\n\r\n')
+        self.assertEqual((status, len(questions)), (200, 15))
+        self.assertEqual({q['type'] for q in questions}, {'math'})
+        self.assertEqual(len({q['question'] for q in questions}), 15)
+        # Every question in the batch can be answered
+        self.assertTrue(all(Handler.store.get_question(q['id']) for q in questions))
+
+    def test_posted_mix(self):
+        status, questions = post('/api/questions/generate', {'items': [{'type': 'math', 'count': 4},
+                                                                       {'type': 'language', 'count': 3}]})
+        self.assertEqual(status, 200)
+        self.assertEqual([q['type'] for q in questions], ['math'] * 4 + ['language'] * 3)
+
+    def test_rejected_mix(self):
+        self.assertEqual(post('/api/questions/generate', {'count': MAX_BATCH_SIZE + 1}),
+                         (400, {'error': f'At most {MAX_BATCH_SIZE} questions per batch'}))
+        self.assertEqual(handle(b'GET /api/questions/generate?count=0 HTTP/1.0\r\n\r\n'),
+                         (400, {'error': 'count must be at least 1'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
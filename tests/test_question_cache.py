@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import question_cache  # noqa: E402
+from question_cache import QuestionCache  # noqa: E402
+from quiz_handler import QuizRequestHandler  # noqa: E402
+from quiz_store import QuizStore  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def question(question_id):
+    return {'id': question_id, 'type': 'math', 'question': '1 + 1 = ?', 'answer': '2'}
+
+
+class QuestionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(question_cache.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ttl(self):
+        cache = QuestionCache(max_size=10, ttl=60, stripes=1)
+        cache.add(question('q1'))
+        self.clock.now += 59
+        self.assertEqual(cache.get('q1')['id'], 'q1')
+        self.clock.now += 1
+        self.assertIsNone(cache.get('q1'))
+        self.assertTrue(cache.is_expired('q1'))
+        self.assertFalse(cache.is_expired('q2'))
+        self.assertEqual(len(cache), 0)
+
+    def test_expired_questions_are_dropped_on_add(self):
+        cache = QuestionCache(max_size=10, ttl=60, stripes=1)
+        cache.add(question('q1'))
+        cache.add(question('q2'))
+        self.clock.now += 61
+        cache.add(question('q3'))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats()['expirations'], 2)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = QuestionCache(max_size=3, ttl=60, stripes=1)
+        for question_id in ('q1', 'q2', 'q3'):
+            cache.add(question(question_id))
+        # Reading q1 makes q2 the oldest
+        cache.get('q1')
+        cache.add(question('q4'))
+        self.assertIsNone(cache.get('q2'))
+        self.assertEqual([cache.get(q)['id'] for q in ('q1', 'q3', 'q4')], ['q1', 'q3', 'q4'])
+        self.assertTrue(cache.is_expired('q2'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_size_is_bounded_across_stripes(self):
+        cache = QuestionCache(max_size=64, ttl=60, stripes=8)
+        for i in range(10000):
+            cache.add(question(f'q{i}'))
+        self.assertLessEqual(len(cache), 64)
+        self.assertEqual(cache.stats()['evictions'], 10000 - len(cache))
+
+    def test_dropped_ids_are_bounded(self):
+        cache = QuestionCache(max_size=2, ttl=60, stripes=1)
+        for i in range(10):
+            cache.add(question(f'q{i}'))
+        # Only the last max_size dropped ids are remembered
+        self.assertEqual([cache.is_expired(f'q{i}') for i in range(8)], [False] * 6 + [True] * 2)
+
+    def test_stats(self):
+        cache = QuestionCache(max_size=10, ttl=60, stripes=2)
+        cache.add(question('q1'))
+        cache.get('q1')
+        cache.get('q1')
+        cache.get('q2')
+        stats = cache.stats()
+        self.assertEqual({key: stats[key] for key in ('size', 'hits', 'misses')}, {'size': 1, 'hits': 2, 'misses': 1})
+        self.assertAlmostEqual(stats['hitRate'], 2 / 3)
+        self.assertEqual(QuestionCache().stats()['hitRate'], 0.0)
+
+
+class _Server:
+    server_name = 'test'
+    server_port = 0
+
+
+class Handler(QuizRequestHandler):
+    store = QuizStore(max_questions=100, question_ttl=60)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def post_answer(question_id):
+    body = json.dumps({'questionId': question_id, 'answer': '2', 'userId': 'user_1'}).encode()
+    handler = object.__new__(Handler)
+    handler.rfile = io.BytesIO(b'POST /api/answers HTTP/1.0\r\nContent-Length: %d\r\n\r\n' % len(body) + body)
+    handler.wfile = io.BytesIO()
+    handler.client_address = ('127.0.0.1', 0)
+    handler.server = _Server()
+    handler.close_connection = True
+    handler.handle_one_request()
+    head, _, body = handler.wfile.getvalue().partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+class ExpiredAnswerTest(unittest.TestCase):
+    def test_expired_and_unknown_questions(self):
+        clock = Clock()
+        with mock.patch.object(question_cache.time, 'monotonic', clock):
+            Handler.store.add_question(question('math_1_1000'))
+            self.assertEqual(post_answer('math_1_1000')[0], 200)
+            clock.now += 61
+            self.assertEqual(post_answer('math_1_1000'), (410, {'error': 'Question expired'}))
+            self.assertEqual(post_answer('math_9_9999'), (404, {'error': 'Question not found'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quiz_engine  # noqa: E402
+from question_pool import TIERS, MathQuestionPool, _sample_block  # noqa: E402
+
+QUESTION = re.compile(r'^(\d+) ([+\-×]) (\d+) = \?$')
+OPERATIONS = {'+': lambda a, b: a + b, '-': lambda a, b: a - b, '×': lambda a, b: a * b}
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class MathQuestionPoolTest(unittest.TestCase):
+    def assert_valid(self, question, difficulty):
+        match = QUESTION.match(question['question'])
+        self.assertIsNotNone(match, question['question'])
+        a, symbol, b = int(match[1]), match[2], int(match[3])
+        (low1, high1), (low2, high2), operations = TIERS[1 if difficulty == 1 else 2]
+        self.assertIn(symbol, [{'*': '×'}.get(op, op) for op in operations])
+        self.assertEqual(question['answer'], str(OPERATIONS[symbol](a, b)))
+        self.assertGreaterEqual(int(question['answer']), 0)
+        if symbol != '-':
+            # Subtraction may swap its operands to keep the answer non-negative
+            self.assertTrue(low1 <= a <= high1 and low2 <= b <= high2, question['question'])
+        self.assertEqual(question['difficulty'], difficulty)
+        self.assertEqual(question['type'], 'math')
+        self.assertRegex(question['id'], r'^math_\d+_\d{4}$')
+
+    def test_questions_are_well_formed(self):
+        pool = MathQuestionPool(block_size=200, low_water=50)
+        for difficulty in (1, 2, 3):
+            for _ in range(100):
+                self.assert_valid(pool.pop(difficulty), difficulty)
+        self.assertEqual(pool.served, 300)
+
+    def test_explanation_template(self):
+        pool = MathQuestionPool(block_size=10, low_water=2, explanation='The answer is {}.')
+        question = pool.pop()
+        self.assertEqual(question['explanation'], f"The answer is {question['answer']}.")
+
+    def test_tiers_pop_from_their_own_pool(self):
+        pool = MathQuestionPool(block_size=100, low_water=10)
+        pool.pop(1)
+        pool.pop(5)
+        pool.pop(2)
+        self.assertEqual(pool.sizes(), {1: 99, 2: 98})
+
+    def test_background_refill(self):
+        pool = MathQuestionPool(block_size=50, low_water=20)
+        for _ in range(31):
+            pool.pop(1)
+        self.assertTrue(wait_until(lambda: pool.refills >= 1))
+        self.assertGreaterEqual(pool.sizes()[1], 50)
+        self.assertEqual(pool.misses, 0)
+
+    def test_empty_pool_builds_inline(self):
+        pool = MathQuestionPool(block_size=2, low_water=0)
+        questions = [pool.pop(2) for _ in range(5)]
+        for question in questions:
+            self.assert_valid(question, 2)
+        # Nothing refills with low_water 0, so every pop past the block misses
+        self.assertEqual((pool.served, pool.misses), (5, 3))
+
+    def test_engine_serves_from_the_pool(self):
+        pool = MathQuestionPool(block_size=10, low_water=2)
+        quiz_engine.generate_math_question(1, pool)
+        self.assertEqual(pool.served, 1)
+
+
+class SampleBlockTest(unittest.TestCase):
+    def test_stdlib_sampling(self):
+        ops, num1s, num2s, answers = _sample_block(500, (1, 20), (1, 20), ('+', '-', '*'))
+        self.assertEqual(len(answers), 500)
+        self.assertEqual(set(ops), {'+', '-', '*'})
+        for op, a, b, c in zip(ops, num1s, num2s, answers):
+            self.assertEqual(c, OPERATIONS[{'*': '×'}.get(op, op)](a, b))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import question_tokens  # noqa: E402
+from question_tokens import (TOKEN_PREFIX, QuestionTokens, TokenError, TokenExpired,  # noqa: E402
+                             token_bytes, token_from_bytes)
+
+
+def question(answer='42', question_type='math', difficulty=3):
+    return {'type': question_type, 'answer': answer, 'difficulty': difficulty}
+
+
+def flip_char(token, index):
+    # The last character carries padding bits, so change one from the middle
+    replacement = 'A' if token[index] != 'A' else 'B'
+    return token[:index] + replacement + token[index + 1:]
+
+
+class QuestionTokensTest(unittest.TestCase):
+    def setUp(self):
+        self.tokens = QuestionTokens(secret='test-secret', ttl=60)
+
+    def test_round_trip(self):
+        token = self.tokens.issue(question(' 42 '))
+        self.assertTrue(QuestionTokens.is_token(token))
+        question_type, difficulty, expires, _, _ = self.tokens.decode(token)
+        self.assertEqual((question_type, difficulty), ('math', 3))
+        self.assertAlmostEqual(expires, time.time() + 60, delta=2)
+        # Math answers are compared stripped, like check_answer
+        self.assertEqual(self.tokens.check(token, '42'), ('math', True))
+        self.assertEqual(self.tokens.check(token, '43'), ('math', False))
+
+    def test_language_answers_are_exact(self):
+        token = self.tokens.issue(question('ア', 'language', 1))
+        self.assertEqual(self.tokens.check(token, 'ア'), ('language', True))
+        self.assertEqual(self.tokens.check(token, 'ア '), ('language', False))
+
+    def test_tokens_for_the_same_question_differ(self):
+        self.assertNotEqual(self.tokens.issue(question()), self.tokens.issue(question()))
+
+    def test_tampered_token_is_rejected(self):
+        token = self.tokens.issue(question())
+        with self.assertRaises(TokenError):
+            self.tokens.check(flip_char(token, -5), '42')
+        raw = bytearray(token_bytes(token))
+        # Raise the difficulty byte without re-signing
+        raw[2] = 9
+        with self.assertRaisesRegex(TokenError, 'Invalid'):
+            self.tokens.decode(token_from_bytes(raw))
+
+    def test_other_secret_is_rejected(self):
+        token = QuestionTokens(secret='other-secret').issue(question())
+        with self.assertRaisesRegex(TokenError, 'Invalid'):
+            self.tokens.check(token, '42')
+
+    def test_malformed_tokens(self):
+        for token in ('math_123_4567', TOKEN_PREFIX, TOKEN_PREFIX + '!!!!', TOKEN_PREFIX + 'AAAA', None, 7):
+            with self.subTest(token=token):
+                with self.assertRaises(TokenError):
+                    self.tokens.decode(token)
+                self.assertIsNone(token_bytes(token))
+
+    def test_expired_token(self):
+        token = self.tokens.issue(question())
+        later = time.time() + 61
+        with mock.patch.object(question_tokens.time, 'time', return_value=later):
+            with self.assertRaises(TokenExpired):
+                self.tokens.check(token, '42')
+        # Still a TokenError, so callers that only catch that reject it too
+        self.assertTrue(issubclass(TokenExpired, TokenError))
+
+    def test_is_token(self):
+        self.assertTrue(QuestionTokens.is_token(TOKEN_PREFIX + 'abc'))
+        self.assertFalse(QuestionTokens.is_token('math_1_2'))
+        self.assertFalse(QuestionTokens.is_token(12))
+
+    def test_token_bytes_round_trip(self):
+        token = self.tokens.issue(question())
+        self.assertEqual(token_from_bytes(token_bytes(token)), token)
+
+    def test_secret_from_environment(self):
+        with mock.patch.dict(os.environ, {question_tokens.SECRET_ENV: 'shared'}):
+            first, second = QuestionTokens(), QuestionTokens()
+        token = first.issue(question())
+        self.assertEqual(second.check(token, '42'), ('math', True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_store import QuizStore  # noqa: E402
+
+
+def new_user(user_id):
+    return {'id': user_id, 'name': user_id, 'classId': None, 'totalScore': 0, 'mathScore': 0,
+            'languageScore': 0, 'rank': '初心者', 'currentRank': 'bronze', 'rewards': [],
+            'createdAt': '2024-07-15T00:00:00.000Z'}
+
+
+class QuizStoreTest(unittest.TestCase):
+    def test_users_are_copied_out(self):
+        store = QuizStore(stripes=4)
+        store.add_user(new_user('u1'))
+        user = store.get_user('u1')
+        user['totalScore'] = 1000
+        self.assertEqual(store.get_user('u1')['totalScore'], 0)
+        self.assertIsNone(store.get_user('nobody'))
+        self.assertEqual(store.user_count(), 1)
+
+    def test_add_score_updates_fields_and_rank(self):
+        store = QuizStore(stripes=4)
+        store.add_user(new_user('u1'))
+        for _ in range(5):
+            user = store.add_score('u1', 'math', 10)
+        self.assertEqual((user['totalScore'], user['mathScore'], user['languageScore']), (50, 50, 0))
+        self.assertEqual((user['rank'], user['currentRank']), ('中級者', 'silver'))
+        user = store.add_scores('u1', {'math': 10, 'language': 40})
+        self.assertEqual((user['totalScore'], user['mathScore'], user['languageScore']), (100, 60, 40))
+        self.assertEqual(user['currentRank'], 'gold')
+        self.assertEqual(store.get_user('u1'), user)
+        self.assertIsNone(store.add_score('nobody', 'math', 10))
+
+    def test_scores_reach_the_leaderboard(self):
+        store = QuizStore(stripes=4)
+        for user_id in ('u1', 'u2', 'u3'):
+            store.add_user(new_user(user_id))
+        store.add_score('u2', 'math', 30)
+        store.add_score('u3', 'language', 20)
+        self.assertEqual([leader['userId'] for leader in store.top_users()], ['u2', 'u3', 'u1'])
+        self.assertEqual(store.user_position('u3')['position'], 2)
+        self.assertEqual(store.top_users('language')[0]['userId'], 'u3')
+
+    def test_questions(self):
+        store = QuizStore(stripes=4)
+        question = {'id': 'math_1_1000', 'type': 'math', 'question': '1 + 1 = ?', 'answer': '2'}
+        store.add_question(question)
+        self.assertIs(store.get_question('math_1_1000'), question)
+        self.assertIsNone(store.get_question('math_2_1000'))
+        self.assertFalse(store.question_expired('math_2_1000'))
+        self.assertEqual(store.question_count(), 1)
+
+    def test_answer_history_needs_a_user(self):
+        store = QuizStore(stripes=4)
+        self.assertIsNone(store.answer_history('nobody'))
+        store.add_user(new_user('u1'))
+        self.assertEqual(store.answer_history('u1')['answers'], [])
+
+
+class ConcurrentStoreTest(unittest.TestCase):
+    def setUp(self):
+        # Switch threads as often as possible so unlocked updates would interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+    def test_concurrent_answers_keep_every_point(self):
+        store = QuizStore(stripes=4)
+        user_ids = [f'user_{i}' for i in range(20)]
+        for user_id in user_ids:
+            store.add_user(new_user(user_id))
+
+        def answer(question_type):
+            for _ in range(50):
+                for user_id in user_ids:
+                    store.add_score(user_id, question_type, 1)
+
+        threads = [threading.Thread(target=answer, args=(question_type,))
+                   for question_type in ('math', 'language') * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for user_id in user_ids:
+            user = store.get_user(user_id)
+            self.assertEqual((user['totalScore'], user['mathScore'], user['languageScore']), (400, 200, 200))
+        # The leaderboard saw the last update of each user, not a stale one
+        self.assertEqual({leader['score'] for leader in store.top_users(limit=20)}, {400})
+
+    def test_concurrent_registration(self):
+        store = QuizStore(stripes=4)
+
+        def register(start):
+            for i in range(start, start + 250):
+                store.add_user(new_user(f'user_{i}'))
+
+        threads = [threading.Thread(target=register, args=(start,)) for start in range(0, 1000, 250)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(store.user_count(), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import responses  # noqa: E402
+from responses import build_response, dumps, encode_array, encode_question, error_body  # noqa: E402
+
+
+class DumpsTest(unittest.TestCase):
+    def test_integers_beyond_64_bits(self):
+        # Echoed straight from a client's JSON; the stdlib encoder takes them
+        payload = {'answer': 10 ** 23, 'scores': [-2 ** 64, 2 ** 63], 'name': '名前'}
+        self.assertEqual(json.loads(dumps(payload)), payload)
+
+    def test_same_values_with_either_encoder(self):
+        payload = {'id': 'math_1', 'ok': True, 'n': None, 'f': 0.5, 'text': '「早い」', 'big': 10 ** 30}
+        with mock.patch.object(responses, 'orjson', None):
+            stdlib = dumps(payload)
+        self.assertEqual(json.loads(dumps(payload)), json.loads(stdlib))
+
+    def test_other_type_errors_still_raise(self):
+        with self.assertRaises(TypeError):
+            dumps({'when': object()})
+
+
+class EncodeTest(unittest.TestCase):
+    def test_encode_question_matches_plain_encoding(self):
+        question = {'id': 'lang_1', 'type': 'language', 'question': 'q', 'answer': 'a', 'difficulty': 2,
+                    'explanation': 'e', 'options': ['a', 'b']}
+        self.assertEqual(json.loads(encode_question(question)), question)
+        # Unexpected fields fall back to encoding the whole dict
+        question['extra'] = 1
+        self.assertEqual(json.loads(encode_question(question)), question)
+
+    def test_encode_array_and_error_body(self):
+        self.assertEqual(json.loads(encode_array([dumps(1), error_body('Not found')])), [1, {'error': 'Not found'}])
+
+    def test_build_response(self):
+        response = build_response(404, b'{}', server='quiz', protocol='HTTP/1.1')
+        head, _, body = response.partition(b'\r\n\r\n')
+        self.assertTrue(head.startswith(b'HTTP/1.1 404 Not Found\r\nServer: quiz\r\n'))
+        self.assertIn(b'Content-Length: 2', head)
+        self.assertEqual(body, b'{}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from review_queue import KEY_BITS, ReviewError, ReviewQueue, parse_review_query  # noqa: E402
+
+NOW = 1721000000
+
+
+class ReviewQueueTest(unittest.TestCase):
+    def queue(self, **options):
+        options.setdefault('intervals', (60, 600, 3600))
+        options.setdefault('lease', 300)
+        return ReviewQueue(**options)
+
+    def test_missed_question_comes_back_after_its_interval(self):
+        reviews = self.queue()
+        reviews.answered('u', 7, False, now=NOW)
+        self.assertEqual(reviews.pending('u'), 1)
+        self.assertEqual(reviews.due('u', 10, now=NOW + 59), [])
+        self.assertEqual(reviews.due('u', 10, now=NOW + 60), [(7, 0)])
+
+    def test_correct_answers_climb_the_boxes_then_graduate(self):
+        reviews = self.queue()
+        reviews.answered('u', 7, False, now=NOW)
+        now = NOW
+        for box, interval in ((1, 600), (2, 3600)):
+            reviews.answered('u', 7, True, now=now)
+            self.assertEqual(reviews.due('u', 10, now=now + interval - 1), [])
+            self.assertEqual(reviews.due('u', 10, now=now + interval), [(7, box)])
+            now += interval
+        reviews.answered('u', 7, True, now=now)
+        self.assertEqual(reviews.pending('u'), 0)
+        self.assertEqual(reviews.due('u', 10, now=now + 10 ** 6), [])
+        self.assertEqual((reviews.scheduled, reviews.graduated), (1, 1))
+
+    def test_wrong_answer_goes_back_to_the_first_box(self):
+        reviews = self.queue()
+        reviews.answered('u', 7, False, now=NOW)
+        reviews.answered('u', 7, True, now=NOW)
+        reviews.answered('u', 7, False, now=NOW)
+        self.assertEqual(reviews.due('u', 10, now=NOW + 60), [(7, 0)])
+
+    def test_correct_answer_to_unscheduled_question_is_ignored(self):
+        reviews = self.queue()
+        reviews.answered('u', 7, True, now=NOW)
+        reviews.answered('u', None, False, now=NOW)
+        reviews.answered('u', 1 << KEY_BITS, False, now=NOW)
+        self.assertEqual(reviews.pending('u'), 0)
+        self.assertEqual(reviews.user_count(), 0)
+
+    def test_served_reviews_are_leased(self):
+        reviews = self.queue()
+        for key in (1, 2, 3):
+            reviews.answered('u', key, False, now=NOW + key)
+        # Soonest first, at most `count`
+        self.assertEqual(reviews.due('u', 2, now=NOW + 100), [(1, 0), (2, 0)])
+        self.assertEqual(reviews.due('u', 10, now=NOW + 100), [(3, 0)])
+        self.assertEqual(reviews.due('u', 10, now=NOW + 399), [])
+        # Never answered: back once the lease runs out
+        self.assertEqual(reviews.due('u', 10, now=NOW + 400), [(1, 0), (2, 0), (3, 0)])
+
+    def test_stale_entries_are_skipped_and_the_heap_stays_bounded(self):
+        reviews = self.queue()
+        for key in range(5):
+            reviews.answered('u', key, False, now=NOW)
+        # Each answer reschedules and leaves the old heap entry behind
+        for step in range(200):
+            reviews.answered('u', step % 5, step % 2 == 0, now=NOW + step)
+        heap = reviews._users['u'].heap
+        self.assertLessEqual(len(heap), 2 * reviews.pending('u') + 17)
+        due = reviews.due('u', 50, now=NOW + 10 ** 6)
+        self.assertEqual(sorted(key for key, _ in due), list(range(reviews.pending('u'))))
+        self.assertEqual(len(due), len(set(key for key, _ in due)))
+
+    def test_max_items(self):
+        reviews = self.queue(max_items=3)
+        for key in range(5):
+            reviews.answered('u', key, False, now=NOW)
+        self.assertEqual(reviews.pending('u'), 3)
+        self.assertEqual(reviews.overflow, 2)
+        # Other users have their own limit
+        reviews.answered('v', 9, False, now=NOW)
+        self.assertEqual(reviews.pending('v'), 1)
+
+    def test_forget(self):
+        reviews = self.queue()
+        reviews.answered('u', 7, False, now=NOW)
+        reviews.answered('u', 8, False, now=NOW)
+        reviews.forget('u', 7)
+        reviews.forget('nobody', 7)
+        self.assertEqual(reviews.pending('u'), 1)
+        self.assertEqual(reviews.due('u', 10, now=NOW + 60), [(8, 0)])
+
+    def test_parse_review_query(self):
+        self.assertEqual(parse_review_query({}), 10)
+        self.assertEqual(parse_review_query({'count': ['50']}), 50)
+        for count in ('x', '0', '51'):
+            with self.assertRaises(ReviewError):
+                parse_review_query({'count': [count]})
+
+
+if __name__ == '__main__':
+    unittest.main()
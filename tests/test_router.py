@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import http.server
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from responses import JSONResponseMixin  # noqa: E402
+from router import Router, RoutingMixin  # noqa: E402
+
+
+class RecordingLog:
+    def __init__(self):
+        self.records = []
+
+    def record(self, method, route, status, seconds, user_id=None, path=None):
+        self.records.append((method, route, status, user_id, path))
+
+
+class _Server:
+    server_name = 'test'
+    server_port = 0
+
+
+timings = []
+
+
+class Handler(RoutingMixin, JSONResponseMixin, http.server.BaseHTTPRequestHandler):
+    routes = Router(timing_hooks=[lambda method, pattern, status, seconds: timings.append((method, pattern,
+                                                                                           status))])
+    access_log = RecordingLog()
+
+    @routes.get('/api/ok')
+    def get_ok(self):
+        self.send_json(200, {'ok': True})
+
+    @routes.get('/api/users/{user_id}/answers')
+    def get_answers(self, user_id):
+        self.send_json(200, {'userId': user_id, 'q': self.query})
+
+    @routes.post('/api/answers')
+    def post_answer(self):
+        self.discard_body()
+        self.log_user_id = 'user_9'
+        raise RuntimeError('handler bug')
+
+    @routes.get('/api/half')
+    def get_half(self):
+        self.send_json(200, {})
+        raise RuntimeError('after the response')
+
+
+def handle(raw):
+    handler = object.__new__(Handler)
+    handler.rfile = io.BytesIO(raw)
+    handler.wfile = io.BytesIO()
+    handler.client_address = ('127.0.0.1', 0)
+    handler.server = _Server()
+    handler.close_connection = True
+    handler.handle_one_request()
+    return handler.wfile.getvalue()
+
+
+class RouterTest(unittest.TestCase):
+    def test_find(self):
+        router = Router()
+        router.add('GET', '/api/users', 'users')
+        router.add('GET', '/api/users/{user_id}', 'user')
+        router.add('GET', '/api/users/{user_id}/answers', 'answers')
+        router.add('GET', '/api/{kind}/{id}/answers', 'generic')
+        self.assertEqual(router.find('/api/users')[0].handlers['GET'], 'users')
+        route, params = router.find('/api/users/a%20b/answers')
+        # Fewer parameters win when two shapes match
+        self.assertEqual((route.handlers['GET'], params), ('answers', {'user_id': 'a b'}))
+        self.assertEqual(router.find('/api/things/1/answers')[1], {'kind': 'things', 'id': '1'})
+        self.assertEqual(router.find('/api/users//answers'), (None, None))
+        self.assertEqual(router.find('/nowhere'), (None, None))
+
+
+class DispatchTest(unittest.TestCase):
+    def setUp(self):
+        timings.clear()
+        Handler.access_log.records.clear()
+
+    def test_routes_params_and_query(self):
+        response = handle(b'GET /api/users/u1/answers?limit=5 HTTP/1.0\r\n\r\n')
+        self.assertTrue(response.startswith(b'HTTP/1.0 200 '))
+        self.assertEqual(json.loads(response.partition(b'\r\n\r\n')[2]), {'userId': 'u1', 'q': {'limit': ['5']}})
+        self.assertEqual(timings, [('GET', '/api/users/{user_id}/answers', 200)])
+        self.assertEqual(Handler.access_log.records, [('GET', '/api/users/{user_id}/answers', 200, 'u1', None)])
+
+    def test_wrong_method_and_unknown_path(self):
+        response = handle(b'POST /api/ok HTTP/1.0\r\nContent-Length: 2\r\n\r\n{}')
+        self.assertTrue(response.startswith(b'HTTP/1.0 405 '))
+        self.assertIn(b'Allow: GET, OPTIONS\r\n', response)
+        handle(b'POST /missing HTTP/1.0\r\nContent-Length: 0\r\n\r\n')
+        self.assertEqual(timings, [('POST', '/api/ok', 405), ('POST', None, 404)])
+        self.assertEqual(Handler.access_log.records[-1], ('POST', None, 404, None, '/missing'))
+
+    def test_failing_handler_is_still_timed_and_logged(self):
+        with self.assertRaises(RuntimeError):
+            handle(b'POST /api/answers HTTP/1.0\r\nContent-Length: 2\r\n\r\n{}')
+        self.assertEqual(timings, [('POST', '/api/answers', 500)])
+        self.assertEqual(Handler.access_log.records, [('POST', '/api/answers', 500, 'user_9', None)])
+
+    def test_failure_after_the_response_keeps_its_status(self):
+        with self.assertRaises(RuntimeError):
+            handle(b'GET /api/half HTTP/1.0\r\n\r\n')
+        self.assertEqual(timings, [('GET', '/api/half', 200)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+import http.client
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server_modes  # noqa: E402
+from quiz_handler import QuizRequestHandler  # noqa: E402
+from quiz_store import QuizStore  # noqa: E402
+from score_stream import (HEARTBEAT, STREAM_PREAMBLE, ScoreBroker, StreamError, Subscription,  # noqa: E402
+                          parse_stream_query, validate_class_id)
+
+
+def user(user_id, class_id='1-A', total=10):
+    return {'id': user_id, 'name': user_id, 'classId': class_id, 'totalScore': total, 'mathScore': total,
+            'languageScore': 0, 'rank': '初心者', 'currentRank': 'bronze'}
+
+
+def parse_events(data):
+    """(id, payload) for each `score` event in a chunk of the stream"""
+    events = []
+    for block in data.decode('utf-8').split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if line and not line.startswith(':'))
+        if fields.get('event') == 'score':
+            events.append((int(fields['id']), json.loads(fields['data'])))
+    return events
+
+
+def wait_until(predicate, timeout=5):
+    # Calls predicate once per poll: it may take a semaphore
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class ClassIdTest(unittest.TestCase):
+    def test_validate(self):
+        self.assertEqual(validate_class_id('1-A'), '1-A')
+        self.assertIsNone(validate_class_id(''))
+        self.assertIsNone(validate_class_id(None))
+        for value in (7, ['1-A'], 'x' * 65):
+            with self.assertRaises(StreamError):
+                validate_class_id(value)
+
+    def test_query(self):
+        self.assertEqual(parse_stream_query({'classId': ['1-A']}), '1-A')
+        with self.assertRaisesRegex(StreamError, 'required'):
+            parse_stream_query({})
+
+
+class SubscriptionTest(unittest.TestCase):
+    def test_coalesces_by_user(self):
+        subscription = Subscription(ScoreBroker(), '1-A', buffer_size=4)
+        self.assertEqual(subscription.offer('a', b'a1'), 'queued')
+        self.assertEqual(subscription.offer('b', b'b1'), 'queued')
+        self.assertEqual(subscription.offer('a', b'a2'), 'coalesced')
+        # Oldest user first, with their latest event
+        self.assertEqual(subscription.wait(0), [b'a2', b'b1'])
+        self.assertEqual(subscription.take(), [])
+
+    def test_slow_client_is_dropped(self):
+        broker = ScoreBroker()
+        subscription = Subscription(broker, '1-A', buffer_size=2)
+        subscription.offer('a', b'a')
+        subscription.offer('b', b'b')
+        self.assertEqual(subscription.offer('c', b'c'), 'dropped')
+        self.assertTrue(subscription.closed)
+        self.assertIsNone(subscription.take())
+        self.assertEqual(subscription.offer('a', b'a'), 'closed')
+
+    def test_waker(self):
+        subscription = Subscription(ScoreBroker(), '1-A')
+        calls = []
+        subscription.set_waker(lambda: calls.append(1))
+        subscription.offer('a', b'a')
+        # Only the first pending event wakes the reader
+        subscription.offer('b', b'b')
+        self.assertEqual(len(calls), 1)
+        subscription.take()
+        subscription.close()
+        self.assertEqual(len(calls), 2)
+
+
+class ScoreBrokerTest(unittest.TestCase):
+    def test_publish_to_the_users_class(self):
+        broker = ScoreBroker()
+        first, second, other = broker.subscribe('1-A'), broker.subscribe('1-A'), broker.subscribe('2-B')
+        broker.publish(user('u1'), position=3)
+        broker.publish(user('u2', total=20))
+        for subscription in (first, second):
+            events = parse_events(b''.join(subscription.take()))
+            self.assertEqual([(event_id, payload['userId']) for event_id, payload in events], [(1, 'u1'), (2, 'u2')])
+            self.assertEqual(events[0][1]['position'], 3)
+        self.assertEqual(other.take(), [])
+        self.assertEqual((broker.published, broker.subscriber_count()), (2, 3))
+
+    def test_no_subscribers(self):
+        broker = ScoreBroker()
+        broker.publish(user('u1'))
+        broker.publish(user('u2', class_id=None))
+        self.assertEqual(broker.published, 0)
+        self.assertFalse(broker.has_subscribers('1-A'))
+
+    def test_counts_and_unsubscribes_dropped_clients(self):
+        broker = ScoreBroker(buffer_size=2)
+        slow = broker.subscribe('1-A')
+        for user_id in ('a', 'a', 'b', 'c'):
+            broker.publish(user(user_id))
+        self.assertEqual((broker.coalesced, broker.dropped), (1, 1))
+        self.assertTrue(slow.closed)
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    def test_close_unsubscribes(self):
+        broker = ScoreBroker()
+        broker.subscribe('1-A').close()
+        self.assertFalse(broker.has_subscribers('1-A'))
+
+
+class _Server:
+    server_name = 'test'
+    server_port = 0
+
+
+class Handler(QuizRequestHandler):
+    store = QuizStore()
+    score_events = ScoreBroker()
+    stream_heartbeat = 0.05
+
+    def log_message(self, format, *args):
+        pass
+
+
+def handle(server):
+    handler = object.__new__(Handler)
+    handler.rfile = io.BytesIO(b'GET /api/stream/scores?classId=1-A HTTP/1.0\r\n\r\n')
+    handler.wfile = io.BytesIO()
+    handler.client_address = ('127.0.0.1', 0)
+    handler.server = server
+    handler.close_connection = True
+    handler.handle_one_request()
+    return handler.wfile.getvalue()
+
+
+class StreamRefusalTest(unittest.TestCase):
+    def assert_refused(self, server, message):
+        reply = handle(server)
+        self.assertTrue(reply.startswith(b'HTTP/1.0 503 '), reply[:40])
+        self.assertIn(message.encode(), reply)
+
+    def test_single_mode(self):
+        server = _Server()
+        server.serial = True
+        self.assert_refused(server, 'need --mode thread, pool or async')
+
+    def test_prefork(self):
+        server = _Server()
+        server.max_streams = 0
+        self.assert_refused(server, 'off in this server')
+
+    def test_pool_cap(self):
+        server = server_modes.PooledServer(('127.0.0.1', 0), Handler, threads=8, bind_and_activate=False)
+        self.addCleanup(server.server_close)
+        # A quarter of the workers may stream
+        self.assertEqual(server.max_streams, 2)
+        for _ in range(2):
+            self.assertTrue(server.stream_slots.acquire(blocking=False))
+        self.assert_refused(server, 'Too many score streams')
+        server.stream_slots.release()
+        self.assertTrue(server.stream_slots.acquire(blocking=False))
+
+
+class LiveStreamTest(unittest.TestCase):
+    def setUp(self):
+        args = server_modes.parse_args(['--mode', 'pool', '--workers', '4'])
+        self.server = server_modes.create_server(Handler, ('127.0.0.1', 0), args)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def request(self, method, path, payload=None):
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        try:
+            conn.request(method, path, body=json.dumps(payload) if payload is not None else None)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def read_until(self, sock, predicate):
+        data = b''
+        while not predicate(data):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def test_answer_reaches_the_stream(self):
+        _, student = self.request('POST', '/api/users', {'name': 'hana', 'classId': '1-A'})
+        with socket.create_connection(self.server.server_address, timeout=5) as sock:
+            sock.sendall(b'GET /api/stream/scores?classId=1-A HTTP/1.1\r\nHost: quiz\r\n\r\n')
+            head = self.read_until(sock, lambda data: STREAM_PREAMBLE in data)
+            self.assertTrue(head.startswith(b'HTTP/1.0 200 '))
+            self.assertIn(b'Content-Type: text/event-stream', head)
+            self.assertNotIn(b'Content-Length', head)
+            # Quiet streams get heartbeat comments
+            self.read_until(sock, lambda data: HEARTBEAT in data)
+            self.assertTrue(wait_until(lambda: Handler.score_events.has_subscribers('1-A')))
+
+            # A second stream would take the only spare worker of four
+            status, body = self.request('GET', '/api/stream/scores?classId=1-A')
+            self.assertEqual((status, body), (503, {'error': 'Too many score streams, please retry'}))
+
+            _, question = self.request('GET', '/api/questions/generate?type=math')
+            self.request('POST', '/api/answers', {'questionId': question['id'], 'answer': question['answer'],
+                                                  'userId': student['id']})
+            data = self.read_until(sock, lambda data: b'event: score' in data and data.endswith(b'\n\n'))
+            (_, payload), = parse_events(data)
+            self.assertEqual((payload['userId'], payload['totalScore'], payload['position']), (student['id'], 10, 1))
+        # The stream notices the client left on its next heartbeat and frees its slot
+        self.assertTrue(wait_until(lambda: not Handler.score_events.has_subscribers('1-A')))
+        self.assertTrue(wait_until(lambda: self.server.stream_slots.acquire(blocking=False)))
+
+
+if __name__ == '__main__':
+    unittest.main()
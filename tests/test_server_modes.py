@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import contextlib
+import http.server
+import io
+import os
+import socket
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server_modes  # noqa: E402
+from server_modes import BUSY_RESPONSE, PooledServer, SingleServer, ThreadedServer  # noqa: E402
+
+
+class BlockingHandler(http.server.BaseHTTPRequestHandler):
+    """GET /together waits at `barrier`; GET /wait holds its thread until `release` is set"""
+
+    barrier = None
+    started = threading.Event()
+    release = threading.Event()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        status = 200
+        if self.path == '/together':
+            try:
+                self.barrier.wait()
+            except threading.BrokenBarrierError:
+                status = 500
+        elif self.path == '/wait':
+            self.started.set()
+            self.release.wait(5)
+        body = self.path.encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def fetch(address, path):
+    with socket.create_connection(address, timeout=5) as sock:
+        sock.sendall(f'GET {path} HTTP/1.0\r\n\r\n'.encode())
+        return read_all(sock)
+
+
+def read_all(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+class ParseArgsTest(unittest.TestCase):
+    def assert_rejected(self, argv):
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            server_modes.parse_args(argv)
+
+    def test_defaults(self):
+        args = server_modes.parse_args([])
+        self.assertEqual((args.mode, args.port, args.workers), ('thread', 3001, None))
+        self.assertEqual(server_modes.describe(args), 'thread')
+
+    def test_rejected_combinations(self):
+        for argv in (['--workers', '0'], ['--queue-size', '0'], ['--mode', 'prefork'],
+                     ['--mode', 'prefork', '--sqlite', 'quiz.db'],
+                     ['--sqlite', 'quiz.db', '--data-dir', 'data'], ['--mode', 'fork']):
+            with self.subTest(argv=argv):
+                self.assert_rejected(argv)
+
+    def test_describe(self):
+        args = server_modes.parse_args(['--mode', 'pool', '--workers', '8', '--queue-size', '32'])
+        self.assertEqual(server_modes.describe(args), 'pool (8 threads, queue 32)')
+
+
+class CreateServerTest(unittest.TestCase):
+    def test_server_per_mode(self):
+        for mode, server_class in (('single', SingleServer), ('thread', ThreadedServer), ('pool', PooledServer)):
+            handler_class = type('Handler', (BlockingHandler,), {})
+            server = server_modes.create_server(handler_class, ('127.0.0.1', 0),
+                                                server_modes.parse_args(['--mode', mode]))
+            self.addCleanup(server.server_close)
+            self.assertIs(type(server), server_class, mode)
+        self.assertEqual((server.threads, server.pending.maxsize), (server_modes.DEFAULT_POOL_THREADS,
+                                                                    server_modes.DEFAULT_QUEUE_SIZE))
+
+
+class ConcurrentServingTest(unittest.TestCase):
+    def serve(self, server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server.server_address
+
+    def assert_concurrent(self, server):
+        address = self.serve(server)
+        BlockingHandler.barrier = threading.Barrier(4, timeout=5)
+        replies = []
+        clients = [threading.Thread(target=lambda: replies.append(fetch(address, '/together'))) for _ in range(4)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        # Each request only finishes once all four are being handled at the same time
+        self.assertEqual([reply.split(b' ', 2)[1] for reply in replies], [b'200'] * 4)
+
+    def test_thread_per_request(self):
+        self.assert_concurrent(ThreadedServer(('127.0.0.1', 0), BlockingHandler))
+
+    def test_pool(self):
+        self.assert_concurrent(PooledServer(('127.0.0.1', 0), BlockingHandler, threads=4))
+
+    def test_full_pool_answers_503(self):
+        server = PooledServer(('127.0.0.1', 0), BlockingHandler, threads=1, queue_size=1)
+        address = self.serve(server)
+        BlockingHandler.started.clear()
+        BlockingHandler.release.clear()
+        self.addCleanup(BlockingHandler.release.set)
+        busy = socket.create_connection(address, timeout=5)
+        self.addCleanup(busy.close)
+        busy.sendall(b'GET /wait HTTP/1.0\r\n\r\n')
+        # The only worker is now held, so the next connection fills the queue
+        self.assertTrue(BlockingHandler.started.wait(5))
+        queued = socket.create_connection(address, timeout=5)
+        self.addCleanup(queued.close)
+        queued.sendall(b'GET /queued HTTP/1.0\r\n\r\n')
+        self.assertEqual(fetch(address, '/rejected'), BUSY_RESPONSE)
+        self.assertEqual(server.rejected, 1)
+        BlockingHandler.release.set()
+        self.assertTrue(read_all(busy).endswith(b'/wait'))
+        self.assertTrue(read_all(queued).endswith(b'/queued'))
+
+
+if __name__ == '__main__':
+    unittest.main()
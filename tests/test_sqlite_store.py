@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_store import SqliteStore  # noqa: E402
+
+
+def new_user(i):
+    return {'id': f'user_{i}', 'name': f'student{i}', 'totalScore': 0, 'mathScore': 0, 'languageScore': 0,
+            'createdAt': '2024-07-15T00:00:00.000Z'}
+
+
+class SqliteStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = SqliteStore(os.path.join(directory, 'quiz.db'))
+        self.addCleanup(self.store.close)
+
+    def run_thread(self, target):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+    def wait_for_connections(self, count):
+        # A thread's locals are dropped as it exits, just around join() returning
+        deadline = time.monotonic() + 5
+        while self.store.connection_count() > count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.store.connection_count()
+
+    def test_short_lived_threads_close_their_connections(self):
+        self.store.add_user(new_user(0))
+        # One thread per request, as in --mode thread
+        for i in range(300):
+            self.run_thread(lambda: self.store.add_score('user_0', 'math', 10))
+        self.assertEqual(self.wait_for_connections(1), 1)
+        self.assertEqual(self.store.get_user('user_0')['totalScore'], 3000)
+
+    def test_concurrent_threads_each_get_a_connection(self):
+        ready = threading.Semaphore(0)
+        done = threading.Event()
+
+        def work():
+            self.store.user_count()
+            ready.release()
+            done.wait()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        try:
+            for _ in threads:
+                ready.acquire()
+            self.assertEqual(self.store.connection_count(), 8)
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(self.wait_for_connections(0), 0)
+
+    def test_close_closes_connections_of_running_threads(self):
+        self.store.add_user(new_user(1))
+        self.store.close()
+        self.assertEqual(self.store.connection_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import gzip
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_handler import QuizRequestHandler  # noqa: E402
+from static_assets import (IMMUTABLE, REVALIDATE, SHORT_LIVED, StaticAssets, accepted_encodings,  # noqa: E402
+                           cache_control, etag_matches)
+
+INDEX = b'<!doctype html><title>quiz</title>'
+BUNDLE = b'export const questions = [];\n' * 200
+LARGE = bytes(range(256)) * 64 * 2
+
+
+class _Server:
+    server_name = 'test'
+    server_port = 0
+
+
+class _Connection:
+    """Stands in for the socket: sendfile() appends to the response"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def sendfile(self, f, offset, count):
+        f.seek(offset)
+        self.wfile.write(f.read(count))
+
+
+class Handler(QuizRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def handle(raw):
+    handler = object.__new__(Handler)
+    handler.rfile = io.BytesIO(raw)
+    handler.wfile = io.BytesIO()
+    handler.connection = _Connection(handler.wfile)
+    handler.client_address = ('127.0.0.1', 0)
+    handler.server = _Server()
+    handler.close_connection = True
+    handler.handle_one_request()
+    head, _, body = handler.wfile.getvalue().partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, body
+
+
+def get(path, **headers):
+    lines = ''.join(f"{name.replace('_', '-')}: {value}\r\n" for name, value in headers.items())
+    return handle(f'GET {path} HTTP/1.0\r\n{lines}\r\n'.encode('latin-1'))
+
+
+class HeaderHelpersTest(unittest.TestCase):
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip, deflate, br'), {'gzip', 'deflate', 'br'})
+        self.assertEqual(accepted_encodings('GZIP;q=0.5, br; q=0'), {'gzip'})
+        self.assertEqual(accepted_encodings(None), set())
+
+    def test_etag_matches(self):
+        etag = b'"abc"'
+        self.assertTrue(etag_matches('"abc"', etag))
+        self.assertTrue(etag_matches('"x", W/"abc"', etag))
+        self.assertTrue(etag_matches('*', etag))
+        self.assertFalse(etag_matches('"abd"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+    def test_cache_control(self):
+        self.assertEqual(cache_control('assets/index-4f3a.js', 'application/javascript'), IMMUTABLE)
+        self.assertEqual(cache_control('app.0123abcd.css', 'text/css'), IMMUTABLE)
+        self.assertEqual(cache_control('index.html', 'text/html; charset=utf-8'), REVALIDATE)
+        self.assertEqual(cache_control('favicon.ico', 'image/x-icon'), SHORT_LIVED)
+
+
+class StaticAssetsTest(unittest.TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.mkdir(os.path.join(root, 'assets'))
+        for name, body in (('index.html', INDEX), ('assets/app.js', BUNDLE), ('large.bin', LARGE)):
+            with open(os.path.join(root, name), 'wb') as f:
+                f.write(body)
+        self.assets = StaticAssets.load(root, max_cached=8192)
+        Handler.assets = self.assets
+        self.addCleanup(setattr, Handler, 'assets', None)
+
+    def test_load(self):
+        self.assertEqual(len(self.assets), 3)
+        # index.html is too small to be worth compressing; large.bin stays on disk
+        self.assertEqual(self.assets.compressed_count(), 1)
+        bundle = self.assets.find('/assets/app.js')
+        self.assertEqual(gzip.decompress(bundle.variants['gzip']), BUNDLE)
+        self.assertIsNone(self.assets.find('/large.bin').variants)
+        self.assertIs(self.assets.find('/'), self.assets.find('/index.html'))
+        self.assertIsNone(self.assets.find('/../../etc/passwd'))
+        self.assertIs(self.assets.find('/assets/../index.html'), self.assets.find('/'))
+
+    def test_gzip_variant(self):
+        status, headers, body = get('/assets/app.js', Accept_Encoding='gzip, deflate')
+        self.assertEqual((status, headers['Content-Encoding'], headers['Vary']), (200, 'gzip', 'Accept-Encoding'))
+        self.assertEqual(gzip.decompress(body), BUNDLE)
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE.decode())
+        # text/ or application/javascript, depending on the platform's mimetypes
+        self.assertRegex(headers['Content-Type'], r'/javascript; charset=utf-8$')
+
+    def test_identity_without_accept_encoding(self):
+        status, headers, body = get('/assets/app.js', Accept_Encoding='gzip;q=0')
+        self.assertEqual((status, body), (200, BUNDLE))
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+
+    def test_not_modified(self):
+        _, headers, _ = get('/assets/app.js', Accept_Encoding='gzip')
+        etag = headers['ETag']
+        # The same ETag for every coding of one file
+        self.assertEqual(get('/assets/app.js')[1]['ETag'], etag)
+        for value in (etag, 'W/' + etag, '"other", ' + etag):
+            status, headers, body = get('/assets/app.js', If_None_Match=value, Accept_Encoding='gzip')
+            self.assertEqual((status, body), (304, b''), value)
+            self.assertEqual(headers['ETag'], etag)
+            self.assertNotIn('Content-Length', headers)
+            self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(get('/assets/app.js', If_None_Match='"other"')[0], 200)
+
+    def test_index(self):
+        status, headers, body = get('/')
+        self.assertEqual((status, body, headers['Cache-Control']), (200, INDEX, REVALIDATE.decode()))
+        self.assertEqual(get('/index.html', If_None_Match=headers['ETag'])[0], 304)
+
+    def test_large_file_from_disk(self):
+        status, headers, body = get('/large.bin', Accept_Encoding='gzip')
+        self.assertEqual((status, body, int(headers['Content-Length'])), (200, LARGE, len(LARGE)))
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(get('/large.bin', If_None_Match=headers['ETag'])[:3:2], (304, b''))
+
+
+if __name__ == '__main__':
+    unittest.main()